@@ -2,19 +2,23 @@ import typer
 import sys
 import json
 import os
-import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List
 from typing_extensions import Annotated
 from rich.console import Console
 from rich.table import Table
 from datetime import datetime
+from pathlib import Path
 
-# Import the refactored functions from other modules
-from guidelines_agent.core.persist_guidelines import persist_guidelines_from_file
-from guidelines_agent.core.persistence import persist_embeddings
-from guidelines_agent.core.query import query_guidelines
-from guidelines_agent.core.summarize import summarize_cli
-from guidelines_agent.core.query_planner import query_planner_cli
-from guidelines_agent.core.extract import extract_guidelines_from_pdf
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Heavy modules (LLM SDKs, DB drivers) are imported inside the command that needs them,
+# so `--help` and single commands only pay for what they use.
+from guidelines_agent.core.rule_id_helper import generate_clean_id
 
 # Initialize Typer app and Rich console
 app = typer.Typer(
@@ -25,63 +29,104 @@ app = typer.Typer(
 console = Console()
 
 
-def generate_clean_id(text):
-    """Generates a clean, lowercase ID from a string."""
-    text = text.lower()
-    text = re.sub(r"\s+", "_", text)
-    text = re.sub(r"[^a-z0-9_]", "", text)
-    return text
+def _process_one(pdf_path, check_cache_only=False):
+    """Runs extraction for a single PDF; safe to call from worker threads."""
+    from guidelines_agent.core.extract import extract_guidelines_from_pdf, get_cached_extraction
+    if check_cache_only:
+        result = get_cached_extraction(pdf_path)
+        if result is None:
+            return pdf_path, {"error": "No cached extraction found (--check-cache-only)."}
+        return pdf_path, result
+    return pdf_path, extract_guidelines_from_pdf(pdf_path)
+
+
+def _write_bytes(path, data):
+    """Writes a bytes payload with raw os.write calls, bypassing Python-level buffering."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def _write_extraction_output(pdf_path, result, output_dir):
+    """Saves one extraction result as JSON and Markdown files."""
+    guidelines_list = result.get("guidelines")
+    if guidelines_list is None:
+        reason = result.get("error") or result.get("validation_summary", "No guidelines extracted.")
+        console.print(f"[bold red]Error:[/bold red] Could not process {pdf_path}. Details: {reason}")
+        return
+
+    base_name = os.path.basename(pdf_path)
+    file_name_without_ext = os.path.splitext(base_name)[0]
+
+    portfolio_name = result.get("portfolio_name") or file_name_without_ext
+    portfolio_id = result.get("portfolio_id") or generate_clean_id(portfolio_name)
+
+    output_data = {
+        "portfolio_id": portfolio_id,
+        "portfolio_name": portfolio_name,
+        "doc_id": result.get("doc_id") or portfolio_id,
+        "doc_name": result.get("doc_name") or base_name,
+        "doc_date": result.get("doc_date") or datetime.now().strftime("%Y-%m-%d"),
+        "guidelines": guidelines_list,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    json_filename = f"{file_name_without_ext}.json"
+    md_filename = f"{file_name_without_ext}.md"
+    json_filepath = os.path.join(output_dir, json_filename)
+    md_filepath = os.path.join(output_dir, md_filename)
+
+    if ORJSON_AVAILABLE:
+        _write_bytes(json_filepath, orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(json_filepath, "w") as f:
+            json.dump(output_data, f, indent=2)
+    Path(md_filepath).write_text(result.get("human_readable_digest") or "")
+
+    console.print(f"Successfully extracted {len(guidelines_list)} guidelines from {pdf_path}.")
+    console.print(f"  - JSON saved to: {json_filepath}")
+    console.print(f"  - Digest saved to: {md_filepath}")
 
 
 @app.command("extract-guidelines")
 def extract_guidelines(
-    pdf_path: Annotated[
-        str, typer.Argument(help="The path to the PDF file to extract guidelines from.")
+    pdf_paths: Annotated[
+        List[str], typer.Argument(help="One or more PDF files, or directories of PDFs, to extract guidelines from.")
     ],
     output_dir: Annotated[
         str, typer.Option(help="The directory to save the output files.")
     ] = "results",
+    check_cache_only: Annotated[
+        bool, typer.Option("--check-cache-only", help="Only use cached extractions; never call the LLM.")
+    ] = False,
 ):
-    """Extracts guidelines from a PDF and saves them as JSON and Markdown."""
-    console.print(f"Extracting guidelines from: {pdf_path}")
-    try:
-        guidelines_list, guidelines_text = extract_guidelines_from_pdf(pdf_path)
-
-        base_name = os.path.basename(pdf_path)
-        file_name_without_ext = os.path.splitext(base_name)[0]
-
-        portfolio_name = file_name_without_ext
-        portfolio_id = generate_clean_id(portfolio_name)
-        doc_name = base_name
-        doc_id = portfolio_id
-        doc_date = datetime.now().strftime("%Y-%m-%d")
-
-        output_data = {
-            "portfolio_id": portfolio_id,
-            "portfolio_name": portfolio_name,
-            "doc_id": doc_id,
-            "doc_name": doc_name,
-            "doc_date": doc_date,
-            "guidelines": guidelines_list,
-        }
-
-        os.makedirs(output_dir, exist_ok=True)
-        json_filename = f"{file_name_without_ext}.json"
-        md_filename = f"{file_name_without_ext}.md"
-        json_filepath = os.path.join(output_dir, json_filename)
-        md_filepath = os.path.join(output_dir, md_filename)
-
-        with open(json_filepath, "w") as f:
-            json.dump(output_data, f, indent=2)
-        with open(md_filepath, "w") as f:
-            f.write(guidelines_text)
-
-        console.print(f"Successfully extracted {len(guidelines_list)} guidelines.")
-        console.print(f"  - JSON saved to: {json_filepath}")
-        console.print(f"  - Digest saved to: {md_filepath}")
-
-    except Exception as e:
-        console.print(f"[bold red]Error:[/bold red] Could not process {pdf_path}. Details: {e}")
+    """Extracts guidelines from PDFs and saves them as JSON and Markdown."""
+    files = []
+    for path in pdf_paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(".pdf")
+            )
+        else:
+            files.append(path)
+
+    # Extraction is dominated by the blocking LLM call, so threads overlap the waits
+    max_workers = int(os.getenv("EXTRACT_CONCURRENCY", "4"))
+    console.print(f"Extracting guidelines from {len(files)} file(s) with {max_workers} worker(s)")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_process_one, pdf_path, check_cache_only): pdf_path for pdf_path in files}
+        for future in as_completed(futures):
+            pdf_path = futures[future]
+            try:
+                _, result = future.result()
+                _write_extraction_output(pdf_path, result, output_dir)
+            except Exception as e:
+                console.print(f"[bold red]Error:[/bold red] Could not process {pdf_path}. Details: {e}")
 
 
 @app.command("persist-guidelines")
@@ -91,6 +136,7 @@ def persist_guidelines(
     ],
 ):
     """Persist a guideline document from a JSON file into the database."""
+    from guidelines_agent.core.persist_guidelines import persist_guidelines_from_file
     persist_guidelines_from_file(json_path)
 
 
@@ -99,6 +145,7 @@ def stamp_embedding():
     """
     Generate and store embeddings for all guidelines missing them.
     """
+    from guidelines_agent.core.persistence import persist_embeddings
     persist_embeddings()
 
 
@@ -116,11 +163,15 @@ def query(
     formatted: Annotated[
         bool, typer.Option(help="Output a formatted table instead of raw text.")
     ] = False,
+    no_cache: Annotated[
+        bool, typer.Option("--no-cache", help="Always call the embedding API for the query.")
+    ] = False,
 ):
     """Query investment guidelines. Default output is JSON for piping."""
+    from guidelines_agent.core.query import query_guidelines
     console.print(f"Generating embedding for your query: '{query_text}'...")
     results = query_guidelines(
-        query_text, portfolio_id, top_k
+        query_text, portfolio_id, top_k, use_cache=not no_cache
     )
 
     if not results:
@@ -142,16 +193,24 @@ def query(
         table.add_column("Guideline")
         table.add_column("Provenance")
 
-        for i, result in enumerate(results):
-            table.add_row(
+        rows = [
+            (
                 str(i + 1),
                 f"{result['similarity']:.4f}",
                 result['portfolio_name'],
                 result['guideline_text'],
                 f"{result['provenance']} (Page: {result['page']})",
             )
+            for i, result in enumerate(results)
+        ]
+        for row in rows:
+            table.add_row(*row)
 
         console.print(table)
+    elif ORJSON_AVAILABLE:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+        sys.stdout.buffer.flush()
     else:
         print(json.dumps(results, indent=2))
 
@@ -162,6 +221,7 @@ def summarize():
     Summarize a context provided via standard input.
     The first line of the input should be the question.
     """
+    from guidelines_agent.core.summarize import summarize_cli
     summarize_cli()
 
 
@@ -177,8 +237,11 @@ def plan_query(
     """
     Create a structured JSON plan from a complex user query.
     """
+    from guidelines_agent.core.query_planner import query_planner_cli
     query_planner_cli(user_query)
 
 
 if __name__ == "__main__":
+    from guidelines_agent.core.custom_logging import configure_cli_logging
+    configure_cli_logging()
     app()
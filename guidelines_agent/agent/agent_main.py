@@ -1,10 +1,16 @@
 import os
+import re
+import asyncio
+from functools import lru_cache
 import typer
 import logging
 from rich.console import Console
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import SystemMessage
+from langchain_core.globals import set_llm_cache
+from langchain_core.caches import InMemoryCache
 from typing import TypedDict, Annotated, List, Dict, Any
 from langgraph.graph import StateGraph, END
 import json
@@ -18,27 +24,48 @@ from guidelines_agent.tools.guideline_tools import (
     stamp_embeddings,
     generate_upload_summary,
 )
-from guidelines_agent.core.custom_logging import CustomCallbackHandler
-from guidelines_agent.core.session_store import session_store
+from guidelines_agent.core.custom_logging import CustomCallbackHandler, configure_cli_logging
 from guidelines_agent.core.config import Config
+from guidelines_agent.core.query_planner import plan_top_k
 
 # --- Configuration ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-AGENT_MODEL = Config.GENERATIVE_MODEL
+AGENT_MODEL = Config.REASONING_MODEL
+AGENT_LLM_TIMEOUT = float(os.getenv("AGENT_LLM_TIMEOUT", "60"))
+TOOL_CONCURRENCY_LIMIT = int(os.getenv("TOOL_CONCURRENCY_LIMIT", "4"))
+# Rebuild the LangGraph workflows on every call so node edits show up without a restart
+GRAPH_HOT_RELOAD = os.getenv("GRAPH_HOT_RELOAD", "false").lower() == "true"
 console = Console()
 app = typer.Typer()
 logger = logging.getLogger(__name__)
 
+# --- LLM Cache ---
+
+def _configure_llm_cache():
+    """Installs LangChain's exact-match LLM cache so repeated agent prompts skip the model call."""
+    backend = Config.LLM_CACHE_BACKEND
+    if backend == "none":
+        return
+    if backend == "sqlite":
+        try:
+            from langchain_community.cache import SQLiteCache
+            set_llm_cache(SQLiteCache(database_path=Config.LLM_CACHE_PATH))
+            logger.info(f"LLM cache: SQLite at {Config.LLM_CACHE_PATH}")
+            return
+        except ImportError:
+            logger.warning("LLM_CACHE_BACKEND=sqlite requires langchain-community; using in-memory cache")
+    set_llm_cache(InMemoryCache(maxsize=Config.LLM_CACHE_MAX_ENTRIES))
+    logger.info("LLM cache: in-memory, up to %d entries", Config.LLM_CACHE_MAX_ENTRIES)
+
+_configure_llm_cache()
+
 # --- Agent Definitions ---
 
-def create_query_agent():
-    """Creates a LangChain agent executor for answering questions."""
-    logger.info("Creating query agent...")
-    tools = [query_planner, guideline_search, summarizer]
-    logger.info(f"Tools loaded: {[tool.name for tool in tools]}")
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an assistant that answers questions about investment guidelines. You must use the provided tools to first plan the query, then search for guidelines, and finally summarize the results to form an answer.
+# Tools, prompts and the chat model are built once per process and shared by every executor
+_QUERY_TOOLS = [query_planner, guideline_search, summarizer]
+
+_QUERY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an assistant that answers questions about investment guidelines. You must use the provided tools to first plan the query, then search for guidelines, and finally summarize the results to form an answer.
 
 **SESSION CONTEXT AWARENESS:**
 When conversation history is available, leverage it to:
@@ -56,21 +83,79 @@ When conversation history is available, leverage it to:
 
 Active session context:
 {session_context}"""),
-        ("user", "{input}"),
-        ("placeholder", "{agent_scratchpad}"),
-    ])
-    logger.info("Prompt template created.")
-    
-    llm = ChatGoogleGenerativeAI(model=AGENT_MODEL, google_api_key=GEMINI_API_KEY)
-    logger.info(f"LLM initialized with model: {AGENT_MODEL}")
+    ("user", "{input}"),
+    ("placeholder", "{agent_scratchpad}"),
+]).partial(session_context="No active context", conversation_history="")
+
+_STATEFUL_SYSTEM_TEMPLATE = """You are an assistant that answers questions about investment guidelines. You must use the provided tools to first plan the query, then search for guidelines, and finally summarize the results to form an answer.
+
+When conversation history is available, use it to:
+1. Reference previous discussions and maintain context
+2. Build upon earlier questions and answers  
+3. Avoid repeating information already established
+4. Provide more personalized responses
+
+Current conversation history:
+{conversation_history}
+
+Active session context:
+{session_context}"""
+
+# The system message is rendered outside the template so identical session state reuses one message
+_STATEFUL_QUERY_PROMPT = ChatPromptTemplate.from_messages([
+    MessagesPlaceholder("system_message"),
+    ("user", "{input}"),
+    ("placeholder", "{agent_scratchpad}"),
+])
+
+@lru_cache(maxsize=256)
+def render_stateful_system_message(conversation_history: str, session_context: str) -> SystemMessage:
+    """Renders the stateful agent's system message for the given session state."""
+    return SystemMessage(content=_STATEFUL_SYSTEM_TEMPLATE.format(
+        conversation_history=conversation_history,
+        session_context=session_context,
+    ))
+
+_LLM = None
+
+def _get_llm() -> ChatGoogleGenerativeAI:
+    """Returns the shared chat model, creating it on first use."""
+    global _LLM
+    if _LLM is None:
+        # Deterministic sampling keeps LLM cache keys meaningful. The default gRPC
+        # transports keep one multiplexed HTTP/2 channel per client, so sharing this
+        # instance reuses connections across every executor and request.
+        _LLM = ChatGoogleGenerativeAI(
+            model=AGENT_MODEL,
+            google_api_key=GEMINI_API_KEY,
+            temperature=0,
+            timeout=AGENT_LLM_TIMEOUT,
+        )
+        logger.info(f"LLM initialized with model: {AGENT_MODEL}")
+    return _LLM
+
+async def aclose_llm() -> None:
+    """Closes the shared chat model's async gRPC channel, if one was opened."""
+    client = getattr(_LLM, "async_client_running", None)
+    if client is not None:
+        closing = client.transport.close()
+        if asyncio.iscoroutine(closing):
+            await closing
+        _LLM.async_client_running = None
+
+@lru_cache(maxsize=1)
+def create_query_agent():
+    """Creates the process-wide LangChain agent executor for answering questions."""
+    logger.info("Creating query agent...")
+    logger.info(f"Tools loaded: {[tool.name for tool in _QUERY_TOOLS]}")
     
-    agent = create_tool_calling_agent(llm, tools, prompt)
+    agent = create_tool_calling_agent(_get_llm(), _QUERY_TOOLS, _QUERY_PROMPT)
     logger.info("Tool calling agent created.")
     
     callback_handler = CustomCallbackHandler()
     agent_executor = AgentExecutor(
         agent=agent, 
-        tools=tools, 
+        tools=_QUERY_TOOLS, 
         verbose=True, 
         callbacks=[callback_handler]
     )
@@ -78,56 +163,26 @@ Active session context:
     
     return agent_executor
 
-def create_stateful_query_agent(session_id: str = None):
-    """Creates a query agent with session context and conversation history."""
-    logger.info(f"Creating stateful query agent for session: {session_id}")
+@lru_cache(maxsize=1)
+def create_stateful_query_agent():
+    """Creates the process-wide query agent that takes session state as prompt variables.
     
-    # Get session info
-    conversation_history = ""
-    session_context = {}
-    
-    if session_id:
-        conversation_history = session_store.get_conversation_history(session_id)
-        session_context = session_store.get_context(session_id)
-        logger.info(f"Loaded session context: {len(session_context)} items, history: {len(conversation_history)} chars")
-    
-    tools = [query_planner, guideline_search, summarizer]
-    logger.info(f"Tools loaded: {[tool.name for tool in tools]}")
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an assistant that answers questions about investment guidelines. You must use the provided tools to first plan the query, then search for guidelines, and finally summarize the results to form an answer.
-
-When conversation history is available, use it to:
-1. Reference previous discussions and maintain context
-2. Build upon earlier questions and answers  
-3. Avoid repeating information already established
-4. Provide more personalized responses
-
-Current conversation history:
-{conversation_history}
-
-Active session context:
-{session_context}"""),
-        ("user", "{input}"),
-        ("placeholder", "{agent_scratchpad}"),
-    ])
+    Conversation history and session context are passed at invoke time as a
+    `system_message` built by render_stateful_system_message, so one executor
+    serves every session.
+    """
+    logger.info("Creating stateful query agent...")
     
-    llm = ChatGoogleGenerativeAI(model=AGENT_MODEL, google_api_key=GEMINI_API_KEY)
-    agent = create_tool_calling_agent(llm, tools, prompt)
+    agent = create_tool_calling_agent(_get_llm(), _QUERY_TOOLS, _STATEFUL_QUERY_PROMPT)
     
     callback_handler = CustomCallbackHandler()
     agent_executor = AgentExecutor(
         agent=agent, 
-        tools=tools, 
+        tools=_QUERY_TOOLS, 
         verbose=True, 
         callbacks=[callback_handler]
     )
     
-    # Store session context in agent for later access
-    agent_executor._session_id = session_id
-    agent_executor._conversation_history = conversation_history
-    agent_executor._session_context = session_context
-    
     logger.info("Stateful query agent created successfully.")
     return agent_executor
 
@@ -139,31 +194,36 @@ class IngestionState(TypedDict):
     file_name: str
     extraction_result: dict
     persistence_result: dict
+    embedding_result: dict
     final_summary: str
 
-def extract_node(state: IngestionState) -> IngestionState:
+async def extract_node(state: IngestionState) -> IngestionState:
     """Node to extract and validate the document."""
     logger.info(f"--- Starting Extraction for {state['file_path']} ---")
     file_path = state['file_path']
-    result = extract_and_validate_document.invoke({"file_path": file_path})
+    result = await extract_and_validate_document.ainvoke({"file_path": file_path})
     return {
         "file_name": os.path.basename(file_path),
         "extraction_result": result
     }
 
-def persist_node(state: IngestionState) -> IngestionState:
+async def persist_node(state: IngestionState) -> IngestionState:
     """Node to persist the extracted guidelines."""
     logger.info("--- Starting Persistence ---")
     extraction_data = state['extraction_result']
-    result = persist_guidelines.invoke({
+    result = await persist_guidelines.ainvoke({
         "data": extraction_data,
         "human_readable_digest": extraction_data.get("human_readable_digest", "")
     })
-    # After persisting, stamp the embeddings
-    stamp_embeddings.invoke({})
     return {"persistence_result": result}
 
-def summarize_node(state: IngestionState) -> IngestionState:
+async def embed_node(state: IngestionState) -> IngestionState:
+    """Node to stamp embeddings on the newly persisted guidelines."""
+    logger.info("--- Stamping Embeddings ---")
+    result = await stamp_embeddings.ainvoke({})
+    return {"embedding_result": result}
+
+async def summarize_node(state: IngestionState) -> IngestionState:
     """Node to generate a final summary of the ingestion process."""
     logger.info("--- Generating Summary ---")
     extraction_result = state['extraction_result']
@@ -172,7 +232,7 @@ def summarize_node(state: IngestionState) -> IngestionState:
     is_valid = extraction_result.get('is_valid_document', False)
     persistence_status = persistence_result.get('status', 'skipped')
 
-    summary = generate_upload_summary.invoke({
+    summary = await generate_upload_summary.ainvoke({
         "doc_name": extraction_result.get('doc_name', 'Unknown Document'),
         "portfolio_name": extraction_result.get('portfolio_name', 'Unknown Portfolio'),
         "is_valid_document": is_valid,
@@ -193,13 +253,14 @@ def should_persist(state: IngestionState) -> str:
         logger.info("--- Document is invalid. Skipping persistence. ---")
         return "summarize"
 
-def create_ingestion_agent():
-    """Creates a LangGraph agent for ingesting documents."""
+def _build_ingestion_graph():
+    """Builds and compiles the LangGraph workflow for ingesting documents."""
     logger.info("Creating ingestion graph...")
     workflow = StateGraph(IngestionState)
 
     workflow.add_node("extract", extract_node)
     workflow.add_node("persist", persist_node)
+    workflow.add_node("embed", embed_node)
     workflow.add_node("summarize", summarize_node)
 
     workflow.set_entry_point("extract")
@@ -211,28 +272,142 @@ def create_ingestion_agent():
             "summarize": "summarize",
         }
     )
-    workflow.add_edge("persist", "summarize")
+    # Embedding reads the rows persist just wrote, so the two steps stay sequential
+    workflow.add_edge("persist", "embed")
+    workflow.add_edge("embed", "summarize")
     workflow.add_edge("summarize", END)
 
     graph = workflow.compile()
     logger.info("Ingestion graph compiled successfully.")
     return graph
 
+# --- LangGraph Query Workflow ---
+
+# Questions that map directly onto plan -> search -> summarize; comparisons and other
+# multi-step requests stay with the tool-calling agent
+_DIRECT_QUESTION_RE = re.compile(
+    r"^\s*(what|which|how (much|many)|is|are|can|does|do|may|list|show|summari[sz]e|tell me)\b",
+    re.IGNORECASE,
+)
+_MULTI_STEP_RE = re.compile(r"\b(compare|comparison|versus|vs\.?|difference|differ|between)\b", re.IGNORECASE)
+
+DEFAULT_QUERY_TOP_K = 25
+
+class QueryState(TypedDict):
+    """Defines the state for the fixed query graph."""
+    input: str
+    plan: dict
+    hits: list
+    output: str
+
+def is_direct_question(query: str) -> bool:
+    """Returns True when a query can be answered by the fixed plan/search/summarize graph."""
+    return bool(_DIRECT_QUESTION_RE.match(query)) and not _MULTI_STEP_RE.search(query)
+
+async def plan_node(state: QueryState) -> QueryState:
+    """Node to turn the question into a search query and summary instruction."""
+    logger.info("--- Planning Query ---")
+    plan = await query_planner.ainvoke({"user_query": state['input']})
+    if not isinstance(plan, dict) or "error" in plan:
+        logger.warning(f"Query planning failed, searching with the raw question: {plan}")
+        plan = {}
+    return {"plan": {
+        "search_query": plan.get("search_query") or state['input'],
+        "summary_instruction": plan.get("summary_instruction") or state['input'],
+        "top_k": plan_top_k(plan, DEFAULT_QUERY_TOP_K),
+    }}
+
+async def search_node(state: QueryState) -> QueryState:
+    """Node to retrieve the guidelines matching the plan."""
+    logger.info("--- Searching Guidelines ---")
+    plan = state['plan']
+    results = await guideline_search.ainvoke({"search_query": plan['search_query'], "top_k": plan['top_k']})
+    # Reshape search rows into the summarizer's SearchResultItem fields
+    hits = [
+        {
+            "rank": rank,
+            "similarity": row.get("similarity") or 0.0,
+            "portfolio_name": row.get("portfolio_name") or "",
+            "guideline": row.get("guideline_text") or row.get("guideline") or "",
+            "provenance": row.get("provenance") or "",
+        }
+        for rank, row in enumerate(results, 1)
+    ]
+    return {"hits": hits}
+
+async def answer_node(state: QueryState) -> QueryState:
+    """Node to summarize the retrieved guidelines into the final answer."""
+    logger.info("--- Summarizing Answer ---")
+    if not state['hits']:
+        return {"output": "No matching guidelines were found for this question."}
+    answer = await summarizer.ainvoke({
+        "summary_instruction": state['plan']['summary_instruction'],
+        "search_results": state['hits'],
+    })
+    return {"output": answer}
+
+def _build_query_graph():
+    """Builds and compiles the graph that runs the fixed plan -> search -> summarize pipeline."""
+    logger.info("Creating query graph...")
+    workflow = StateGraph(QueryState)
+
+    workflow.add_node("plan", plan_node)
+    workflow.add_node("search", search_node)
+    workflow.add_node("answer", answer_node)
+
+    workflow.set_entry_point("plan")
+    workflow.add_edge("plan", "search")
+    workflow.add_edge("search", "answer")
+    workflow.add_edge("answer", END)
+
+    graph = workflow.compile()
+    logger.info("Query graph compiled successfully.")
+    return graph
+
+# --- Compiled Graphs ---
+
+# Neither graph needs API credentials to compile, so both are built once at import
+_INGEST_GRAPH = _build_ingestion_graph()
+_QUERY_GRAPH = _build_query_graph()
+
+def create_ingestion_agent():
+    """Returns the process-wide LangGraph agent for ingesting documents."""
+    return _build_ingestion_graph() if GRAPH_HOT_RELOAD else _INGEST_GRAPH
+
+def create_query_graph():
+    """Returns the process-wide fixed query graph."""
+    return _build_query_graph() if GRAPH_HOT_RELOAD else _QUERY_GRAPH
+
+# --- Concurrent Query Execution ---
+
+async def run_many(goals: List[str]) -> List[Dict[str, Any]]:
+    """Answers several questions concurrently with one shared query agent."""
+    agent_executor = create_query_agent()
+    semaphore = asyncio.Semaphore(TOOL_CONCURRENCY_LIMIT)
+
+    async def _run_one(goal: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await agent_executor.ainvoke({"input": goal})
+
+    logger.info(f"Running {len(goals)} queries with concurrency limit {TOOL_CONCURRENCY_LIMIT}")
+    return await asyncio.gather(*[_run_one(goal) for goal in goals])
+
 # --- CLI Commands ---
 
 @app.command("query")
-def run_query_agent(user_goal: str):
-    """Answers a question using the query agent."""
+def run_query_agent(user_goals: List[str]):
+    """Answers one or more questions using the query agent."""
     if not GEMINI_API_KEY:
         console.print("[bold red]Error:[/bold red] GEMINI_API_KEY environment variable not set.")
         return
     
-    console.print(f"[bold cyan]Goal:[/bold cyan] {user_goal}")
-    agent_executor = create_query_agent()
+    for user_goal in user_goals:
+        console.print(f"[bold cyan]Goal:[/bold cyan] {user_goal}")
     console.print("\n[yellow]Invoking Query Agent...[/yellow]\n")
-    response = agent_executor.invoke({"input": user_goal})
-    console.print("\n[bold green]Final Answer:[/bold green]")
-    console.print(response["output"])
+    responses = asyncio.run(run_many(user_goals))
+    for user_goal, response in zip(user_goals, responses):
+        console.print(f"\n[bold green]Final Answer[/bold green] ({user_goal}):")
+        console.print(response["output"])
 
 @app.command("ingest")
 def run_ingestion_agent(file_path: str):
@@ -244,9 +419,10 @@ def run_ingestion_agent(file_path: str):
     console.print(f"[bold cyan]Goal:[/bold cyan] Ingest document at {file_path}")
     agent_executor = create_ingestion_agent()
     console.print("\n[yellow]Invoking Ingestion Agent...[/yellow]\n")
-    response = agent_executor.invoke({"file_path": file_path})
+    response = asyncio.run(agent_executor.ainvoke({"file_path": file_path}))
     console.print("\n[bold green]Final Status:[/bold green]")
     console.print(response.get("final_summary", "No summary generated."))
 
 if __name__ == "__main__":
+    configure_cli_logging()
     app()
\ No newline at end of file
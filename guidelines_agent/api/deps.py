@@ -0,0 +1,39 @@
+"""FastAPI dependency providers for process-wide service singletons."""
+from functools import lru_cache
+from guidelines_agent.services import AgentService, DocumentService, GuidelineService, SessionService
+from guidelines_agent.services.ingest_batcher import IngestBatcher
+from guidelines_agent.core.config import Config
+
+
+@lru_cache(maxsize=1)
+def get_agent_service() -> AgentService:
+    """Shared AgentService; its agents are built once and reused by every request."""
+    return AgentService()
+
+
+@lru_cache(maxsize=1)
+def get_session_service() -> SessionService:
+    """Shared SessionService."""
+    return SessionService()
+
+
+@lru_cache(maxsize=1)
+def get_document_service() -> DocumentService:
+    """Shared DocumentService."""
+    return DocumentService()
+
+
+@lru_cache(maxsize=1)
+def get_guideline_service() -> GuidelineService:
+    """Shared GuidelineService."""
+    return GuidelineService()
+
+
+@lru_cache(maxsize=1)
+def get_ingest_batcher() -> IngestBatcher:
+    """Shared upload batcher so concurrent uploads land in the same batch window."""
+    return IngestBatcher(
+        get_agent_service(),
+        window_ms=Config.INGEST_BATCH_WINDOW_MS,
+        max_size=Config.INGEST_BATCH_MAX_SIZE,
+    )
@@ -1,5 +1,6 @@
 """Agent-related API routes (/agent/*)."""
-from fastapi import APIRouter, HTTPException, UploadFile, File, Request
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
+from fastapi.responses import StreamingResponse
 from guidelines_agent.api.schemas.agent_schemas import (
     AgentQueryRequest, AgentQueryResponse,
     AgentChatRequest, AgentChatResponse,
@@ -7,20 +8,24 @@ from guidelines_agent.api.schemas.agent_schemas import (
     AgentStatsResponse
 )
 from guidelines_agent.api.schemas.common_schemas import ErrorResponse
+from guidelines_agent.api.sse import sse_event
+from guidelines_agent.api.deps import get_agent_service, get_session_service, get_ingest_batcher
 from guidelines_agent.services import AgentService, SessionService
+from guidelines_agent.services.ingest_batcher import IngestBatcher
+from guidelines_agent.core.executor import run_blocking
 import logging
+import os
+import shutil
+import tempfile
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/agent", tags=["agent"])
 
-# Service instances
-agent_service = AgentService()
-session_service = SessionService()
-
-
 
 @router.post("/chat", response_model=AgentChatResponse)
-async def agent_chat(request: Request, chat_request: AgentChatRequest):
+async def agent_chat(request: Request, chat_request: AgentChatRequest,
+                     agent_service: AgentService = Depends(get_agent_service),
+                     session_service: SessionService = Depends(get_session_service)):
     """Chat with the agent using session-based conversation."""
     logger.info(f"Agent chat: {chat_request.message[:100]}...")
     
@@ -34,7 +39,7 @@ async def agent_chat(request: Request, chat_request: AgentChatRequest):
             session_id = session_result['session_id']
         
         # Process the chat message
-        result = agent_service.process_query(
+        result = await agent_service.aprocess_query(
             query=chat_request.message,
             session_id=session_id
         )
@@ -54,8 +59,35 @@ async def agent_chat(request: Request, chat_request: AgentChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def agent_chat_stream(request: Request, chat_request: AgentChatRequest,
+                            agent_service: AgentService = Depends(get_agent_service),
+                            session_service: SessionService = Depends(get_session_service)):
+    """Chat with the agent, streaming the answer as Server-Sent Events."""
+    logger.info(f"Agent chat stream: {chat_request.message[:100]}...")
+    
+    session_id = chat_request.session_id
+    if not session_id:
+        session_result = session_service.create_session()
+        if not session_result['success']:
+            raise HTTPException(status_code=500, detail="Failed to create session")
+        session_id = session_result['session_id']
+    
+    async def event_stream():
+        try:
+            async for text in agent_service.astream_query(chat_request.message, session_id=session_id):
+                yield sse_event({"text": text})
+            yield sse_event({"session_id": session_id}, event="done")
+        except Exception as e:
+            logger.error(f"Error in agent chat stream: {e}", exc_info=True)
+            yield sse_event({"error": str(e)}, event="error")
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.post("/invoke", response_model=AgentIngestionResponse)
-async def agent_invoke(request: Request, invoke_request: AgentInvokeRequest):
+async def agent_invoke(request: Request, invoke_request: AgentInvokeRequest,
+                       agent_service: AgentService = Depends(get_agent_service)):
     """General agent invocation for various actions."""
     logger.info(f"Agent invoke: {invoke_request.action}")
     
@@ -69,7 +101,8 @@ async def agent_invoke(request: Request, invoke_request: AgentInvokeRequest):
             if not pdf_path:
                 raise HTTPException(status_code=400, detail="pdf_path required for ingest action")
             
-            result = agent_service.process_document_ingestion(
+            result = await run_blocking(
+                agent_service.process_document_ingestion,
                 pdf_path=pdf_path,
                 doc_name=params.get("doc_name")
             )
@@ -89,7 +122,7 @@ async def agent_invoke(request: Request, invoke_request: AgentInvokeRequest):
         
         elif action == "stats":
             # Get system statistics
-            result = agent_service.get_system_stats()
+            result = await run_blocking(agent_service.get_system_stats)
             
             if not result['success']:
                 raise HTTPException(status_code=500, detail=result['error'])
@@ -110,8 +143,16 @@ async def agent_invoke(request: Request, invoke_request: AgentInvokeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _spool_upload(file: UploadFile) -> str:
+    """Copy an upload to a temporary PDF in fixed-size chunks and return its path."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        shutil.copyfileobj(file.file, tmp, 1 << 20)
+        return tmp.name
+
+
 @router.post("/ingest", response_model=AgentIngestionResponse)
-async def agent_ingest(request: Request, file: UploadFile = File(...)):
+async def agent_ingest(request: Request, file: UploadFile = File(...),
+                       ingest_batcher: IngestBatcher = Depends(get_ingest_batcher)):
     """Ingest a PDF document by uploading the file."""
     logger.info(f"Agent ingest file: {file.filename}")
     
@@ -122,6 +163,7 @@ async def agent_ingest(request: Request, file: UploadFile = File(...)):
         "progress": 0
     }
     
+    temp_file_path = None
     try:
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are supported")
@@ -129,16 +171,19 @@ async def agent_ingest(request: Request, file: UploadFile = File(...)):
         progress_status.update({"stage": "reading", "message": "Reading uploaded file...", "progress": 10})
         logger.info(f"Progress: {progress_status['message']}")
         
-        # Read file content
-        file_content = await file.read()
-        file_size_mb = len(file_content) / (1024 * 1024)
+        # Stream the upload to disk off the event loop instead of buffering it in memory
+        temp_file_path = await run_blocking(_spool_upload, file)
+        file_size_mb = os.path.getsize(temp_file_path) / (1024 * 1024)
         logger.info(f"File size: {file_size_mb:.2f} MB")
         
         progress_status.update({"stage": "processing", "message": "Processing document with AI...", "progress": 30})
         logger.info(f"Progress: {progress_status['message']}")
         
-        # Process the file
-        result = agent_service.process_file_upload_ingestion(file_content, file.filename)
+        # Process the file, pooled with any uploads arriving in the same batch window
+        # The batcher owns the file from here and removes it once ingested, even if this request is cancelled
+        pdf_path, temp_file_path = temp_file_path, None
+        future = await ingest_batcher.submit(pdf_path, file.filename)
+        result = await future
         
         if not result['success']:
             logger.error(f"Document ingestion failed: {result.get('error', 'Unknown error')}")
@@ -194,13 +239,19 @@ async def agent_ingest(request: Request, file: UploadFile = File(...)):
             embeddings_generated=0,
             validation_summary=f"Error during processing: {str(e)}"
         )
+    finally:
+        if temp_file_path and os.path.exists(temp_file_path):
+            try:
+                os.unlink(temp_file_path)
+            except OSError:
+                pass
 
 
 @router.get("/stats", response_model=AgentStatsResponse)
-async def get_agent_stats():
+async def get_agent_stats(agent_service: AgentService = Depends(get_agent_service)):
     """Get system statistics and status."""
     try:
-        result = agent_service.get_system_stats()
+        result = await run_blocking(agent_service.get_system_stats)
         
         if not result['success']:
             raise HTTPException(status_code=500, detail=result['error'])
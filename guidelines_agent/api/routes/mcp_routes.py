@@ -1,7 +1,12 @@
 """Internal MCP tool routes (/mcp/*) - Used by AI agents."""
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import asyncio
 import base64
+import binascii
+import hashlib
 from guidelines_agent.api.schemas.agent_schemas import (
+    AnswerInput,
     PlanQueryInput, PlanQueryOutput,
     QueryGuidelinesInput, 
     SummarizeInput,
@@ -10,28 +15,33 @@ from guidelines_agent.api.schemas.agent_schemas import (
     StampEmbeddingInput
 )
 from guidelines_agent.api.schemas.common_schemas import SuccessResponse, SearchResult
+from guidelines_agent.api.deps import get_document_service, get_guideline_service
 from guidelines_agent.services import DocumentService, GuidelineService
-from guidelines_agent.core.query_planner import generate_query_plan
+from guidelines_agent.core.query_planner import generate_query_plan, extract_plan_field, plan_top_k
 from guidelines_agent.core.summarize import generate_summary
+from guidelines_agent.core.executor import run_blocking, stream_blocking
+from guidelines_agent.api.sse import sse_event
 import logging
 import tempfile
-import os
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/mcp", tags=["mcp-tools"])
 
-# Service instances  
-document_service = DocumentService()
-guideline_service = GuidelineService()
+# Base64 characters decoded per write; a multiple of 4 so each slice decodes on its own
+BASE64_CHUNK_CHARS = 64 * 1024
+# /answer starts retrieval before the plan's top_k is known, fetching this many and trimming
+ANSWER_PREFETCH_TOP_K = 100
+# Decoded PDFs up to this size are kept in memory instead of a temporary file
+SPOOL_MAX_MEMORY_BYTES = 16 * 1024 * 1024
 
 
 @router.post("/plan_query", response_model=PlanQueryOutput)
 async def plan_query(input: PlanQueryInput):
     """Plan a user query into search strategy and summarization instructions."""
-    logger.info(f"Planning query: {input.user_query[:100]}...")
+    logger.info("Planning query: %.100s...", input.user_query)
     
     try:
-        plan = generate_query_plan(input.user_query)
+        plan = await run_blocking(generate_query_plan, input.user_query)
         
         if not plan:
             raise HTTPException(status_code=500, detail="Failed to generate query plan")
@@ -39,121 +49,255 @@ async def plan_query(input: PlanQueryInput):
         return PlanQueryOutput(
             search_query=plan.get('search_query', input.user_query),
             summary_instruction=plan.get('summary_instruction', input.user_query),
-            top_k=plan.get('top_k', 10)
+            top_k=plan_top_k(plan, 10)
         )
         
     except Exception as e:
-        logger.error(f"Error planning query: {e}", exc_info=True)
+        logger.error("Error planning query: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/query_guidelines")
-async def query_guidelines(input: QueryGuidelinesInput):
+@router.post("/query_guidelines", response_class=ORJSONResponse)
+async def query_guidelines(input: QueryGuidelinesInput,
+                           guideline_service: GuidelineService = Depends(get_guideline_service)):
     """Query guidelines using semantic or text search."""
-    logger.info(f"Querying guidelines: {input.query_text[:50]}...")
+    logger.info("Querying guidelines: %.50s...", input.query_text)
     
     try:
         # Determine portfolio filter
         portfolio_ids = [input.portfolio_id] if input.portfolio_id else None
         
         # Perform search
-        search_results = guideline_service.search_guidelines(
+        search_results = await run_blocking(
+            guideline_service.search_guidelines,
             query_text=input.query_text,
             portfolio_ids=portfolio_ids,
             top_k=input.top_k,
             use_semantic=True  # Default to semantic search
         )
         
-        # Convert to API format
+        # Convert to API format; serialized straight to JSON, skipping response model validation
         results = [result.to_dict() for result in search_results]
         
-        return SuccessResponse(
-            success=True,
-            data={
+        return ORJSONResponse({
+            "success": True,
+            "message": f"Found {len(results)} guidelines",
+            "data": {
                 "results": results,
                 "total_found": len(results)
-            },
-            message=f"Found {len(results)} guidelines"
-        )
+            }
+        })
         
     except Exception as e:
-        logger.error(f"Error querying guidelines: {e}", exc_info=True)
+        logger.error("Error querying guidelines: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/summarize")
+@router.post("/summarize", response_class=ORJSONResponse)
 async def summarize_guidelines(input: SummarizeInput):
     """Summarize guideline search results for a user question."""
-    logger.info(f"Summarizing for question: {input.question[:50]}...")
+    logger.info("Summarizing for question: %.50s...", input.question)
     
     try:
         # Convert sources list to context string
         context = "\n\n".join(input.sources)
         
         # Generate summary
-        summary = generate_summary(input.question, context)
+        summary = await run_blocking(generate_summary, input.question, context)
         
         if not summary:
             raise HTTPException(status_code=500, detail="Failed to generate summary")
         
-        return SuccessResponse(
-            success=True,
-            data={
+        return ORJSONResponse({
+            "success": True,
+            "message": "Summary generated successfully",
+            "data": {
                 "summary": summary,
                 "sources_count": len(input.sources)
-            },
-            message="Summary generated successfully"
-        )
+            }
+        })
         
     except Exception as e:
-        logger.error(f"Error generating summary: {e}", exc_info=True)
+        logger.error("Error generating summary: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/extract_guidelines", response_model=ExtractGuidelinesOutput)
-async def extract_guidelines(input: ExtractGuidelinesInput):
-    """Extract guidelines from uploaded PDF bytes."""
-    logger.info(f"Extracting guidelines from document: {input.doc_name}")
+@router.post("/summarize/stream")
+async def summarize_guidelines_stream(input: SummarizeInput):
+    """Summarize guideline search results, streaming the summary as Server-Sent Events."""
+    logger.info("Streaming summary for question: %.50s...", input.question)
     
-    temp_file = None
-    try:
-        # Decode base64 PDF content
+    context = "\n\n".join(input.sources)
+    
+    async def event_stream():
         try:
-            pdf_bytes = base64.b64decode(input.pdf_bytes_base64)
+            async for text in stream_blocking(generate_summary, input.question, context):
+                yield sse_event({"token": text})
+            yield sse_event({"sources_count": len(input.sources)}, event="done")
         except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid base64 content: {e}")
+            logger.error("Error streaming summary: %s", e, exc_info=True)
+            yield sse_event({"error": str(e)}, event="error")
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.post("/answer")
+async def answer(input: AnswerInput,
+                 guideline_service: GuidelineService = Depends(get_guideline_service)):
+    """Plan, search and summarize in one call, streaming progress and the answer as Server-Sent Events.
+    
+    Retrieval starts as soon as the streamed plan contains its search query, overlapping the
+    rest of planning. Emits plan, results and token events, then done (or error).
+    """
+    logger.info("Answering query: %.100s...", input.user_query)
+    portfolio_ids = [input.portfolio_id] if input.portfolio_id else None
+    
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        plan_text = []
+        prefetched = {}
+        prefetch_started = False
         
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            temp_file.write(pdf_bytes)
-            temp_file_path = temp_file.name
+        def search(query_text: str, top_k: int):
+            return run_blocking(guideline_service.search_guidelines, query_text=query_text,
+                                portfolio_ids=portfolio_ids, top_k=top_k, use_semantic=True)
         
-        # Extract guidelines
-        result = document_service.extract_guidelines_from_pdf(temp_file_path)
+        def start_prefetch(query_text: str) -> None:
+            prefetched[query_text] = asyncio.ensure_future(search(query_text, ANSWER_PREFETCH_TOP_K))
         
-        return ExtractGuidelinesOutput(
-            is_valid=result.is_valid,
-            validation_summary=result.validation_summary,
-            guidelines=result.guidelines,
-            portfolio_info=result.portfolio_info
-        )
+        def on_plan_chunk(text: str) -> None:
+            # Runs on the planner's worker thread; hands the search query to the loop once complete
+            nonlocal prefetch_started
+            plan_text.append(text)
+            if not prefetch_started:
+                query_text = extract_plan_field("".join(plan_text), "search_query")
+                if query_text:
+                    prefetch_started = True
+                    loop.call_soon_threadsafe(start_prefetch, query_text)
+        
+        try:
+            plan = await run_blocking(generate_query_plan, input.user_query, on_chunk=on_plan_chunk)
+            if not plan or "error" in plan:
+                plan = {}
+            search_query = plan.get("search_query") or input.user_query
+            summary_instruction = plan.get("summary_instruction") or input.user_query
+            top_k = plan_top_k(plan, 10)
+            yield sse_event({"search_query": search_query, "summary_instruction": summary_instruction,
+                             "top_k": top_k}, event="plan")
+            
+            # Reuse the prefetched search unless the final plan changed the query or needs more rows
+            task = prefetched.get(search_query)
+            if task is not None and top_k <= ANSWER_PREFETCH_TOP_K:
+                search_results = (await task)[:top_k]
+            else:
+                search_results = await search(search_query, top_k)
+            results = [result.to_dict() for result in search_results]
+            yield sse_event({"results": results, "total_found": len(results)}, event="results")
+            
+            context = "\n---\n".join(
+                f"Guideline: {r['guideline']} (Provenance: {r['provenance']})" for r in results
+            )
+            async for text in stream_blocking(generate_summary, summary_instruction, context):
+                yield sse_event({"token": text})
+            yield sse_event({"sources_count": len(results)}, event="done")
+        except Exception as e:
+            logger.error("Error answering query: %s", e, exc_info=True)
+            yield sse_event({"error": str(e)}, event="error")
+        finally:
+            for task in prefetched.values():
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # An unused prefetch's failure was never the answer's problem
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def _decode_base64_to_file(data: str, dest):
+    """Decode base64 text into a file slice by slice, never holding the whole PDF in memory.
+    
+    Returns the hashlib SHA-256 object fed each slice as it is written, which callers pass
+    on as content_digest to key the extraction cache.
+    """
+    digest = hashlib.sha256()
+    carry = ""
+    for start in range(0, len(data), BASE64_CHUNK_CHARS):
+        # Line breaks in MIME-style base64 would shift the 4-character alignment
+        piece = carry + "".join(data[start:start + BASE64_CHUNK_CHARS].split())
+        cut = len(piece) - len(piece) % 4
+        decoded = base64.b64decode(piece[:cut], validate=True)
+        digest.update(decoded)
+        dest.write(decoded)
+        carry = piece[cut:]
+    if carry:
+        raise binascii.Error("Incorrect padding")
+    return digest
+
+
+def _extract_from_stream(document_service: DocumentService, fileobj, name: str,
+                         content_digest=None, force_refresh: bool = False) -> ExtractGuidelinesOutput:
+    """Run guideline extraction on a seekable PDF file object."""
+    result = document_service.extract_guidelines_from_stream(fileobj, name, content_digest, force_refresh)
+    
+    return ExtractGuidelinesOutput(
+        is_valid=result.is_valid,
+        validation_summary=result.validation_summary,
+        guidelines=result.guidelines,
+        portfolio_info=result.portfolio_info
+    )
+
+
+@router.post("/extract_guidelines", response_model=ExtractGuidelinesOutput)
+async def extract_guidelines(input: ExtractGuidelinesInput,
+                             document_service: DocumentService = Depends(get_document_service)):
+    """Extract guidelines from uploaded PDF bytes.
+    
+    A PDF already extracted with the same prompt and model is answered from the extraction
+    cache unless force_refresh is set.
+    Deprecated: base64 inflates the request by a third; prefer /extract_guidelines/upload.
+    """
+    logger.info("Extracting guidelines from document: %s", input.doc_name)
+    
+    try:
+        # Small PDFs stay in memory, large ones spill to disk; either way the file is removed on close
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES) as pdf_file:
+            try:
+                content_digest = await run_blocking(_decode_base64_to_file, input.pdf_bytes_base64, pdf_file)
+            except (binascii.Error, ValueError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid base64 content: {e}")
+            
+            # Extract guidelines; the digest is the cache key, so duplicates skip the LLM call
+            return await run_blocking(_extract_from_stream, document_service, pdf_file, input.doc_name,
+                                      content_digest, input.force_refresh)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error extracting guidelines: {e}", exc_info=True)
+        logger.error("Error extracting guidelines: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/extract_guidelines/upload", response_model=ExtractGuidelinesOutput)
+async def extract_guidelines_upload(file: UploadFile = File(...), doc_name: str = Form(None),
+                                    force_refresh: bool = Form(False),
+                                    document_service: DocumentService = Depends(get_document_service)):
+    """Extract guidelines from a PDF sent as a multipart upload."""
+    doc_name = doc_name or file.filename
+    logger.info("Extracting guidelines from uploaded document: %s", doc_name)
+    
+    try:
+        # The upload is already spooled by the server, so extract from it directly
+        return await run_blocking(_extract_from_stream, document_service, file.file, doc_name,
+                                  None, force_refresh)
+        
+    except Exception as e:
+        logger.error("Error extracting guidelines: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Clean up temporary file
-        if temp_file and os.path.exists(temp_file.name):
-            try:
-                os.unlink(temp_file.name)
-            except:
-                pass
 
 
 @router.post("/persist_guidelines")
-async def persist_guidelines(input: PersistGuidelinesInput):
+async def persist_guidelines(input: PersistGuidelinesInput,
+                             guideline_service: GuidelineService = Depends(get_guideline_service)):
     """Persist extracted guidelines to the database."""
     logger.info("Persisting extracted guidelines")
     
@@ -169,7 +313,8 @@ async def persist_guidelines(input: PersistGuidelinesInput):
         )
         
         # Process the extraction (saves portfolio, document, guidelines)
-        result = guideline_service.process_full_extraction(
+        result = await run_blocking(
+            guideline_service.process_full_extraction,
             extraction_result, 
             doc_name=input.data.get('doc_name', 'Unknown Document')
         )
@@ -192,17 +337,18 @@ async def persist_guidelines(input: PersistGuidelinesInput):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error persisting guidelines: {e}", exc_info=True)
+        logger.error("Error persisting guidelines: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/stamp_embedding")
-async def stamp_embeddings(input: StampEmbeddingInput):
+async def stamp_embeddings(input: StampEmbeddingInput,
+                           guideline_service: GuidelineService = Depends(get_guideline_service)):
     """Generate embeddings for guidelines that don't have them."""
     logger.info("Generating missing embeddings")
     
     try:
-        result = guideline_service.generate_missing_embeddings(input.limit)
+        result = await guideline_service.agenerate_missing_embeddings(input.limit)
         
         if not result['success']:
             raise HTTPException(status_code=500, detail=result['error'])
@@ -211,7 +357,8 @@ async def stamp_embeddings(input: StampEmbeddingInput):
             success=True,
             data={
                 "processed": result['processed'],
-                "total_found": result.get('total_found', 0)
+                "total_found": result.get('total_found', 0),
+                "deferred": result.get('deferred', 0)
             },
             message=result['message']
         )
@@ -219,5 +366,5 @@ async def stamp_embeddings(input: StampEmbeddingInput):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error stamping embeddings: {e}", exc_info=True)
+        logger.error("Error stamping embeddings: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
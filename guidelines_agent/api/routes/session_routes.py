@@ -1,17 +1,17 @@
 """Session management API routes (/sessions/*)."""
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
-from guidelines_agent.api.schemas.common_schemas import SuccessResponse, ErrorResponse
+from guidelines_agent.api.schemas.common_schemas import SuccessResponse, ErrorResponse, SUCCESS_FIELDS
+from guidelines_agent.api.deps import get_session_service
+from guidelines_agent.core.executor import run_blocking
 from guidelines_agent.services import SessionService
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
-# Service instance
-session_service = SessionService()
-
 
 # --- Request/Response Schemas ---
 
@@ -49,12 +49,13 @@ class SessionStatsResponse(SuccessResponse):
 # --- Route Handlers ---
 
 @router.post("", response_model=CreateSessionResponse)
-async def create_session(request: CreateSessionRequest):
+async def create_session(request: CreateSessionRequest,
+                         session_service: SessionService = Depends(get_session_service)):
     """Create a new user session."""
     logger.info("Creating new session")
     
     try:
-        result = session_service.create_session(request.user_id)
+        result = await run_blocking(session_service.create_session, request.user_id)
         
         if not result['success']:
             raise HTTPException(status_code=500, detail=result['error'])
@@ -66,123 +67,126 @@ async def create_session(request: CreateSessionRequest):
         )
         
     except Exception as e:
-        logger.error(f"Error creating session: {e}", exc_info=True)
+        logger.error("Error creating session: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{session_id}", response_model=SessionInfoResponse)
-async def get_session_info(session_id: str):
+@router.get("/{session_id}", response_model=SessionInfoResponse, response_class=ORJSONResponse)
+async def get_session_info(session_id: str,
+                           session_service: SessionService = Depends(get_session_service)):
     """Get session information and current context."""
-    logger.info(f"Getting session info: {session_id}")
+    logger.info("Getting session info: %s", session_id)
     
     try:
-        result = session_service.get_session_info(session_id)
+        result = await run_blocking(session_service.get_session_info, session_id)
         
         if not result['success']:
             raise HTTPException(status_code=404, detail=result['error'])
         
-        return SessionInfoResponse(
-            success=True,
-            session=result['session'],
-            message="Session info retrieved"
-        )
+        return ORJSONResponse({
+            **SUCCESS_FIELDS,
+            "session": result['session'],
+            "message": "Session info retrieved"
+        })
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting session info: {e}", exc_info=True)
+        logger.error("Error getting session info: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{session_id}/history", response_model=SessionHistoryResponse)
-async def get_session_history(session_id: str, limit: Optional[int] = None):
+@router.get("/{session_id}/history", response_model=SessionHistoryResponse,
+            response_class=ORJSONResponse)
+async def get_session_history(session_id: str, limit: Optional[int] = None,
+                              session_service: SessionService = Depends(get_session_service)):
     """Get session conversation history."""
-    logger.info(f"Getting session history: {session_id}")
+    logger.info("Getting session history: %s", session_id)
     
     try:
-        result = session_service.get_session_history(session_id, limit)
+        result = await run_blocking(session_service.get_session_history, session_id, limit)
         
         if not result['success']:
             raise HTTPException(status_code=404, detail=result['error'])
         
-        return SessionHistoryResponse(
-            success=True,
-            session_id=result['session_id'],
-            interactions=result['interactions'],
-            message="Session history retrieved"
-        )
+        # Histories can be long; serialize the service's plain dicts directly
+        return ORJSONResponse({
+            **SUCCESS_FIELDS,
+            "message": "Session history retrieved",
+            "session_id": result['session_id'],
+            "interactions": result['interactions']
+        })
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting session history: {e}", exc_info=True)
+        logger.error("Error getting session history: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.put("/{session_id}/context", response_model=SuccessResponse)
-async def update_session_context(session_id: str, request: UpdateSessionContextRequest):
+@router.put("/{session_id}/context", response_model=SuccessResponse, response_class=ORJSONResponse)
+async def update_session_context(session_id: str, request: UpdateSessionContextRequest,
+                                 session_service: SessionService = Depends(get_session_service)):
     """Update session context with new information."""
-    logger.info(f"Updating session context: {session_id}")
+    logger.info("Updating session context: %s", session_id)
     
     try:
-        result = session_service.update_session_context(session_id, request.context_update)
+        result = await run_blocking(session_service.update_session_context, session_id, request.context_update)
         
         if not result['success']:
             raise HTTPException(status_code=404, detail=result['error'])
         
-        return SuccessResponse(
-            success=True,
-            message=result['message'],
-            data={"context": result['context']}
-        )
+        return ORJSONResponse({
+            **SUCCESS_FIELDS,
+            "message": result['message'],
+            "data": {"context": result['context']}
+        })
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating session context: {e}", exc_info=True)
+        logger.error("Error updating session context: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.delete("/{session_id}", response_model=SuccessResponse)
-async def delete_session(session_id: str):
+@router.delete("/{session_id}", response_model=SuccessResponse, response_class=ORJSONResponse)
+async def delete_session(session_id: str,
+                         session_service: SessionService = Depends(get_session_service)):
     """Delete a session."""
-    logger.info(f"Deleting session: {session_id}")
+    logger.info("Deleting session: %s", session_id)
     
     try:
-        result = session_service.delete_session(session_id)
+        result = await run_blocking(session_service.delete_session, session_id)
         
         if not result['success']:
             raise HTTPException(status_code=404, detail=result['error'])
         
-        return SuccessResponse(
-            success=True,
-            message=result['message']
-        )
+        return ORJSONResponse({**SUCCESS_FIELDS, "message": result['message']})
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error deleting session: {e}", exc_info=True)
+        logger.error("Error deleting session: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("", response_model=SessionStatsResponse)
-async def get_session_stats():
+@router.get("", response_model=SessionStatsResponse, response_class=ORJSONResponse)
+async def get_session_stats(session_service: SessionService = Depends(get_session_service)):
     """Get session statistics."""
     logger.info("Getting session statistics")
     
     try:
-        result = session_service.get_active_sessions()
+        result = await run_blocking(session_service.get_active_sessions)
         
         if not result['success']:
             raise HTTPException(status_code=500, detail=result['error'])
         
-        return SessionStatsResponse(
-            success=True,
-            stats=result['stats'],
-            message="Session statistics retrieved"
-        )
+        return ORJSONResponse({
+            **SUCCESS_FIELDS,
+            "stats": result['stats'],
+            "message": "Session statistics retrieved"
+        })
         
     except Exception as e:
-        logger.error(f"Error getting session stats: {e}", exc_info=True)
+        logger.error("Error getting session stats: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,7 +1,7 @@
 """Pydantic schemas for agent-related API endpoints."""
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
-from .common_schemas import SuccessResponse, ErrorResponse, SearchResult
+from .common_schemas import FROZEN, SuccessResponse, ErrorResponse, SearchResult
 
 
 # --- Request Schemas ---
@@ -56,6 +56,12 @@ class AgentStatsResponse(SuccessResponse):
 
 # --- Internal Tool Schemas (MCP) ---
 
+class AnswerInput(BaseModel):
+    """Input for the fused plan/search/summarize tool."""
+    user_query: str = Field(..., description="The natural language user query")
+    portfolio_id: Optional[str] = None
+
+
 class PlanQueryInput(BaseModel):
     """Input for query planning tool."""
     user_query: str = Field(..., description="The natural language user query")
@@ -63,6 +69,8 @@ class PlanQueryInput(BaseModel):
 
 class PlanQueryOutput(BaseModel):
     """Output from query planning tool."""
+    model_config = FROZEN
+    
     search_query: str
     summary_instruction: str
     top_k: int
@@ -85,10 +93,13 @@ class ExtractGuidelinesInput(BaseModel):
     """Input for guideline extraction tool."""
     pdf_bytes_base64: str
     doc_name: str
+    force_refresh: bool = False  # Re-run extraction even if this PDF was extracted before
 
 
 class ExtractGuidelinesOutput(BaseModel):
     """Output from guideline extraction."""
+    model_config = FROZEN
+    
     is_valid: bool
     validation_summary: str
     guidelines: List[Dict[str, Any]]
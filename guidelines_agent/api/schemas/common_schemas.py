@@ -1,18 +1,31 @@
 """Common Pydantic schemas used across API endpoints."""
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+# Response models are built once per request and never modified afterwards; every
+# construction site passes named fields, so an unknown one is a bug, not client input
+FROZEN = ConfigDict(frozen=True, extra='forbid')
+
 
 class SuccessResponse(BaseModel):
     """Standard success response format."""
+    model_config = FROZEN
+    
     success: bool = True
     message: Optional[str] = None
     data: Optional[Dict[str, Any]] = None
 
 
+# SuccessResponse's fields on the happy path, for routes that return ORJSONResponse
+# directly; merge the per-request fields into a copy: {**SUCCESS_FIELDS, ...}
+SUCCESS_FIELDS = {"success": True, "message": None, "data": None}
+
+
 class ErrorResponse(BaseModel):
     """Standard error response format."""
+    model_config = FROZEN
+    
     success: bool = False
     error: str
     details: Optional[Dict[str, Any]] = None
@@ -54,6 +67,8 @@ class GuidelineInfo(BaseModel):
 
 class SearchResult(BaseModel):
     """Search result item schema."""
+    model_config = FROZEN
+    
     rank: int
     similarity: Optional[float] = None
     portfolio_name: str
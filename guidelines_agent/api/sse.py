@@ -0,0 +1,8 @@
+"""Server-Sent Events helpers shared by streaming routes."""
+import json
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format a payload as a Server-Sent Events frame."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
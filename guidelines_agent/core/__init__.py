@@ -1 +0,0 @@
-from . import custom_logging
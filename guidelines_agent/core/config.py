@@ -7,6 +7,7 @@ Centralized configuration for LLM providers, models, and application settings.
 """
 
 import os
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from enum import Enum
 from dataclasses import dataclass
@@ -48,6 +49,12 @@ class Config:
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///guidelines.db")
     GENERATIVE_MODEL = "models/gemini-pro-latest"  # Using latest available model
     
+    # Per-step Gemini models: the agent's reasoning loop keeps the pro model while
+    # planning and summarization, which are simple prompt-following tasks, use flash
+    REASONING_MODEL = os.getenv("REASONING_MODEL", GENERATIVE_MODEL)
+    PLANNER_MODEL = os.getenv("PLANNER_MODEL", "models/gemini-flash-latest")
+    SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "models/gemini-flash-latest")
+    
     # LLM Provider Configurations
     LLM_CONFIGS = {
         LLMProvider.GEMINI: LLMConfig(
@@ -88,7 +95,76 @@ class Config:
     LLM_DEBUG_ENABLED = os.getenv("LLM_DEBUG", "true").lower() == "true"
     LLM_REQUEST_LOGGING = os.getenv("LLM_REQUEST_LOGGING", "true").lower() == "true"
     LLM_RESPONSE_LOGGING = os.getenv("LLM_RESPONSE_LOGGING", "true").lower() == "true"
-    
+
+    # Attempts per LLM call; transient provider errors are retried with jittered backoff
+    LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+    # Requests that still fail with a transient error move on to the next configured provider
+    LLM_FAILOVER_ENABLED = os.getenv("LLM_FAILOVER_ENABLED", "true").lower() == "true"
+
+    # Connection pool for the OpenAI client; kept-alive connections skip TLS handshakes
+    LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "32"))
+    LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "16"))
+    LLM_HTTP_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "60"))
+    LLM_HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+
+    # LLM Response Cache (opt-in; exact-match on provider, model, sampling settings and prompts)
+    LLM_RESPONSE_CACHE_ENABLED = os.getenv("LLM_RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    LLM_RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("LLM_RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    LLM_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "512"))
+    # Requests sampled above this temperature are expected to vary and are never cached
+    LLM_RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_RESPONSE_CACHE_MAX_TEMPERATURE", "0.2"))
+
+    # Semantic Cache Settings (agent query answers keyed on query embeddings)
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+
+    # Query routing: "auto" sends direct questions without conversation history to the
+    # fixed plan/search/summarize graph, "agent" always uses the tool-calling agent
+    QUERY_PIPELINE = os.getenv("QUERY_PIPELINE", "auto").lower()
+
+    # Search Result Cache (opt-in; guideline search results keyed on query embeddings)
+    SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "false").lower() == "true"
+    SEARCH_CACHE_THRESHOLD = float(os.getenv("SEARCH_CACHE_THRESHOLD", "0.95"))
+    SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "600"))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256"))
+
+    # Vector search: when enabled, candidates are first ranked by Hamming distance on
+    # binary-quantized embeddings (pgvector binary_quantize), then the top
+    # SEARCH_RERANK_FACTOR * top_k are re-ranked with the full-precision vectors
+    SEARCH_BINARY_PREFILTER = os.getenv("SEARCH_BINARY_PREFILTER", "false").lower() == "true"
+    SEARCH_RERANK_FACTOR = int(os.getenv("SEARCH_RERANK_FACTOR", "4"))
+
+    # Maximum number of agent runs in flight at once across async API requests
+    MAX_CONCURRENT_AGENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_AGENT_REQUESTS", "32"))
+    # Worker threads for blocking service calls made from async routes
+    APP_EXECUTOR_WORKERS = int(os.getenv("APP_EXECUTOR_WORKERS", "32"))
+    # AnyIO thread limit for framework-managed blocking work (sync dependencies, upload file I/O)
+    MAX_BLOCKING_CONCURRENCY = int(os.getenv("MAX_BLOCKING_CONCURRENCY", "64"))
+
+    # Upload ingestion micro-batching: uploads queued together, plus any arriving within
+    # the window, share one embedding pass; a lone upload is ingested without waiting.
+    # Set the window to 0 to process every upload on its own
+    INGEST_BATCH_WINDOW_MS = int(os.getenv("INGEST_BATCH_WINDOW_MS", "500"))
+    INGEST_BATCH_MAX_SIZE = int(os.getenv("INGEST_BATCH_MAX_SIZE", "8"))
+
+    # Conversation history in prompts: recent turns verbatim, older turns summarized
+    SESSION_HISTORY_WINDOW_TURNS = int(os.getenv("SESSION_HISTORY_WINDOW_TURNS", "10"))
+    SESSION_SUMMARY_EVERY_TURNS = int(os.getenv("SESSION_SUMMARY_EVERY_TURNS", "5"))
+    SESSION_HISTORY_MAX_TOKENS = int(os.getenv("SESSION_HISTORY_MAX_TOKENS", "2048"))
+
+    # LangChain LLM cache for the agent chat model: "memory", "sqlite" or "none"
+    LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".langchain_cache.db")
+    # Entry cap for the "memory" backend; agent prompts carry tool results and history
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+
+    # Extraction Cache Settings (PDF extraction results keyed on content hash)
+    EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+    EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", ".build_cache/extractions")
+    EXTRACTION_CACHE_MEMORY_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MEMORY_ENTRIES", "256"))
+
     # Provider Priority (fallback order)
     PROVIDER_PRIORITY = [
         LLMProvider.GEMINI,
@@ -102,7 +178,10 @@ class Config:
         """Get LLM configuration for provider"""
         return cls.LLM_CONFIGS.get(provider)
     
+    # Provider availability depends only on the environment, so it is resolved once;
+    # call invalidate_caches() after changing API key variables (e.g. in tests)
     @classmethod
+    @lru_cache(maxsize=None)
     def get_default_provider(cls) -> LLMProvider:
         """Get default LLM provider based on availability"""
         for provider in cls.PROVIDER_PRIORITY:
@@ -112,6 +191,15 @@ class Config:
         return LLMProvider.MOCK
     
     @classmethod
+    def get_summarizer_model(cls, provider: LLMProvider) -> Optional[str]:
+        """Get the model for summarization calls; only Gemini has a dedicated lighter model"""
+        if provider == LLMProvider.GEMINI:
+            return cls.SUMMARIZER_MODEL
+        config = cls.get_llm_config(provider)
+        return config.model if config else None
+    
+    @classmethod
+    @lru_cache(maxsize=None)
     def is_provider_available(cls, provider: LLMProvider) -> bool:
         """Check if provider is available and configured"""
         if provider == LLMProvider.MOCK:
@@ -131,8 +219,30 @@ class Config:
     @classmethod
     def get_available_providers(cls) -> list[LLMProvider]:
         """Get list of available providers"""
-        return [provider for provider in cls.PROVIDER_PRIORITY 
-                if cls.is_provider_available(provider)]
+        return list(cls._available_providers())
+    
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _available_providers(cls) -> tuple:
+        return tuple(provider for provider in cls.PROVIDER_PRIORITY
+                     if cls.is_provider_available(provider))
+    
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _environment_vars(cls) -> tuple:
+        return (
+            ("GEMINI_API_KEY", bool(os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))),
+            ("OPENAI_API_KEY", bool(os.getenv("OPENAI_API_KEY"))),
+            ("ANTHROPIC_API_KEY", bool(os.getenv("ANTHROPIC_API_KEY"))),
+            ("DATABASE_URL", bool(os.getenv("DATABASE_URL"))),
+        )
+    
+    @classmethod
+    def invalidate_caches(cls) -> None:
+        """Forget cached provider availability so environment changes take effect."""
+        for cached in (cls.get_default_provider, cls.is_provider_available,
+                       cls._available_providers, cls._environment_vars):
+            cached.cache_clear()
     
     @classmethod
     def get_environment_info(cls) -> Dict[str, Any]:
@@ -142,14 +252,15 @@ class Config:
             "log_level": cls.LOG_LEVEL,
             "debug_mode": cls.DEBUG_MODE,
             "llm_debug_enabled": cls.LLM_DEBUG_ENABLED,
+            "semantic_cache_enabled": cls.SEMANTIC_CACHE_ENABLED,
+            "llm_response_cache_enabled": cls.LLM_RESPONSE_CACHE_ENABLED,
+            "search_cache_enabled": cls.SEARCH_CACHE_ENABLED,
+            "search_binary_prefilter": cls.SEARCH_BINARY_PREFILTER,
+            "app_executor_workers": cls.APP_EXECUTOR_WORKERS,
+            "max_blocking_concurrency": cls.MAX_BLOCKING_CONCURRENCY,
             "default_provider": cls.get_default_provider().value,
             "available_providers": [p.value for p in cls.get_available_providers()],
-            "environment_vars": {
-                "GEMINI_API_KEY": bool(os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")),
-                "OPENAI_API_KEY": bool(os.getenv("OPENAI_API_KEY")),
-                "ANTHROPIC_API_KEY": bool(os.getenv("ANTHROPIC_API_KEY")),
-                "DATABASE_URL": bool(os.getenv("DATABASE_URL")),
-            }
+            "environment_vars": dict(cls._environment_vars())
         }
 
 
@@ -1,6 +1,5 @@
 import logging
-from datetime import datetime
-from zoneinfo import ZoneInfo
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional, Union
 from uuid import UUID
 
@@ -11,15 +10,46 @@ from langchain_core.outputs import LLMResult
 
 logger = logging.getLogger(__name__)
 
+# Longest prompt/output payload written by the callback handler, in characters
+LOG_PAYLOAD_MAX_CHARS = 2000
+
+
+def _clip(value: Any, limit: int = LOG_PAYLOAD_MAX_CHARS) -> str:
+    """Render a payload for logging, truncated so large prompts don't flood the log."""
+    text = str(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
 class ISTFormatter(logging.Formatter):
     """A custom logging formatter to display timestamps in IST."""
+    # Asia/Kolkata has a fixed +05:30 offset with no DST, so one tz object serves every record
+    _IST = timezone(timedelta(hours=5, minutes=30), "IST")
+
+    # (whole second, formatted "YYYY-MM-DD HH:MM:SS") of the last record; records in the
+    # same second only append their milliseconds. Kept as one tuple so threads swap it atomically
+    _second_prefix = (None, "")
+
     def formatTime(self, record, datefmt=None):
-        dt = datetime.fromtimestamp(record.created, ZoneInfo("Asia/Kolkata"))
         if datefmt:
-            s = dt.strftime(datefmt)
-        else:
-            s = dt.strftime('%Y-%m-%d %H:%M:%S,%f')[:-3] + " " + dt.tzname()
-        return s
+            return datetime.fromtimestamp(record.created, self._IST).strftime(datefmt)
+        second = int(record.created)
+        cached_second, prefix = self._second_prefix
+        if second != cached_second:
+            dt = datetime.fromtimestamp(second, self._IST)
+            prefix = (f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} "
+                      f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}")
+            self._second_prefix = (second, prefix)
+        return f"{prefix},{int(record.msecs):03d} IST"
+
+def configure_cli_logging(level: int = logging.INFO) -> None:
+    """Configures the root logger with IST timestamps; for command-line entry points only."""
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    if not root_logger.hasHandlers():
+        handler = logging.StreamHandler()
+        handler.setFormatter(ISTFormatter("%(asctime)s - %(levelname)s - %(message)s"))
+        root_logger.addHandler(handler)
 
 class CustomCallbackHandler(BaseCallbackHandler):
     """A custom callback handler to log AgentExecutor steps."""
@@ -27,44 +57,52 @@ class CustomCallbackHandler(BaseCallbackHandler):
     def on_llm_start(
         self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any
     ) -> None:
-        logger.info(f"LLM Start: Prompts: {prompts}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("LLM Start: Prompts: %s", _clip(prompts))
 
     def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
-        logger.info(f"LLM End: Response: {response.generations}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("LLM End: Response: %s", _clip(response.generations))
 
     def on_llm_error(
         self, error: Union[Exception, KeyboardInterrupt], **kwargs: Any
     ) -> None:
-        logger.error(f"LLM Error: {error}", exc_info=True)
+        logger.error("LLM Error: %s", error, exc_info=True)
 
     def on_chain_start(
         self, serialized: Dict[str, Any], inputs: Dict[str, Any], **kwargs: Any
     ) -> None:
-        logger.info(f"Chain Start: Inputs: {inputs}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Chain Start: Inputs: %s", _clip(inputs))
 
     def on_chain_end(self, outputs: Dict[str, Any], **kwargs: Any) -> None:
-        logger.info(f"Chain End: Outputs: {outputs}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Chain End: Outputs: %s", _clip(outputs))
 
     def on_chain_error(
         self, error: Union[Exception, KeyboardInterrupt], **kwargs: Any
     ) -> None:
-        logger.error(f"Chain Error: {error}", exc_info=True)
+        logger.error("Chain Error: %s", error, exc_info=True)
 
     def on_tool_start(
         self, serialized: Dict[str, Any], input_str: str, **kwargs: Any
     ) -> None:
-        logger.info(f"Tool Start: Input: {input_str}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Tool Start: Input: %s", _clip(input_str))
 
     def on_tool_end(self, output: str, **kwargs: Any) -> None:
-        logger.info(f"Tool End: Output: {output}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Tool End: Output: %s", _clip(output))
 
     def on_tool_error(
         self, error: Union[Exception, KeyboardInterrupt], **kwargs: Any
     ) -> None:
-        logger.error(f"Tool Error: {error}", exc_info=True)
+        logger.error("Tool Error: %s", error, exc_info=True)
 
     def on_agent_action(self, action: AgentAction, **kwargs: Any) -> Any:
-        logger.info(f"Agent Action: Tool={action.tool}, Input={action.tool_input}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Agent Action: Tool=%s, Input=%s", action.tool, _clip(action.tool_input))
 
     def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> Any:
-        logger.info(f"Agent Finish: Output={finish.return_values}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Agent Finish: Output=%s", _clip(finish.return_values))
@@ -0,0 +1,82 @@
+"""
+Query Embedding Cache
+=====================
+
+Process-wide LRU cache of query embeddings. Keys are the task type plus the
+case- and whitespace-normalized query text, so repeated questions reuse the
+vector instead of calling the embedding API again.
+"""
+
+import logging
+import threading
+from typing import List, Optional
+
+from cachetools import LRUCache
+
+from guidelines_agent.core.embedding_service import (
+    EmbeddingError, aembed, generate_embeddings,
+)
+
+logger = logging.getLogger(__name__)
+
+_cache: LRUCache = LRUCache(maxsize=4096)
+_lock = threading.Lock()
+
+
+def _normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def get_query_embedding(
+    text: str, task_type: str = "RETRIEVAL_QUERY", use_cache: bool = True
+) -> Optional[List[float]]:
+    """Returns the embedding for a query, served from the cache when possible."""
+    key = (task_type, _normalize_query(text))
+    if use_cache:
+        with _lock:
+            cached = _cache.get(key)
+        if cached is not None:
+            logger.debug("Embedding cache hit for query: '%s'", text)
+            return list(cached)
+
+    try:
+        embeddings = generate_embeddings(texts=[text], task_type=task_type)
+    except EmbeddingError as e:
+        logger.warning("Query embedding failed: %s", e)
+        return None
+    if not embeddings:
+        return None
+
+    with _lock:
+        _cache[key] = tuple(embeddings[0])
+    return embeddings[0]
+
+
+async def aget_query_embedding(
+    text: str, task_type: str = "RETRIEVAL_QUERY"
+) -> Optional[List[float]]:
+    """Async variant of get_query_embedding; cache misses from concurrent callers share a request."""
+    key = (task_type, _normalize_query(text))
+    with _lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        logger.debug("Embedding cache hit for query: '%s'", text)
+        return list(cached)
+
+    try:
+        embedding = await aembed(text, task_type)
+    except EmbeddingError as e:
+        logger.warning("Query embedding failed: %s", e)
+        return None
+    if not embedding:
+        return None
+
+    with _lock:
+        _cache[key] = tuple(embedding)
+    return list(embedding)
+
+
+def clear_embedding_cache() -> None:
+    """Drops all cached query embeddings."""
+    with _lock:
+        _cache.clear()
@@ -1,17 +1,97 @@
+import asyncio
+import functools
+import math
 import os
-import google.generativeai as genai
-from typing import List
+import threading
+import logging
+from typing import Dict, List, Tuple
+
+from tenacity import (
+    retry, retry_if_exception, stop_after_attempt, wait_exponential,
+)
+
+from guidelines_agent.core.executor import run_blocking
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # --- Configuration ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Every vector this module returns is L2-normalized, so stored and query embeddings
+# compare by inner product alone (pgvector's <#>, vector_ip_ops indexes)
 EMBEDDING_MODEL = "models/embedding-001"
+EMBEDDING_DIMENSIONS = 768
+EMBEDDING_BATCH_SIZE = 100  # Maximum texts per batch embedding request
+COALESCE_WINDOW_SECONDS = 0.005  # How long concurrent single-text embeds wait to share a request
+COALESCE_MAX_BATCH = 64
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))  # Bulk batch requests in flight
+
+logger = logging.getLogger(__name__)
+
+
+# The Gemini SDK pulls in gRPC, protobuf and auth (~0.5s); it is imported on first use so
+# modules that only need this one's constants or helpers stay cheap to import
+@functools.cache
+def _genai():
+    import google.generativeai as genai
+    return genai
+
+
+@functools.cache
+def _transient_errors() -> tuple:
+    """Failures worth retrying: the same request may succeed once quota or capacity frees up."""
+    from google.api_core import exceptions as google_exceptions
+    return (
+        TimeoutError,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+    )
+
+
+def _is_transient(error: BaseException) -> bool:
+    return isinstance(error, _transient_errors())
+
+
+class EmbeddingError(Exception):
+    """Raised when an embedding request fails; `retryable` marks transient failures."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+_initialized = False
+_init_lock = threading.Lock()
 
 
 def initialize_embedding_service():
-    """Initializes the connection to the embedding API."""
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY environment variable not set.")
-    genai.configure(api_key=GEMINI_API_KEY)
+    """Initializes the connection to the embedding API once per process."""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        if not GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY environment variable not set.")
+        _genai().configure(api_key=GEMINI_API_KEY)
+        _initialized = True
+
+
+def normalize_embeddings(vectors: List[List[float]]) -> List[List[float]]:
+    """Scales each vector to unit length; empty and zero vectors are returned unchanged."""
+    if np is not None and vectors and all(vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return (matrix / np.maximum(norms, 1e-12)).tolist()
+    normalized = []
+    for vector in vectors:
+        norm = math.sqrt(sum(x * x for x in vector))
+        normalized.append([x / norm for x in vector] if norm else list(vector))
+    return normalized
 
 
 def generate_embeddings(
@@ -26,19 +106,143 @@ def generate_embeddings(
         title: An optional title for document embeddings.
 
     Returns:
-        A list of embedding vectors.
+        A list of unit-length embedding vectors.
+
+    Raises:
+        EmbeddingError: If the request failed; transient errors are retried first.
     """
     initialize_embedding_service()
     try:
-        if title:
-            result = genai.embed_content(
-                model=EMBEDDING_MODEL, content=texts, task_type=task_type, title=title
-            )
-        else:
-            result = genai.embed_content(
-                model=EMBEDDING_MODEL, content=texts, task_type=task_type
-            )
-        return result["embedding"]
+        return normalize_embeddings(_embed_content(texts, task_type, title))
     except Exception as e:
-        print(f"Error generating embeddings: {e}")
-        return []
+        logger.exception("embedding batch failed size=%d task=%s", len(texts), task_type)
+        raise EmbeddingError(
+            f"Error generating embeddings: {e}",
+            retryable=_is_transient(e),
+        ) from e
+
+
+# Shared by the sync and async request paths; tenacity sleeps with asyncio.sleep for coroutines
+_retry_transient = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(min=0.5, max=4),
+    retry=retry_if_exception(_is_transient),
+    reraise=True,
+)
+
+
+@_retry_transient
+def _embed_content(texts: List[str], task_type: str, title: str = None) -> List[List[float]]:
+    kwargs = {"title": title} if title else {}
+    result = _genai().embed_content(
+        model=EMBEDDING_MODEL, content=texts, task_type=task_type, **kwargs
+    )
+    return result["embedding"]
+
+
+@_retry_transient
+async def _aembed_content(texts: List[str], task_type: str, title: str = None) -> List[List[float]]:
+    kwargs = {"title": title} if title else {}
+    result = await _genai().embed_content_async(
+        model=EMBEDDING_MODEL, content=texts, task_type=task_type, **kwargs
+    )
+    return result["embedding"]
+
+
+async def agenerate_embeddings_bulk(
+    texts: List[str], task_type: str, title: str = None,
+    concurrency: int = EMBEDDING_CONCURRENCY, batch_size: int = EMBEDDING_BATCH_SIZE
+) -> List[List[float]]:
+    """
+    Embeds many texts with the async API, sending up to `concurrency` batch requests at once.
+
+    Returns one unit-length vector per input text, in order.
+    Must run on the application's event loop, which the SDK's async client is bound to.
+
+    Raises:
+        EmbeddingError: If any batch failed; transient errors are retried first and
+            batches not yet sent are cancelled.
+    """
+    initialize_embedding_service()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed_batch(start: int) -> List[List[float]]:
+        batch = texts[start:start + batch_size]
+        async with semaphore:
+            embeddings = await _aembed_content(batch, task_type, title)
+        if len(embeddings) != len(batch):
+            raise ValueError(f"expected {len(batch)} embeddings for batch at {start}, got {len(embeddings)}")
+        return normalize_embeddings(embeddings)
+
+    tasks = [asyncio.ensure_future(embed_batch(i)) for i in range(0, len(texts), batch_size)]
+    try:
+        batches = await asyncio.gather(*tasks)
+    except Exception as e:
+        for task in tasks:
+            task.cancel()
+        logger.exception("bulk embedding failed size=%d task=%s", len(texts), task_type)
+        raise EmbeddingError(
+            f"Error generating embeddings: {e}",
+            retryable=_is_transient(e),
+        ) from e
+    return [embedding for batch in batches for embedding in batch]
+
+
+# --- Async coalescing ---
+# Single-text embeds issued concurrently from the event loop (e.g. parallel chat
+# requests) are gathered per task type and sent as one batch request.
+_pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+_flush_handles: Dict[str, asyncio.TimerHandle] = {}
+
+
+async def aembed(text: str, task_type: str) -> List[float]:
+    """Embeds one text, sharing an API request with other embeds in the same window.
+
+    Raises EmbeddingError if the shared batch request failed, like generate_embeddings.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    batch = _pending.setdefault(task_type, [])
+    batch.append((text, future))
+
+    if len(batch) >= COALESCE_MAX_BATCH:
+        _schedule_flush(loop, task_type, delay=None)
+    elif task_type not in _flush_handles:
+        _schedule_flush(loop, task_type, delay=COALESCE_WINDOW_SECONDS)
+    return await future
+
+
+def _schedule_flush(loop: asyncio.AbstractEventLoop, task_type: str, delay) -> None:
+    handle = _flush_handles.pop(task_type, None)
+    if handle is not None:
+        handle.cancel()
+    if delay is None:
+        loop.create_task(_flush(task_type))
+    else:
+        _flush_handles[task_type] = loop.call_later(
+            delay, lambda: loop.create_task(_flush(task_type))
+        )
+
+
+async def _flush(task_type: str) -> None:
+    """Sends the pending texts for a task type and resolves their futures."""
+    _flush_handles.pop(task_type, None)
+    batch = _pending.pop(task_type, [])
+    if not batch:
+        return
+
+    try:
+        embeddings = await run_blocking(generate_embeddings, [text for text, _ in batch], task_type)
+        if len(embeddings) != len(batch):
+            logger.error("embedding count mismatch: expected=%d got=%d task=%s",
+                         len(batch), len(embeddings), task_type)
+            raise EmbeddingError("embedding count mismatch")
+    except Exception as e:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(e)
+        return
+
+    for (_, future), embedding in zip(batch, embeddings):
+        if not future.done():
+            future.set_result(embedding)
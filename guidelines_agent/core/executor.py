@@ -0,0 +1,54 @@
+"""
+Bounded worker pool for blocking work called from async request handlers.
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable
+
+from guidelines_agent.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Sized to the provider's concurrency budget; extra calls queue instead of piling onto the LLM API
+APP_EXECUTOR = ThreadPoolExecutor(
+    max_workers=Config.APP_EXECUTOR_WORKERS,
+    thread_name_prefix="app-worker",
+)
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking call on the shared worker pool without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(APP_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+async def stream_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> AsyncIterator[str]:
+    """Run a blocking call that reports text through an on_chunk callback, yielding chunks as they arrive.
+
+    If the call streamed nothing (e.g. its provider cannot stream), its return value is yielded instead.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_chunk(text: str) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, text)
+
+    task = asyncio.ensure_future(run_blocking(func, *args, on_chunk=on_chunk, **kwargs))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+
+    streamed = False
+    while (text := await queue.get()) is not None:
+        if text:
+            streamed = True
+            yield text
+
+    result = await task
+    if not streamed and result:
+        yield result
+
+
+def shutdown_executor() -> None:
+    """Stop accepting work; calls already running finish in the background."""
+    APP_EXECUTOR.shutdown(wait=False, cancel_futures=True)
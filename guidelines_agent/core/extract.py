@@ -1,54 +1,40 @@
+import asyncio
 import os
 import logging
-from datetime import datetime, timezone, timedelta
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 import json
-import re
-from typing import Dict, Any
-from guidelines_agent.core.llm_providers import llm_manager, LLMProvider
+from typing import BinaryIO, Callable, Dict, Any, Iterator, List, Optional, Union
 from guidelines_agent.core.config import Config
+from guidelines_agent.core.executor import run_blocking
+from guidelines_agent.core.json_utils import (
+    JsonArrayItemScanner, JsonObjectScanner, extract_json_from_text
+)
+from guidelines_agent.core.extraction_cache import (
+    file_cache_key, stream_cache_key, digest_cache_key, load_cached_extraction, store_extraction
+)
 
-# --- Custom Logging Configuration ---
-# (Assuming ISTFormatter and logger setup remains the same)
-class ISTFormatter(logging.Formatter):
-    """A custom logging formatter to display timestamps in IST."""
-    def formatTime(self, record, datefmt=None):
-        utc_dt = datetime.fromtimestamp(record.created, tz=timezone.utc)
-        ist_tz = timezone(timedelta(hours=5, minutes=30))
-        ist_dt = utc_dt.astimezone(ist_tz)
-        if datefmt:
-            return ist_dt.strftime(datefmt)
-        return ist_dt.strftime("%Y-%m-%d %H:%M:%S,%f")[:-3]
-
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-if not logger.hasHandlers():
-    handler = logging.StreamHandler()
-    handler.setFormatter(ISTFormatter("%(asctime)s - %(levelname)s - %(message)s"))
-    logger.addHandler(handler)
-# --- End of Logging Configuration ---
-
-def extract_json_from_text(text: str) -> str:
-    """More robustly extracts a JSON object from a string."""
-    match = re.search(r"```json\s*(\{.*?\})\s*```", text, re.DOTALL)
-    if match:
-        return match.group(1)
-    start_index = text.find("{")
-    end_index = text.rfind("}")
-    if start_index != -1 and end_index != -1:
-        return text[start_index : end_index + 1]
-    return None
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
-def extract_guidelines_from_pdf(pdf_path: str) -> Dict[str, Any]:
-    """
-    Core logic to extract and validate guidelines from a PDF file using the configured LLM provider.
-    Returns a single dictionary containing validation status and extracted data.
-    """
-    # Get default provider and model configuration
-    config_provider = Config.get_default_provider()
-    provider = config_provider  # Use the provider directly from config
-    config = Config.get_llm_config(config_provider)  # Use config enum for config lookup
-    model = config.model if config else Config.GENERATIVE_MODEL
-    prompt = """
+try:
+    import fastjsonschema
+    _SchemaError = fastjsonschema.JsonSchemaException
+    _PARSE_ERRORS = (json.JSONDecodeError, _SchemaError)
+except ImportError:
+    fastjsonschema = None
+    _SchemaError = ()
+    _PARSE_ERRORS = (json.JSONDecodeError,)
+
+logger = logging.getLogger(__name__)
+
+# --- Extraction Prompt ---
+EXTRACTION_PROMPT = """
 You are an expert financial document analyst. Your task is to analyze the provided document and determine if it is an Investment Policy Statement (IPS). Then, you will extract its contents. 
 
 Your output MUST be a single, valid JSON object.
@@ -203,40 +189,234 @@ Example C — Performance / Reporting requirement
 
 End of examples.
 """
+
+# Structure the prompt asks for; only the fields downstream code relies on are required
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "required": ["is_valid_document"],
+    "properties": {
+        "is_valid_document": {"type": "boolean"},
+        "validation_summary": {"type": ["string", "null"]},
+        "portfolio_id": {"type": ["string", "null"]},
+        "portfolio_name": {"type": ["string", "null"]},
+        "doc_id": {"type": ["string", "null"]},
+        "doc_name": {"type": ["string", "null"]},
+        "doc_date": {"type": ["string", "null"]},
+        "guidelines": {
+            "type": ["array", "null"],
+            "items": {
+                "type": "object",
+                "required": ["rule_id", "text"],
+                "properties": {
+                    "rule_id": {"type": "string"},
+                    "text": {"type": "string"},
+                    "structured_data": {"type": ["object", "array", "null"]},
+                },
+            },
+        },
+        "human_readable_digest": {"type": ["string", "null"]},
+    },
+}
+
+# Compiled once; without fastjsonschema installed, parsed results are not validated
+_validate_extraction = fastjsonschema.compile(EXTRACTION_SCHEMA) if fastjsonschema else None
+
+
+def _parse_extraction(json_string: str) -> Dict[str, Any]:
+    """Parses an extraction JSON string and checks it against the extraction schema."""
+    parsed_json = _json_loads(json_string)
+    if _validate_extraction is not None:
+        _validate_extraction(parsed_json)
+    return parsed_json
+
+
+def _resolve_provider_and_model():
+    """Returns the configured default provider and its extraction model."""
+    provider = Config.get_default_provider()
+    config = Config.get_llm_config(provider)
+    model = config.model if config else Config.GENERATIVE_MODEL
+    return provider, model
+
+
+def get_cached_extraction(pdf_path: str) -> Optional[Dict[str, Any]]:
+    """Returns the cached extraction for a PDF without loading any LLM SDK, or None on a miss."""
+    _, model = _resolve_provider_and_model()
+    try:
+        key = file_cache_key(pdf_path, EXTRACTION_PROMPT, model)
+    except FileNotFoundError:
+        return None
+    return load_cached_extraction(key)
+
+
+def extract_guidelines_from_pdf(pdf_path: str) -> Dict[str, Any]:
+    """
+    Core logic to extract and validate guidelines from a PDF file using the configured LLM provider.
+    Returns a single dictionary containing validation status and extracted data.
+    """
+    # Get default provider and model configuration
+    provider, model = _resolve_provider_and_model()
+    
+    logger.info("Starting extraction and validation for: %s", pdf_path)
+    logger.info("Using provider: %s, model: %s", provider.value, model)
+    
+    # One stat answers both "does it exist" and "how big is it"
+    try:
+        file_size = os.stat(pdf_path).st_size
+    except FileNotFoundError:
+        return _extract(None, pdf_path, 0, None, provider, model)
+    
+    extraction_key = file_cache_key(pdf_path, EXTRACTION_PROMPT, model)
+    return _extract(pdf_path, pdf_path, file_size, extraction_key, provider, model)
+
+
+def extract_guidelines_from_stream(fileobj: BinaryIO, name: str = "upload.pdf",
+                                   content_digest=None, force_refresh: bool = False) -> Dict[str, Any]:
+    """
+    Same as extract_guidelines_from_pdf for a seekable PDF file object, e.g. a spooled
+    upload, so the document never has to be written to a named file first.
     
-    logging.info(f"Starting extraction and validation for: {pdf_path}")
-    logging.info(f"Using provider: {provider.value}, model: {model}")
+    content_digest is an optional SHA-256 object already fed the file's bytes, which saves
+    re-reading the file to build the cache key. force_refresh skips the cache lookup and
+    overwrites the cached entry with the new result.
+    """
+    provider, model = _resolve_provider_and_model()
+    
+    logger.info("Starting extraction and validation for: %s", name)
+    logger.info("Using provider: %s, model: %s", provider.value, model)
+    
+    fileobj.seek(0, os.SEEK_END)
+    file_size = fileobj.tell()
+    if content_digest is not None:
+        extraction_key = digest_cache_key(content_digest, EXTRACTION_PROMPT, model)
+    else:
+        extraction_key = stream_cache_key(fileobj, EXTRACTION_PROMPT, model)
+    fileobj.seek(0)
+    return _extract(fileobj, name, file_size, extraction_key, provider, model, force_refresh)
+
+
+def extract_guidelines_stream(pdf_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields each extracted guideline as soon as the model has finished writing it, instead of
+    after the whole response. The full extraction result (also cached, as with
+    extract_guidelines_from_pdf) is the generator's return value, e.g. via `yield from`.
+    """
+    provider, model = _resolve_provider_and_model()
+    try:
+        file_size = os.stat(pdf_path).st_size
+    except FileNotFoundError:
+        result = _extract(None, pdf_path, 0, None, provider, model)
+        yield from result.get("guidelines") or []
+        return result
+    
+    extraction_key = file_cache_key(pdf_path, EXTRACTION_PROMPT, model)
+    chunks: "queue.Queue[Optional[str]]" = queue.Queue()
+    outcome: Dict[str, Any] = {}
+    
+    def run() -> None:
+        try:
+            outcome["result"] = _extract(pdf_path, pdf_path, file_size, extraction_key,
+                                         provider, model, on_chunk=chunks.put)
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            chunks.put(None)
+    
+    # The LLM call runs on its own thread so guidelines can be handed out while it streams
+    threading.Thread(target=run, name="extract-stream", daemon=True).start()
+    
+    items = JsonArrayItemScanner("guidelines")
+    streamed = 0
+    while (text := chunks.get()) is not None:
+        for item in items.feed(text):
+            streamed += 1
+            yield _json_loads(item)
+    
+    if "error" in outcome:
+        raise outcome["error"]
+    result = outcome["result"]
+    # Cache hits and providers that cannot stream deliver everything at the end
+    yield from (result.get("guidelines") or [])[streamed:]
+    return result
+
+
+async def aextract_guidelines_from_pdf(pdf_path: str) -> Dict[str, Any]:
+    """Async extract_guidelines_from_pdf; the blocking upload and LLM call run on the shared worker pool."""
+    return await run_blocking(extract_guidelines_from_pdf, pdf_path)
+
+
+async def extract_many(pdf_paths: List[str], concurrency: int = 8) -> List[Dict[str, Any]]:
+    """
+    Extracts several PDFs with up to `concurrency` LLM calls in flight, returning results in input order.
+    A PDF whose extraction raises gets an error result instead of failing the whole batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def bounded(pdf_path: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await aextract_guidelines_from_pdf(pdf_path)
+            except Exception as e:
+                logger.error("Extraction failed for %s: %s", pdf_path, e, exc_info=True)
+                return {"success": False, "error": str(e)}
+    
+    return await asyncio.gather(*(bounded(pdf_path) for pdf_path in pdf_paths))
+
+
+def _extract(source: Optional[Union[str, BinaryIO]], name: str, file_size: int,
+             extraction_key: Optional[str], provider, model: str,
+             force_refresh: bool = False,
+             on_chunk: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Runs the extraction LLM call for a PDF path or file object, consulting the extraction cache.
+    
+    on_chunk, if given, also receives the response text as it streams (not on cache hits).
+    """
+    # Identical document, prompt and model: reuse the previous extraction
+    if extraction_key and not force_refresh:
+        cached_result = load_cached_extraction(extraction_key)
+        if cached_result is not None:
+            logger.info("Extraction cache hit for %s (key %.12s), skipping LLM call", name, extraction_key)
+            return cached_result
+    
+    # The LLM layer pulls in the provider SDKs, so it is only loaded once the cache has missed
+    from guidelines_agent.core.llm_providers import llm_manager
     
     # Create metadata for debugging
     metadata = {
         "operation": "document_extraction",
-        "file_path": pdf_path,
-        "file_size": os.path.getsize(pdf_path) if os.path.exists(pdf_path) else 0,
+        "file_path": name,
+        "file_size": file_size,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
-    logging.info("Initiating LLM API call...")
-    logging.info(f"  - Provider: {provider.value}")
-    logging.info(f"  - Model: {model}")
-    logging.info(f"  - PDF size: {metadata['file_size']} bytes")
+    logger.info("Initiating LLM API call...")
+    logger.info("  - Provider: %s", provider.value)
+    logger.info("  - Model: %s", model)
+    logger.info("  - PDF size: %s bytes", metadata["file_size"])
 
-    start_time_utc = datetime.now(timezone.utc)
+    start_ns = time.perf_counter_ns()
+    
+    # Stream the response so the JSON object is located while the model is still generating
+    scanner = JsonObjectScanner()
+    
+    def feed(text: str) -> None:
+        scanner.feed(text)
+        if on_chunk is not None:
+            on_chunk(text)
     
-    # Use the new LLM manager with debug logging
     response = llm_manager.generate_response(
-        prompt=prompt,
+        prompt=EXTRACTION_PROMPT,
         model=model,
         provider=provider,
-        files=[pdf_path] if os.path.exists(pdf_path) else None,
+        files=[source] if source is not None else None,
         temperature=0.1,
-        metadata=metadata
+        metadata=metadata,
+        on_chunk=feed
     )
     
-    end_time_utc = datetime.now(timezone.utc)
-    duration = (end_time_utc - start_time_utc).total_seconds()
+    duration = (time.perf_counter_ns() - start_ns) / 1e9
     
     if not response.success:
-        logging.error(f"LLM API call failed: {response.error}")
+        logger.error("LLM API call failed: %s", response.error)
         return {
             "success": False,
             "error": f"LLM generation failed: {response.error}",
@@ -246,18 +426,19 @@ End of examples.
             "latency_ms": response.latency_ms
         }
     
-    logging.info(f"API call successful. Turnaround Time (TAT): {duration:.2f} seconds")
-    logging.info(f"Response latency: {response.latency_ms}ms")
+    logger.info("API call successful. Turnaround Time (TAT): %.2f seconds", duration)
+    logger.info("Response latency: %sms", response.latency_ms)
     
     if response.usage:
-        logging.info(f"Token usage: {response.usage}")
+        logger.info("Token usage: %s", response.usage)
 
     response_text = response.content
-    json_string = extract_json_from_text(response_text)
+    # A streamed response has already been scanned chunk by chunk; only rescan buffered ones
+    json_string = scanner.result if scanner.fed else extract_json_from_text(response_text)
 
     if not json_string:
-        logging.error("No JSON object found in the model's response.")
-        logging.debug(f"Full response text: {response_text}")
+        logger.error("No JSON object found in the model's response.")
+        logger.debug("Full response text: %s", response_text)
         # Return a failure state if the model's output is malformed
         return {
             "is_valid_document": False,
@@ -267,15 +448,35 @@ End of examples.
         }
 
     try:
-        parsed_json = json.loads(json_string)
-        logging.info(f"Successfully parsed JSON. Validation status: {parsed_json.get('is_valid_document')}")
-        return parsed_json
+        try:
+            parsed_json = _parse_extraction(json_string)
+        except _PARSE_ERRORS:
+            # The streamed scan takes the first balanced {...}, which may be prose such as
+            # "{see page 2}" ahead of a ```json fence; retry with the fence-aware extraction
+            fallback = extract_json_from_text(response_text) if scanner.fed else None
+            if not fallback or fallback == json_string:
+                raise
+            json_string = fallback
+            parsed_json = _parse_extraction(json_string)
     except json.JSONDecodeError as e:
-        logging.error(f"Failed to decode JSON from the model's response: {e}")
-        logging.debug(f"Invalid JSON string: {json_string}")
+        logger.error("Failed to decode JSON from the model's response: %s", e)
+        logger.debug("Invalid JSON string: %s", json_string)
         return {
             "is_valid_document": False,
             "validation_summary": "Failed to process the document due to an invalid JSON structure in the AI response.",
             "guidelines": None,
             "human_readable_digest": None
-        }
\ No newline at end of file
+        }
+    except _SchemaError as e:
+        logger.error("Model response does not match the extraction schema: %s", e.message)
+        return {
+            "is_valid_document": False,
+            "validation_summary": "Failed to process the document because the AI response is missing required fields.",
+            "guidelines": None,
+            "human_readable_digest": None
+        }
+
+    logger.info("Successfully parsed JSON. Validation status: %s", parsed_json.get("is_valid_document"))
+    if extraction_key:
+        store_extraction(extraction_key, parsed_json)
+    return parsed_json
\ No newline at end of file
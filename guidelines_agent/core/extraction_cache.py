@@ -0,0 +1,146 @@
+"""
+Extraction Cache
+================
+
+Disk-backed cache of PDF extraction results keyed on the document content,
+prompt and model, so re-processing an identical PDF skips the LLM call. Recently
+used entries are also kept in memory so repeat uploads skip the disk read.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Dict, Any, Optional
+
+from cachetools import LRUCache
+
+from guidelines_agent.core.config import Config
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+logger = logging.getLogger(__name__)
+
+# Serialized results, so every hit hands callers a fresh dict they may mutate
+_memory_cache: LRUCache = LRUCache(maxsize=Config.EXTRACTION_CACHE_MEMORY_ENTRIES)
+_memory_lock = threading.Lock()
+
+
+@lru_cache(maxsize=16)
+def _encoded(text: str) -> bytes:
+    """UTF-8 bytes of a prompt or model name; the same few strings are hashed on every lookup."""
+    return text.encode()
+
+
+def cache_key(pdf_bytes: bytes, prompt: str, model_name: str) -> str:
+    """Builds the cache key for a document, prompt and model combination.
+
+    pdf_bytes may be any buffer (e.g. an mmap); it is hashed without being copied.
+    """
+    digest = hashlib.sha256(pdf_bytes)
+    digest.update(_encoded(prompt))
+    digest.update(_encoded(model_name))
+    return digest.hexdigest()
+
+
+def file_cache_key(pdf_path: str, prompt: str, model_name: str) -> str:
+    """Builds the cache key for a PDF on disk through a read-only memory map."""
+    with open(pdf_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return cache_key(b"", prompt, model_name)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return cache_key(mm, prompt, model_name)
+
+
+def stream_cache_key(fileobj: BinaryIO, prompt: str, model_name: str) -> str:
+    """Builds the cache key for a seekable file object, reading it in chunks and rewinding it."""
+    fileobj.seek(0)
+    if hasattr(hashlib, "file_digest"):
+        # Python 3.11+: reads into a reused buffer with the GIL released while hashing
+        digest = hashlib.file_digest(fileobj, "sha256")
+    else:
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: fileobj.read(1 << 20), b""):
+            digest.update(chunk)
+    fileobj.seek(0)
+    return digest_cache_key(digest, prompt, model_name)
+
+
+def digest_cache_key(content_digest: "hashlib._Hash", prompt: str, model_name: str) -> str:
+    """Builds the cache key from a SHA-256 already fed the document bytes, e.g. while decoding an upload.
+
+    The digest is copied, so the caller's object is left untouched.
+    """
+    digest = content_digest.copy()
+    digest.update(_encoded(prompt))
+    digest.update(_encoded(model_name))
+    return digest.hexdigest()
+
+
+def _cache_path(key: str) -> Path:
+    return Path(Config.EXTRACTION_CACHE_DIR) / f"{key}.json"
+
+
+def load_cached_extraction(key: str) -> Optional[Dict[str, Any]]:
+    """Returns the cached extraction result for a key, or None on a miss."""
+    if not Config.EXTRACTION_CACHE_ENABLED:
+        return None
+
+    with _memory_lock:
+        data = _memory_cache.get(key)
+    if data is not None:
+        return _json_loads(data)
+
+    path = _cache_path(key)
+    if not path.exists():
+        return None
+
+    try:
+        data = path.read_bytes()
+        result = _json_loads(data)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable extraction cache entry {path}: {e}")
+        return None
+
+    with _memory_lock:
+        _memory_cache[key] = data
+    return result
+
+
+def store_extraction(key: str, result: Dict[str, Any]) -> None:
+    """Atomically writes an extraction result to the cache."""
+    if not Config.EXTRACTION_CACHE_ENABLED:
+        return
+
+    data = _json_dumps(result)
+    with _memory_lock:
+        _memory_cache[key] = data
+
+    path = _cache_path(key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to write extraction cache entry {path}: {e}")
+
+
+def clear_memory_cache() -> None:
+    """Drops the in-memory layer; entries on disk are kept."""
+    with _memory_lock:
+        _memory_cache.clear()
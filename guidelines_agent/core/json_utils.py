@@ -0,0 +1,163 @@
+"""
+JSON Utilities
+==============
+
+Linear-time helpers for locating JSON payloads inside LLM responses. The object
+helpers accept str or UTF-8 bytes, so raw response bodies can be scanned and handed
+to orjson without decoding them first.
+"""
+
+import re
+from typing import AnyStr, List, Optional
+
+# Only these characters change the scanner's state; everything between them is skipped in C
+_STRUCTURAL_RE = re.compile(r'[{}"\\]')
+_STRUCTURAL_BYTES_RE = re.compile(rb'[{}"\\]')
+# (pattern, quote, backslash, open brace, close brace) as str characters and as byte values
+_STR_TOKENS = (_STRUCTURAL_RE, '"', "\\", "{", "}")
+_BYTES_TOKENS = (_STRUCTURAL_BYTES_RE, ord('"'), ord("\\"), ord("{"), ord("}"))
+_CONTAINER_RE = re.compile(r'[{}\[\]"\\]')
+
+
+class JsonObjectScanner:
+    """Incremental bracket-matching scanner for the first balanced top-level {...} object."""
+
+    def __init__(self):
+        self._parts = []
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+        self.result: Optional[str] = None
+        self.fed = False
+
+    def feed(self, chunk: AnyStr, start: int = 0) -> Optional[AnyStr]:
+        """Scans only the newly received chunk; returns the object once it closes.
+
+        Chunks may be str or bytes, but all chunks fed to one scanner must be the same type.
+        """
+        self.fed = True
+        if self.result is not None:
+            return self.result
+
+        pattern, quote, backslash, lbrace, rbrace = (
+            _BYTES_TOKENS if isinstance(chunk, (bytes, bytearray)) else _STR_TOKENS
+        )
+        depth, in_str = self._depth, self._in_str
+        begin = 0 if depth else -1
+        # Index of a character escaped by a preceding backslash, which may end the previous chunk
+        skip = start if self._escape else -1
+        for match in pattern.finditer(chunk, start):
+            i = match.start()
+            if i == skip:
+                continue
+            c = chunk[i]
+            if in_str:
+                if c == backslash:
+                    skip = i + 1
+                elif c == quote:
+                    in_str = False
+            elif c == quote:
+                if depth:
+                    in_str = True
+            elif c == lbrace:
+                if depth == 0:
+                    begin = i
+                depth += 1
+            elif c == rbrace and depth:
+                depth -= 1
+                if depth == 0:
+                    self._parts.append(chunk[begin : i + 1])
+                    self.result = chunk[:0].join(self._parts)
+                    self._parts = []
+                    return self.result
+
+        if depth:
+            self._parts.append(chunk[begin:])
+        self._depth, self._in_str, self._escape = depth, in_str, skip == len(chunk)
+        return None
+
+
+class JsonArrayItemScanner:
+    """Incremental scanner yielding each object of a top-level object's array field as it closes.
+
+    Fed the streamed text of e.g. {"guidelines": [{...}, {...}]}, it returns the raw text of
+    every complete item in the named array, so callers can parse items before the whole
+    response has arrived. Text before the first top-level '{' is ignored.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._stack = []  # Open containers, '{' or '['
+        self._in_str = False
+        self._escape = False
+        self._key_parts = None  # Pieces of a string being read at the top level of the root object
+        self._last_key = None
+        self._array_depth = None  # Stack depth inside the target array while it is open
+        self._item_parts = None  # Pieces of the item currently being read
+
+    def feed(self, chunk: str) -> List[str]:
+        """Scans a newly received chunk; returns the items completed within it."""
+        items = []
+        stack = self._stack
+        in_str = self._in_str
+        skip = 0 if self._escape else -1
+        key_begin = 0 if self._key_parts is not None else -1
+        item_begin = 0 if self._item_parts is not None else -1
+
+        for match in _CONTAINER_RE.finditer(chunk):
+            i = match.start()
+            if i == skip:
+                continue
+            c = chunk[i]
+            if in_str:
+                if c == "\\":
+                    skip = i + 1
+                elif c == '"':
+                    in_str = False
+                    if key_begin != -1:
+                        self._key_parts.append(chunk[key_begin:i])
+                        self._last_key = "".join(self._key_parts)
+                        self._key_parts, key_begin = None, -1
+            elif c == '"':
+                if stack:
+                    in_str = True
+                    if stack == ["{"]:
+                        self._key_parts, key_begin = [], i + 1
+            elif c in "{[":
+                if self._array_depth == len(stack) and item_begin == -1 and c == "{":
+                    self._item_parts, item_begin = [], i
+                if c == "[" and stack == ["{"] and self._last_key == self.key:
+                    self._array_depth = 2
+                if c == "{" or stack:
+                    stack.append(c)
+            elif stack:
+                stack.pop()
+                if self._array_depth is not None:
+                    if item_begin != -1 and len(stack) == self._array_depth:
+                        self._item_parts.append(chunk[item_begin : i + 1])
+                        items.append("".join(self._item_parts))
+                        self._item_parts, item_begin = None, -1
+                    elif len(stack) < self._array_depth:
+                        self._array_depth = None
+
+        if key_begin != -1:
+            self._key_parts.append(chunk[key_begin:])
+        if item_begin != -1:
+            self._item_parts.append(chunk[item_begin:])
+        self._in_str, self._escape = in_str, skip == len(chunk)
+        return items
+
+
+def _first_json_object(text: AnyStr, start: int = 0) -> Optional[AnyStr]:
+    """Returns the first balanced top-level {...} span at or after start, in a single linear pass."""
+    return JsonObjectScanner().feed(text, start)
+
+
+def extract_json_from_text(text: AnyStr) -> Optional[AnyStr]:
+    """More robustly extracts a JSON object from a string, or from UTF-8 bytes without decoding."""
+    fence = text.find(b"```json" if isinstance(text, (bytes, bytearray)) else "```json")
+    if fence != -1:
+        json_string = _first_json_object(text, fence + 7)
+        if json_string:
+            return json_string
+    return _first_json_object(text)
@@ -10,36 +10,64 @@ Supports multiple LLM providers (Gemini, OpenAI, Anthropic, etc.) with:
 - Configuration management
 """
 
+import asyncio
+import dataclasses
 import os
+import functools
+import importlib
+import importlib.util
 import json
 import logging
+import threading
 import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional, Union
+from typing import BinaryIO, Dict, Any, List, Optional, Union, Callable
 from datetime import datetime
 from dataclasses import dataclass
 
+from cachetools import LRUCache
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
 # Use LLMProvider from config to avoid duplication
-from .config import LLMProvider
+from .config import Config, LLMProvider
+from .executor import run_blocking
+from .llm_response_cache import lookup_response, store_response
 
-# Provider-specific imports (lazy loaded)
 try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+    import orjson
 
-try:
-    import openai
-    OPENAI_AVAILABLE = True
+    def _json_dumps(obj: Any, indent: bool = False) -> str:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=str, option=option).decode()
 except ImportError:
-    OPENAI_AVAILABLE = False
+    def _json_dumps(obj: Any, indent: bool = False) -> str:
+        return json.dumps(obj, default=str, indent=2 if indent else None)
+
+# Provider SDKs are heavy (the Gemini SDK alone loads gRPC, protobuf and auth), so only
+# their presence is checked here; each is imported the first time its provider is used
+GEMINI_AVAILABLE = importlib.util.find_spec("google.generativeai") is not None
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
+ANTHROPIC_AVAILABLE = importlib.util.find_spec("anthropic") is not None
+
+
+@functools.cache
+def _import_sdk(module_name: str):
+    return importlib.import_module(module_name)
 
-try:
-    import anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
+
+@functools.cache
+def _http_client():
+    """Pooled HTTP client for the OpenAI SDK (some Anthropic SDK releases reject a plain httpx.Client)."""
+    httpx = _import_sdk("httpx")
+    return httpx.Client(
+        timeout=httpx.Timeout(Config.LLM_HTTP_TIMEOUT_SECONDS, connect=Config.LLM_HTTP_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(max_keepalive_connections=Config.LLM_HTTP_MAX_KEEPALIVE,
+                            max_connections=Config.LLM_HTTP_MAX_CONNECTIONS),
+    )
+
+
+# Reused Gemini file handles must outlive the request that reuses them by at least this much
+UPLOAD_EXPIRY_MARGIN_SECONDS = 60
 
 
 @dataclass
@@ -50,9 +78,10 @@ class LLMRequest:
     provider: LLMProvider
     temperature: float = 0.1
     max_tokens: Optional[int] = None
-    files: Optional[List[str]] = None  # File paths for multimodal
+    files: Optional[List[Union[str, BinaryIO]]] = None  # File paths or open PDF files for multimodal
     system_prompt: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
+    on_chunk: Optional[Callable[[str], None]] = None  # Receives text chunks when the provider streams
 
 
 @dataclass
@@ -67,66 +96,95 @@ class LLMResponse:
     error: Optional[str] = None
     request_id: Optional[str] = None
     raw_response: Optional[Dict[str, Any]] = None
+    retryable: bool = False  # Failed with a transient provider error (rate limit, outage, timeout)
 
 
 class LLMDebugLogger:
     """Enhanced debugging logger for LLM requests/responses"""
     
+    # Loggers are process-wide, so each is configured once however many managers are built
+    _configured: set = set()
+    _configure_lock = threading.Lock()
+    
     def __init__(self, logger_name: str = "llm_debug"):
         self.logger = logging.getLogger(logger_name)
-        self.logger.setLevel(logging.DEBUG)
-        
-        # Create debug-specific formatter
-        formatter = logging.Formatter(
-            '%(asctime)s - LLM_DEBUG - %(levelname)s - %(message)s'
-        )
+        with self._configure_lock:
+            if logger_name not in self._configured:
+                self._configure(self.logger)
+                self._configured.add(logger_name)
+    
+    @staticmethod
+    def _configure(logger: logging.Logger) -> None:
+        # Prompt, metadata and raw response dumps are only produced with LLM_DEBUG on
+        logger.setLevel(logging.DEBUG if Config.LLM_DEBUG_ENABLED else logging.INFO)
         
-        # Ensure we have a handler
-        if not self.logger.handlers:
+        # Ensure we have a console handler with a debug-specific formatter; records still
+        # propagate to the root handlers (e.g. the server log file)
+        if not logger.handlers:
             handler = logging.StreamHandler()
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
+            handler.setFormatter(logging.Formatter(
+                '%(asctime)s - LLM_DEBUG - %(levelname)s - %(message)s'
+            ))
+            logger.addHandler(handler)
     
     def log_request(self, request: LLMRequest, request_id: str):
         """Log LLM request details"""
-        self.logger.info(f"🚀 LLM REQUEST [{request_id}]")
-        self.logger.info(f"  Provider: {request.provider.value}")
-        self.logger.info(f"  Model: {request.model}")
-        self.logger.info(f"  Temperature: {request.temperature}")
-        self.logger.info(f"  Max Tokens: {request.max_tokens}")
+        # Runs on every LLM call; skip all formatting when nothing would be emitted
+        if not Config.LLM_REQUEST_LOGGING or not self.logger.isEnabledFor(logging.INFO):
+            return
+        
+        self.logger.info("🚀 LLM REQUEST [%s]", request_id)
+        self.logger.info("  Provider: %s", request.provider.value)
+        self.logger.info("  Model: %s", request.model)
+        self.logger.info("  Temperature: %s", request.temperature)
+        self.logger.info("  Max Tokens: %s", request.max_tokens)
         
         if request.files:
-            self.logger.info(f"  Files: {len(request.files)} file(s)")
-            for i, file in enumerate(request.files):
-                self.logger.info(f"    File {i+1}: {file}")
+            self.logger.info("  Files: %d file(s)", len(request.files))
+            for i, file in enumerate(request.files, 1):
+                self.logger.info("    File %d: %s", i, file)
+        
+        # Prompts and metadata can be large; skip slicing and serializing them unless DEBUG is on
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         
         if request.system_prompt:
-            self.logger.debug(f"  System Prompt: {request.system_prompt[:200]}...")
+            self.logger.debug("  System Prompt: %.200s...", request.system_prompt)
         
-        self.logger.debug(f"  User Prompt: {request.prompt[:500]}...")
+        self.logger.debug("  User Prompt: %.500s...", request.prompt)
         
         if request.metadata:
-            self.logger.debug(f"  Metadata: {json.dumps(request.metadata, indent=2)}")
+            self.logger.debug("  Metadata: %s", _json_dumps(request.metadata, indent=True))
     
     def log_response(self, response: LLMResponse, request_id: str):
         """Log LLM response details"""
+        # Failures are always reported; the rest is skipped when nothing would be emitted
+        if not Config.LLM_RESPONSE_LOGGING or not self.logger.isEnabledFor(logging.INFO):
+            if response.error:
+                self.logger.error("❌ FAILED LLM RESPONSE [%s]: %s", request_id, response.error)
+            return
+        
         status = "✅ SUCCESS" if response.success else "❌ FAILED"
-        self.logger.info(f"{status} LLM RESPONSE [{request_id}]")
-        self.logger.info(f"  Provider: {response.provider.value}")
-        self.logger.info(f"  Model: {response.model}")
-        self.logger.info(f"  Latency: {response.latency_ms}ms")
+        self.logger.info("%s LLM RESPONSE [%s]", status, request_id)
+        self.logger.info("  Provider: %s", response.provider.value)
+        self.logger.info("  Model: %s", response.model)
+        self.logger.info("  Latency: %sms", response.latency_ms)
         
         if response.usage:
-            self.logger.info(f"  Usage: {json.dumps(response.usage)}")
+            self.logger.info("  Usage: %s", _json_dumps(response.usage))
         
         if response.error:
-            self.logger.error(f"  Error: {response.error}")
-        else:
-            response_preview = response.content[:300] + "..." if len(response.content) > 300 else response.content
-            self.logger.debug(f"  Response: {response_preview}")
+            self.logger.error("  Error: %s", response.error)
+        
+        # Serializing the raw provider response is the most expensive line here; only do it for DEBUG
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        
+        if not response.error:
+            self.logger.debug("  Response: %.300s%s", response.content, "..." if len(response.content) > 300 else "")
         
         if response.raw_response:
-            self.logger.debug(f"  Raw Response: {json.dumps(response.raw_response, indent=2, default=str)}")
+            self.logger.debug("  Raw Response: %s", _json_dumps(response.raw_response, indent=True))
 
 
 class BaseLLMProvider(ABC):
@@ -144,6 +202,15 @@ class BaseLLMProvider(ABC):
     def is_available(self) -> bool:
         """Check if provider is available and configured"""
         pass
+    
+    def warmup(self) -> None:
+        """Open the provider's connection ahead of the first request; a no-op by default"""
+        pass
+    
+    @staticmethod
+    def _transient_errors() -> tuple:
+        """Exception types worth retrying or failing over on; none by default"""
+        return ()
 
 
 class GeminiProvider(BaseLLMProvider):
@@ -152,12 +219,59 @@ class GeminiProvider(BaseLLMProvider):
     def __init__(self, debug_logger: LLMDebugLogger):
         super().__init__(debug_logger)
         self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
+        self._genai = None
+        # GenerativeModel instances by model name; construction parses settings and touches the client
+        self._models: Dict[str, Any] = {}
+        # Uploaded file handles keyed by (path, mtime_ns, size), so retries and re-runs skip the upload
+        self._uploads: LRUCache = LRUCache(maxsize=64)
+        self._uploads_lock = threading.Lock()
     
     def is_available(self) -> bool:
         return GEMINI_AVAILABLE and bool(self.api_key)
     
+    def _get_sdk(self):
+        """Import and configure the Gemini SDK on first use."""
+        if self._genai is None:
+            genai = _import_sdk("google.generativeai")
+            genai.configure(api_key=self.api_key)
+            self._genai = genai
+        return self._genai
+    
+    def _get_model(self, model_name: str):
+        """Return the GenerativeModel for a model name, building it on first use."""
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._models.setdefault(model_name, self._get_sdk().GenerativeModel(model_name))
+        return model
+    
+    def warmup(self) -> None:
+        # count_tokens is free and goes over the same channel as generate_content
+        model_name = Config.get_llm_config(LLMProvider.GEMINI).model
+        self._get_model(model_name).count_tokens("warmup")
+    
+    @staticmethod
+    @functools.cache
+    def _transient_errors() -> tuple:
+        """Gemini errors worth retrying: quota exhaustion, unavailability and timeouts."""
+        exceptions = _import_sdk("google.api_core.exceptions")
+        return (exceptions.ServiceUnavailable, exceptions.ResourceExhausted, exceptions.DeadlineExceeded)
+    
+    def _upload_path(self, genai, file_path: str):
+        """Upload a file on disk, reusing the handle from an earlier upload of the same file version."""
+        st = os.stat(file_path)
+        key = (file_path, st.st_mtime_ns, st.st_size)
+        with self._uploads_lock:
+            handle = self._uploads.get(key)
+        expires = getattr(handle, "expiration_time", None)
+        if expires is not None and expires.timestamp() > time.time() + UPLOAD_EXPIRY_MARGIN_SECONDS:
+            return handle
+        
+        mime_type = "application/pdf" if file_path.endswith('.pdf') else "auto"
+        handle = genai.upload_file(path=file_path, mime_type=mime_type)
+        with self._uploads_lock:
+            self._uploads[key] = handle
+        return handle
+    
     def generate_response(self, request: LLMRequest) -> LLMResponse:
         start_time = time.time()
         request_id = f"gemini_{int(start_time * 1000)}"
@@ -165,7 +279,8 @@ class GeminiProvider(BaseLLMProvider):
         try:
             self.debug_logger.log_request(request, request_id)
             
-            model = genai.GenerativeModel(request.model)
+            genai = self._get_sdk()
+            model = self._get_model(request.model)
             
             # Prepare content
             contents = [request.prompt]
@@ -173,19 +288,45 @@ class GeminiProvider(BaseLLMProvider):
             # Handle file uploads for multimodal
             if request.files:
                 for file_path in request.files:
-                    if os.path.exists(file_path):
-                        mime_type = "application/pdf" if file_path.endswith('.pdf') else "auto"
-                        uploaded_file = genai.upload_file(path=file_path, mime_type=mime_type)
-                        contents.append(uploaded_file)
-            
-            # Generate response
-            response = model.generate_content(
-                contents,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=request.temperature,
-                    max_output_tokens=request.max_tokens
-                )
+                    if hasattr(file_path, "read"):
+                        # Open file objects come from in-memory uploads and are always PDFs
+                        file_path.seek(0)
+                        contents.append(genai.upload_file(path=file_path, mime_type="application/pdf"))
+                    elif os.path.exists(file_path):
+                        contents.append(self._upload_path(genai, file_path))
+            
+            generation_config = genai.types.GenerationConfig(
+                temperature=request.temperature,
+                max_output_tokens=request.max_tokens
             )
+            streamed = False
+            
+            def retryable(error: BaseException) -> bool:
+                # Once text has reached the caller a retry would repeat it, so only retry before that
+                return not streamed and isinstance(error, self._transient_errors())
+            
+            # Transient quota/availability errors are retried with jittered exponential backoff;
+            # uploaded files are reused across attempts
+            for attempt in Retrying(stop=stop_after_attempt(Config.LLM_MAX_ATTEMPTS),
+                                    wait=wait_random_exponential(multiplier=1, max=30),
+                                    retry=retry_if_exception(retryable), reraise=True):
+                with attempt:
+                    # Generate response, streaming chunks to the caller when requested
+                    response = model.generate_content(
+                        contents,
+                        generation_config=generation_config,
+                        stream=request.on_chunk is not None
+                    )
+                    
+                    if request.on_chunk is not None:
+                        chunks = []
+                        for chunk in response:
+                            chunks.append(chunk.text)
+                            streamed = True
+                            request.on_chunk(chunk.text)
+                        response_text = "".join(chunks)
+                    else:
+                        response_text = response.text
             
             end_time = time.time()
             latency_ms = int((end_time - start_time) * 1000)
@@ -196,18 +337,20 @@ class GeminiProvider(BaseLLMProvider):
                 usage = {
                     "prompt_tokens": getattr(response.usage_metadata, 'prompt_token_count', 0),
                     "completion_tokens": getattr(response.usage_metadata, 'candidates_token_count', 0),
-                    "total_tokens": getattr(response.usage_metadata, 'total_token_count', 0)
+                    "total_tokens": getattr(response.usage_metadata, 'total_token_count', 0),
+                    # Prompt prefix tokens served from Gemini's implicit context cache
+                    "cached_tokens": getattr(response.usage_metadata, 'cached_content_token_count', 0)
                 }
             
             llm_response = LLMResponse(
-                content=response.text.strip(),
+                content=response_text.strip(),
                 provider=LLMProvider.GEMINI,
                 model=request.model,
                 usage=usage,
                 latency_ms=latency_ms,
                 success=True,
                 request_id=request_id,
-                raw_response={"candidates": [{"content": response.text}]}
+                raw_response={"candidates": [{"content": response_text}]}
             )
             
             self.debug_logger.log_response(llm_response, request_id)
@@ -224,6 +367,7 @@ class GeminiProvider(BaseLLMProvider):
                 latency_ms=latency_ms,
                 success=False,
                 error=str(e),
+                retryable=isinstance(e, self._transient_errors()),
                 request_id=request_id
             )
             
@@ -237,12 +381,27 @@ class OpenAIProvider(BaseLLMProvider):
     def __init__(self, debug_logger: LLMDebugLogger):
         super().__init__(debug_logger)
         self.api_key = os.getenv("OPENAI_API_KEY")
-        if self.api_key:
-            openai.api_key = self.api_key
+        self._client = None
     
     def is_available(self) -> bool:
         return OPENAI_AVAILABLE and bool(self.api_key)
     
+    def _get_client(self):
+        """Reuse one client so its pooled keep-alive connections survive across requests."""
+        if self._client is None:
+            self._client = _import_sdk("openai").OpenAI(api_key=self.api_key, http_client=_http_client())
+        return self._client
+    
+    def warmup(self) -> None:
+        # Any response will do: the handshake leaves a kept-alive connection in the shared pool
+        _http_client().head(str(self._get_client().base_url))
+    
+    @staticmethod
+    @functools.cache
+    def _transient_errors() -> tuple:
+        openai_sdk = _import_sdk("openai")
+        return (openai_sdk.RateLimitError, openai_sdk.APIConnectionError, openai_sdk.InternalServerError)
+    
     def generate_response(self, request: LLMRequest) -> LLMResponse:
         start_time = time.time()
         request_id = f"openai_{int(start_time * 1000)}"
@@ -257,7 +416,7 @@ class OpenAIProvider(BaseLLMProvider):
             messages.append({"role": "user", "content": request.prompt})
             
             # Make API call
-            response = openai.ChatCompletion.create(
+            response = self._get_client().chat.completions.create(
                 model=request.model,
                 messages=messages,
                 temperature=request.temperature,
@@ -271,7 +430,9 @@ class OpenAIProvider(BaseLLMProvider):
             usage = {
                 "prompt_tokens": response.usage.prompt_tokens,
                 "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
+                "total_tokens": response.usage.total_tokens,
+                # OpenAI caches prompt prefixes of 1024+ tokens automatically
+                "cached_tokens": getattr(getattr(response.usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
             }
             
             llm_response = LLMResponse(
@@ -282,7 +443,7 @@ class OpenAIProvider(BaseLLMProvider):
                 latency_ms=latency_ms,
                 success=True,
                 request_id=request_id,
-                raw_response=response.to_dict()
+                raw_response=response.model_dump()
             )
             
             self.debug_logger.log_response(llm_response, request_id)
@@ -299,6 +460,7 @@ class OpenAIProvider(BaseLLMProvider):
                 latency_ms=latency_ms,
                 success=False,
                 error=str(e),
+                retryable=isinstance(e, self._transient_errors()),
                 request_id=request_id
             )
             
@@ -312,10 +474,27 @@ class AnthropicProvider(BaseLLMProvider):
     def __init__(self, debug_logger: LLMDebugLogger):
         super().__init__(debug_logger)
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
+        self._client = None
     
     def is_available(self) -> bool:
         return ANTHROPIC_AVAILABLE and bool(self.api_key)
     
+    def _get_client(self):
+        """Reuse one client so its pooled keep-alive connections survive across requests."""
+        if self._client is None:
+            self._client = _import_sdk("anthropic").Anthropic(api_key=self.api_key)
+        return self._client
+    
+    def warmup(self) -> None:
+        # A one-item model listing is free and leaves a kept-alive connection in the client's pool
+        self._get_client().models.list(limit=1)
+    
+    @staticmethod
+    @functools.cache
+    def _transient_errors() -> tuple:
+        anthropic_sdk = _import_sdk("anthropic")
+        return (anthropic_sdk.RateLimitError, anthropic_sdk.APIConnectionError, anthropic_sdk.InternalServerError)
+    
     def generate_response(self, request: LLMRequest) -> LLMResponse:
         start_time = time.time()
         request_id = f"anthropic_{int(start_time * 1000)}"
@@ -323,18 +502,25 @@ class AnthropicProvider(BaseLLMProvider):
         try:
             self.debug_logger.log_request(request, request_id)
             
-            client = anthropic.Anthropic(api_key=self.api_key)
+            client = self._get_client()
             
             # Prepare messages
             messages = [{"role": "user", "content": request.prompt}]
             
+            # The system prompt is the static prefix, so mark it cacheable; Anthropic ignores the
+            # marker for prompts below its minimum cacheable length
+            extra = {}
+            if request.system_prompt:
+                extra["system"] = [{"type": "text", "text": request.system_prompt,
+                                    "cache_control": {"type": "ephemeral"}}]
+            
             # Make API call
             response = client.messages.create(
                 model=request.model,
                 max_tokens=request.max_tokens or 4096,
                 temperature=request.temperature,
                 messages=messages,
-                system=request.system_prompt if request.system_prompt else None
+                **extra
             )
             
             end_time = time.time()
@@ -344,7 +530,8 @@ class AnthropicProvider(BaseLLMProvider):
             usage = {
                 "input_tokens": response.usage.input_tokens,
                 "output_tokens": response.usage.output_tokens,
-                "total_tokens": response.usage.input_tokens + response.usage.output_tokens
+                "total_tokens": response.usage.input_tokens + response.usage.output_tokens,
+                "cached_tokens": getattr(response.usage, "cache_read_input_tokens", 0) or 0
             }
             
             llm_response = LLMResponse(
@@ -373,6 +560,7 @@ class AnthropicProvider(BaseLLMProvider):
                 latency_ms=latency_ms,
                 success=False,
                 error=str(e),
+                retryable=isinstance(e, self._transient_errors()),
                 request_id=request_id
             )
             
@@ -459,6 +647,16 @@ class LLMManager:
         self.providers[LLMProvider.ANTHROPIC] = AnthropicProvider(self.debug_logger)
         self.providers[LLMProvider.MOCK] = MockProvider(self.debug_logger)
     
+    def warmup(self) -> None:
+        """Connect to each configured provider so the first request skips DNS and TLS setup."""
+        for provider, impl in self.providers.items():
+            if provider == LLMProvider.MOCK or not impl.is_available():
+                continue
+            try:
+                impl.warmup()
+            except Exception as e:
+                self.debug_logger.logger.warning(f"LLM warm-up failed for {provider.value}: {e}")
+    
     def get_available_providers(self) -> List[LLMProvider]:
         """Get list of available and configured providers"""
         return [provider for provider, impl in self.providers.items() 
@@ -482,11 +680,13 @@ class LLMManager:
                          provider: Optional[LLMProvider] = None,
                          temperature: float = 0.1,
                          max_tokens: Optional[int] = None,
-                         files: Optional[List[str]] = None,
+                         files: Optional[List[Union[str, BinaryIO]]] = None,
                          system_prompt: Optional[str] = None,
-                         metadata: Optional[Dict[str, Any]] = None) -> LLMResponse:
+                         metadata: Optional[Dict[str, Any]] = None,
+                         on_chunk: Optional[Callable[[str], None]] = None) -> LLMResponse:
         """
-        Generate response using specified or default provider
+        Generate response using specified or default provider.
+        Providers that support streaming pass text chunks to on_chunk as they arrive.
         """
         # Use default provider if not specified
         if provider is None:
@@ -510,9 +710,37 @@ class LLMManager:
             max_tokens=max_tokens,
             files=files,
             system_prompt=system_prompt,
-            metadata=metadata
+            metadata=metadata,
+            on_chunk=on_chunk
         )
         
+        return self._generate(request)
+    
+    async def agenerate_response(self, prompt: str, **kwargs) -> LLMResponse:
+        """Async generate_response; the blocking provider call runs on the shared worker pool."""
+        return await run_blocking(self.generate_response, prompt, **kwargs)
+    
+    async def abatch(self, requests: List[LLMRequest], concurrency: int = 8) -> List[LLMResponse]:
+        """
+        Runs several requests with up to `concurrency` provider calls in flight, returning responses in input order.
+        A request that raises gets a failed LLMResponse instead of failing the whole batch.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def bounded(request: LLMRequest) -> LLMResponse:
+            async with semaphore:
+                try:
+                    return await run_blocking(self._generate, request)
+                except Exception as e:
+                    return LLMResponse(content="", provider=request.provider, model=request.model,
+                                       success=False, error=str(e))
+        
+        return await asyncio.gather(*(bounded(request) for request in requests))
+    
+    def _generate(self, request: LLMRequest) -> LLMResponse:
+        """Dispatch a request to its provider, falling back to the default provider when it is unavailable."""
+        provider = request.provider
+        
         # Get provider implementation
         provider_impl = self.providers.get(provider)
         if not provider_impl:
@@ -530,8 +758,50 @@ class LLMManager:
             else:
                 raise ValueError(f"No available LLM providers configured")
         
+        cached = lookup_response(request)
+        if cached is not None:
+            return cached
+        
+        # Failing over once text has reached the caller would repeat it, so count what was streamed
+        chunks_sent = 0
+        on_chunk = request.on_chunk
+        if on_chunk is not None:
+            def counted(text: str) -> None:
+                nonlocal chunks_sent
+                chunks_sent += 1
+                on_chunk(text)
+            request = dataclasses.replace(request, on_chunk=counted)
+        
         # Generate response
-        return provider_impl.generate_response(request)
+        response = provider_impl.generate_response(request)
+        if not response.success and response.retryable and not chunks_sent:
+            response = self._failover(request, response)
+        store_response(request, response)
+        return response
+    
+    def _failover(self, request: LLMRequest, failed: LLMResponse) -> LLMResponse:
+        """
+        Retry a request that failed with a transient provider error (after the provider's own retries)
+        on the other configured providers, in priority order, using each one's default model.
+        Requests with files stay on their provider, and the mock provider is never a failover target.
+        """
+        if not Config.LLM_FAILOVER_ENABLED or request.files:
+            return failed
+        
+        for provider in Config.PROVIDER_PRIORITY:
+            provider_impl = self.providers.get(provider)
+            if provider in (request.provider, LLMProvider.MOCK) or not provider_impl or not provider_impl.is_available():
+                continue
+            self.debug_logger.logger.warning(
+                "%s failed with a transient error, failing over to %s: %s",
+                failed.provider.value, provider.value, failed.error
+            )
+            fallback = dataclasses.replace(request, provider=provider, model=Config.get_llm_config(provider).model)
+            response = provider_impl.generate_response(fallback)
+            if response.success or not response.retryable:
+                return response
+            failed = response
+        return failed
 
 
 # Global LLM manager instance
@@ -0,0 +1,74 @@
+"""
+LLM Response Cache
+==================
+
+Opt-in in-process cache of LLM responses keyed on the exact request: provider,
+model, sampling settings, system prompt and prompt. Repeated planner or
+summarization prompts return the earlier response without a network call.
+Requests with attached files, streaming callbacks or a temperature above the
+configured ceiling are never cached.
+"""
+
+import dataclasses
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from cachetools import TTLCache
+
+from guidelines_agent.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+_responses: TTLCache = TTLCache(
+    maxsize=Config.LLM_RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=Config.LLM_RESPONSE_CACHE_TTL_SECONDS,
+)
+_lock = threading.Lock()
+
+
+def _request_key(request) -> Optional[str]:
+    """Returns the cache key for a request, or None when its response must not be cached."""
+    if not Config.LLM_RESPONSE_CACHE_ENABLED:
+        return None
+    if request.files or request.on_chunk is not None:
+        return None
+    if request.temperature > Config.LLM_RESPONSE_CACHE_MAX_TEMPERATURE:
+        return None
+
+    digest = hashlib.sha256()
+    for part in (request.provider.value, request.model, repr(request.temperature),
+                 repr(request.max_tokens), request.system_prompt or "", request.prompt):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def lookup_response(request):
+    """Returns the cached LLMResponse for an identical earlier request, or None."""
+    key = _request_key(request)
+    if key is None:
+        return None
+    with _lock:
+        response = _responses.get(key)
+    if response is None:
+        return None
+    logger.debug("LLM response cache hit for %s/%s", request.provider.value, request.model)
+    return dataclasses.replace(response, latency_ms=0)
+
+
+def store_response(request, response) -> None:
+    """Caches a successful response for the request."""
+    if not response.success:
+        return
+    key = _request_key(request)
+    if key is not None:
+        with _lock:
+            _responses[key] = response
+
+
+def clear_response_cache() -> None:
+    """Drops all cached responses."""
+    with _lock:
+        _responses.clear()
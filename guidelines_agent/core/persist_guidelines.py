@@ -2,8 +2,15 @@ import json
 import psycopg2
 from psycopg2 import sql
 from .config import DB_CONFIG
+from .query_cache import invalidate_guideline_caches
 from typing import Dict, Any
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 
 def get_db_connection():
     """Est-ablishes a connection to the PostgreSQL database using config.py."""
@@ -105,6 +112,7 @@ def persist_guidelines_from_data(
             )
 
             conn.commit()
+            invalidate_guideline_caches()
 
             return {
                 "status": "success",
@@ -131,8 +139,8 @@ def persist_guidelines_from_file(json_path: str):
     print(f"Starting persistence for: {json_path}")
 
     try:
-        with open(json_path, "r") as f:
-            data = json.load(f)
+        with open(json_path, "rb") as f:
+            data = _json_loads(f.read())
     except FileNotFoundError:
         print(f"Error: JSON file not found at {json_path}")
         return
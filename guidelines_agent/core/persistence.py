@@ -1,10 +1,14 @@
 import psycopg2
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from .config import DB_CONFIG
-from .embedding_service import generate_embeddings
-from typing import Dict, Any
+from psycopg2.extras import execute_values
+from .embedding_service import EmbeddingError, generate_embeddings, EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY
+from .query_cache import invalidate_guideline_caches
+from typing import Dict, Any, Tuple
 
 # --- Configuration ---
-BATCH_SIZE = 100  # Process 100 guidelines at a time
+BATCH_SIZE = EMBEDDING_BATCH_SIZE  # One embedding request per batch of guidelines
 
 
 def _get_db_connection():
@@ -18,16 +22,19 @@ def _get_db_connection():
         return None
 
 
-def _get_guidelines_without_embeddings(cursor):
-    """Fetches guidelines that do not have an embedding yet."""
+def _iter_guidelines_without_embeddings(conn):
+    """Yields batches of guidelines that do not have an embedding yet, streamed through a server-side cursor."""
     query = """
         SELECT g.portfolio_id, g.rule_id, p.portfolio_name, g.part, g.section, g.subsection, g.text
         FROM guideline g
         JOIN portfolio p ON g.portfolio_id = p.portfolio_id
         WHERE g.embedding IS NULL;
     """
-    cursor.execute(query)
-    return cursor.fetchall()
+    with conn.cursor(name="guidelines_without_embeddings") as cursor:
+        cursor.itersize = BATCH_SIZE
+        cursor.execute(query)
+        while batch := cursor.fetchmany(BATCH_SIZE):
+            yield batch
 
 
 def _generate_composite_text(guideline):
@@ -43,12 +50,39 @@ def _generate_composite_text(guideline):
 
 
 def _update_embeddings_in_db(cursor, updates):
-    """Updates the database with the newly generated embeddings."""
-    update_query = (
-        "UPDATE guideline SET embedding = %s WHERE portfolio_id = %s AND rule_id = %s;"
+    """Updates the database with the newly generated embeddings in a single statement."""
+    execute_values(
+        cursor,
+        "UPDATE guideline SET embedding = v.embedding "
+        "FROM (VALUES %s) AS v(portfolio_id, rule_id, embedding) "
+        "WHERE guideline.portfolio_id = v.portfolio_id AND guideline.rule_id = v.rule_id;",
+        updates,
+        template="(%s, %s, %s::vector)",
+        page_size=len(updates) or 1,
     )
-    for portfolio_id, rule_id, embedding in updates:
-        cursor.execute(update_query, (embedding, portfolio_id, rule_id))
+
+
+def _embed_batch(batch):
+    """Generates embeddings for a batch of guideline rows."""
+    return generate_embeddings(
+        texts=[_generate_composite_text(g) for g in batch],
+        task_type="RETRIEVAL_DOCUMENT",
+        title="Investment Guideline Embedding",
+    )
+
+
+def _store_batch(cursor, batch, future: Future) -> Tuple[int, bool]:
+    """Waits for a batch's embeddings and writes them. Returns (rows written, whether to defer the rest)."""
+    try:
+        embeddings = future.result()
+    except EmbeddingError as e:
+        # A retryable failure means later batches would hit the same quota/outage, so they
+        # are resumed on the next run; otherwise only this batch is lost
+        return 0, e.retryable
+
+    updates = [(g[0], g[1], emb) for g, emb in zip(batch, embeddings)]
+    _update_embeddings_in_db(cursor, updates)
+    return len(updates), False
 
 
 def stamp_missing_embeddings() -> Dict[str, Any]:
@@ -61,35 +95,35 @@ def stamp_missing_embeddings() -> Dict[str, Any]:
         return {"status": "error", "message": "Database connection failed."}
 
     try:
-        with conn.cursor() as cursor:
-            guidelines_to_process = _get_guidelines_without_embeddings(cursor)
-            if not guidelines_to_process:
+        # Embedding requests for up to EMBEDDING_CONCURRENCY batches are in flight at once;
+        # results are written on this thread, which owns the connection
+        with conn.cursor() as cursor, ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY) as executor:
+            total_found = 0
+            total_processed = 0
+            deferred = False
+            in_flight = deque()
+            for batch in _iter_guidelines_without_embeddings(conn):
+                total_found += len(batch)
+                if deferred:
+                    continue
+                in_flight.append((batch, executor.submit(_embed_batch, batch)))
+                if len(in_flight) >= EMBEDDING_CONCURRENCY:
+                    processed, deferred = _store_batch(cursor, *in_flight.popleft())
+                    total_processed += processed
+
+            while in_flight:
+                processed, _ = _store_batch(cursor, *in_flight.popleft())
+                total_processed += processed
+
+            if not total_found:
                 return {
                     "status": "no_action",
                     "message": "No new guidelines to embed. All guidelines are up to date.",
                 }
 
-            total_found = len(guidelines_to_process)
-            total_processed = 0
-            for i in range(0, len(guidelines_to_process), BATCH_SIZE):
-                batch = guidelines_to_process[i : i + BATCH_SIZE]
-                texts_to_embed = [_generate_composite_text(g) for g in batch]
-
-                embeddings = generate_embeddings(
-                    texts=texts_to_embed,
-                    task_type="RETRIEVAL_DOCUMENT",
-                    title="Investment Guideline Embedding",
-                )
-
-                if not embeddings:
-                    # Log this failure for the batch but try to continue
-                    continue
-
-                updates = [(g[0], g[1], emb) for g, emb in zip(batch, embeddings)]
-                _update_embeddings_in_db(cursor, updates)
-                total_processed += len(updates)
-
             conn.commit()
+            if total_processed:
+                invalidate_guideline_caches()
             return {
                 "status": "success",
                 "total_found": total_found,
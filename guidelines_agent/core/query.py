@@ -3,20 +3,19 @@ import logging
 from typing import List, Dict, Any
 import psycopg2
 from .config import DB_CONFIG
-from .embedding_service import generate_embeddings
+from .embedding_cache import get_query_embedding
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 def get_db_connection():
     """Establishes a connection to the PostgreSQL database."""
     try:
-        logging.info("Connecting to the database...")
+        logger.info("Connecting to the database...")
         conn = psycopg2.connect(**DB_CONFIG)
-        logging.info("Database connection successful.")
+        logger.info("Database connection successful.")
         return conn
     except psycopg2.OperationalError as e:
-        logging.error(f"Could not connect to the database: {e}")
+        logger.error("Could not connect to the database: %s", e)
         return None
 
 
@@ -25,7 +24,7 @@ def find_similar_guidelines(cursor, query_embedding, portfolio_id=None, top_k=5)
     base_query = """
         SELECT
             g.text, g.provenance, g.page, p.portfolio_name,
-            1 - (g.embedding <=> %s::vector) AS similarity
+            -(g.embedding <#> %s::vector) AS similarity
         FROM guideline g
         JOIN portfolio p ON g.portfolio_id = p.portfolio_id
     """
@@ -35,33 +34,33 @@ def find_similar_guidelines(cursor, query_embedding, portfolio_id=None, top_k=5)
         base_query += " WHERE g.portfolio_id = %s"
         params.append(portfolio_id)
 
-    base_query += " ORDER BY similarity DESC LIMIT %s;"
-    params.append(top_k)
+    # Embeddings are unit-length, so the inner product orders by cosine similarity
+    base_query += " ORDER BY g.embedding <#> %s::vector LIMIT %s;"
+    params.extend([query_embedding, top_k])
 
-    logging.info(f"Executing query with top_k={top_k} and portfolio_id='{portfolio_id}'")
+    logger.info("Executing query with top_k=%s and portfolio_id='%s'", top_k, portfolio_id)
     cursor.execute(base_query, params)
     results = cursor.fetchall()
-    logging.info(f"Found {len(results)} results from the database.")
+    logger.info("Found %d results from the database.", len(results))
     return results
 
 
 def query_guidelines(
-    query: str, portfolio_id: str = None, top_k: int = 5
+    query: str, portfolio_id: str = None, top_k: int = 5, use_cache: bool = True
 ) -> List[Dict[str, Any]]:
     """
     Performs a semantic search for guidelines and returns structured data.
     This function is designed to be called from other modules, including an API.
     It does not print to the console.
     """
-    logging.info(f"Starting guideline query for: '{query}'")
+    logger.info("Starting guideline query for: '%s'", query)
     
-    logging.info("Generating embeddings for the query...")
-    embeddings = generate_embeddings(texts=[query], task_type="RETRIEVAL_QUERY")
-    if not embeddings:
-        logging.error("Failed to generate embeddings for the query.")
+    logger.info("Generating embeddings for the query...")
+    query_embedding = get_query_embedding(query, "RETRIEVAL_QUERY", use_cache=use_cache)
+    if not query_embedding:
+        logger.error("Failed to generate embeddings for the query.")
         return []
-    query_embedding = embeddings[0]
-    logging.info("Embeddings generated successfully.")
+    logger.info("Embeddings generated successfully.")
 
     conn = get_db_connection()
     if not conn:
@@ -82,17 +81,17 @@ def query_guidelines(
                     "page": page,
                     "similarity": similarity,
                 }
-                logging.info(f"Processing result #{i+1}: Similarity={similarity}")
+                logger.debug("Processing result #%d: Similarity=%s", i + 1, similarity)
                 results.append(result_item)
     except Exception as e:
-        logging.error(f"An exception occurred during database query: {e}", exc_info=True)
+        logger.error("An exception occurred during database query: %s", e, exc_info=True)
         return []
     finally:
         if conn:
             conn.close()
-            logging.info("Database connection closed.")
+            logger.info("Database connection closed.")
 
-    logging.info(f"Query finished. Returning {len(results)} results.")
+    logger.info("Query finished. Returning %d results.", len(results))
     return results
 
 def query_guidelines_api(
@@ -101,5 +100,5 @@ def query_guidelines_api(
     """
     API wrapper for performing a semantic search for guidelines.
     """
-    logging.info("API call received for query_guidelines_api.")
+    logger.info("API call received for query_guidelines_api.")
     return query_guidelines(query, portfolio_id, top_k)
@@ -0,0 +1,25 @@
+"""
+Query Answer Cache
+==================
+
+Semantic cache of agent answers to self-contained queries, shared by every
+route. Answers are read from the stored guidelines, so any write to guidelines
+or their embeddings must call invalidate_guideline_caches(), which also drops
+cached search results.
+"""
+
+from guidelines_agent.core.config import Config
+from guidelines_agent.core.search_cache import invalidate_search_cache
+from guidelines_agent.core.semantic_cache import SemanticCache
+
+query_cache = SemanticCache(
+    threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=Config.SEMANTIC_CACHE_TTL_SECONDS,
+    max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+)
+
+
+def invalidate_guideline_caches() -> None:
+    """Drops cached search results and agent answers; call after guidelines or embeddings change."""
+    invalidate_search_cache()
+    query_cache.clear()
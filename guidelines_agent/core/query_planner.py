@@ -1,13 +1,24 @@
 import os
 import json
+import re
 import sys
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Callable, Dict, Any, Optional
 from guidelines_agent.core.llm_providers import llm_manager, LLMProvider
 from guidelines_agent.core.config import Config
+from guidelines_agent.core.json_utils import extract_json_from_text
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # --- Configuration ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-PLANNER_MODEL = Config.GENERATIVE_MODEL
+PLANNER_MODEL = Config.PLANNER_MODEL
+# Largest retrieval a plan may ask for; the prompt's own largest default is 100
+MAX_PLAN_TOP_K = 100
 
 # ==============================================================================
 # --- PLANNER PROMPT ---
@@ -71,15 +82,52 @@ User Query: "{query}"
 """
 # ==============================================================================
 
+# The template rendered once around a placeholder: every plan prompt is prefix + query + suffix,
+# with a byte-identical prefix across calls
+_PLANNER_PREFIX, _PLANNER_SUFFIX = PLANNER_PROMPT.format(query="\0").split("\0")
+
+
+@lru_cache(maxsize=None)
+def _plan_field_re(field: str) -> re.Pattern:
+    """Compiled pattern matching a complete JSON string value for field."""
+    return re.compile(rf'"{re.escape(field)}"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def extract_plan_field(text: str, field: str) -> Optional[str]:
+    """
+    Returns a string field of the plan once its value is complete in (possibly partial)
+    planner output, so callers streaming the plan can act before the JSON is finished.
+    """
+    match = _plan_field_re(field).search(text)
+    if not match:
+        return None
+    try:
+        return _json_loads(f'"{match.group(1)}"')
+    except json.JSONDecodeError:
+        return None
+
+
+def plan_top_k(plan: dict, default: int) -> int:
+    """
+    Returns the plan's top_k clamped to [1, MAX_PLAN_TOP_K]. The value comes from model
+    output, so anything that isn't a whole number (e.g. "ten", "5-10") falls back to default.
+    """
+    try:
+        top_k = int(plan.get("top_k") or default)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(top_k, MAX_PLAN_TOP_K))
+
 
 def generate_query_plan(user_query: str, 
                        provider: LLMProvider = None,
-                       model: str = None) -> dict:
+                       model: str = None,
+                       on_chunk: Optional[Callable[[str], None]] = None) -> dict:
     """
     Uses a generative model to create a structured plan from a user query.
-    Designed to be called from an API.
+    Designed to be called from an API. on_chunk receives the raw plan text as it streams.
     """
-    prompt = PLANNER_PROMPT.format(query=user_query)
+    prompt = _PLANNER_PREFIX + user_query + _PLANNER_SUFFIX
     
     try:
         # Use the new LLM manager instead of direct genai calls
@@ -87,15 +135,16 @@ def generate_query_plan(user_query: str,
             prompt=prompt,
             provider=provider or LLMProvider.GEMINI,
             model=model or PLANNER_MODEL,
-            temperature=0.1
+            temperature=0.1,
+            on_chunk=on_chunk
         )
         
         if not response.success:
             return {"error": f"LLM API call failed: {response.error}"}
         
-        # Clean the response to ensure it's valid JSON
-        json_text = response.content.strip().replace("```json", "").replace("```", "")
-        plan = json.loads(json_text)
+        # Locate the JSON object (fenced or bare) in a single pass
+        json_text = extract_json_from_text(response.content) or response.content
+        plan = _json_loads(json_text)
         return plan
         
     except Exception as e:
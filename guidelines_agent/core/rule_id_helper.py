@@ -1,7 +1,16 @@
 import hashlib
+import re
+
+_WS_RE = re.compile(r"\s+")
+_NON_ID_RE = re.compile(r"[^a-z0-9_]")
 
 
 def generate_rule_id(doc_id, section, text):
     """Generate a stable deterministic rule ID for a guideline."""
     base = f"{doc_id}|{section}|{text}".encode("utf-8")
     return hashlib.sha1(base).hexdigest()[:16]
+
+
+def generate_clean_id(text):
+    """Generates a clean, lowercase ID from a string."""
+    return _NON_ID_RE.sub("", _WS_RE.sub("_", text.lower()))
@@ -0,0 +1,46 @@
+"""
+Search Result Cache
+===================
+
+Opt-in semantic cache of guideline search results. Near-duplicate queries with
+the same scope (portfolio filter, top_k, ...) reuse earlier results instead of
+re-running the vector search. Any write to guidelines or their embeddings
+clears it, so results never outlive the data they were read from.
+"""
+
+import logging
+from typing import Any, Hashable, List, Optional
+
+from guidelines_agent.core.config import Config
+from guidelines_agent.core.semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+search_cache = SemanticCache(
+    threshold=Config.SEARCH_CACHE_THRESHOLD,
+    ttl_seconds=Config.SEARCH_CACHE_TTL_SECONDS,
+    max_entries=Config.SEARCH_CACHE_MAX_ENTRIES,
+)
+
+
+def lookup_search_results(embedding: List[float], scope: Hashable) -> Optional[List[Any]]:
+    """Returns a copy of the cached results for a similar query in scope, or None."""
+    if not Config.SEARCH_CACHE_ENABLED:
+        return None
+    cached = search_cache.lookup(embedding, scope)
+    if cached is None:
+        return None
+    results, similarity = cached
+    logger.debug("Search cache hit (similarity=%.3f) for scope %s", similarity, scope)
+    return list(results)
+
+
+def store_search_results(query: str, embedding: List[float], results: List[Any], scope: Hashable) -> None:
+    """Caches search results for a query embedding."""
+    if Config.SEARCH_CACHE_ENABLED and results:
+        search_cache.put(query, embedding, list(results), scope)
+
+
+def invalidate_search_cache() -> None:
+    """Drops all cached search results; call after guidelines or embeddings change."""
+    search_cache.clear()
@@ -0,0 +1,222 @@
+"""
+Semantic Cache
+==============
+
+In-process cache keyed on query embeddings. A lookup returns the value stored
+for the most similar previous query when the cosine similarity clears the
+configured threshold, so paraphrased questions can skip the LLM round-trips.
+When numpy is installed, each scope's embeddings are kept as rows of one
+growable float32 matrix and a lookup is a single matrix-vector product instead
+of a Python loop per entry. Removed rows are zeroed and compacted in batches.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Initial row capacity of a scope's matrix; it doubles when full
+_MIN_ROWS = 16
+
+
+@dataclass
+class CacheEntry:
+    """A cached value together with the row holding its query's normalized embedding."""
+    text: str
+    value: Any
+    scope: Hashable
+    expires_at: float
+    row: int
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    """Scale a vector to unit length so a dot product is its cosine similarity."""
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return list(vector)
+    return [x / norm for x in vector]
+
+
+class _ScopeRows:
+    """Normalized embeddings of one scope's entries, one row per entry.
+
+    Removed rows are zeroed (scoring 0) and their key set to None until the
+    next compaction, so removal never shifts the rows of other entries.
+    """
+
+    def __init__(self, dim: int):
+        self.rows: Any = np.zeros((_MIN_ROWS, dim), dtype=np.float32) if np is not None else []
+        self.keys: List[Optional[int]] = []
+        self.live = 0
+
+    def append(self, key: int, vector: Any) -> int:
+        row = len(self.keys)
+        if np is not None:
+            if row == len(self.rows):
+                grown = np.zeros((2 * row, self.rows.shape[1]), dtype=np.float32)
+                grown[:row] = self.rows
+                self.rows = grown
+            self.rows[row] = vector
+        else:
+            self.rows.append(vector)
+        self.keys.append(key)
+        self.live += 1
+        return row
+
+    def remove(self, row: int) -> None:
+        self.keys[row] = None
+        if np is not None:
+            self.rows[row] = 0.0
+        else:
+            self.rows[row] = None
+        self.live -= 1
+
+    def needs_compaction(self) -> bool:
+        """True once removed rows outnumber live ones, so compaction cost is amortized."""
+        return len(self.keys) > _MIN_ROWS and len(self.keys) - self.live > self.live
+
+    def compact(self) -> List[int]:
+        """Drop removed rows and return the live keys in their new row order."""
+        live_rows = [row for row, key in enumerate(self.keys) if key is not None]
+        self.keys = [self.keys[row] for row in live_rows]
+        if np is not None:
+            capacity = max(_MIN_ROWS, 2 * len(live_rows))
+            packed = np.zeros((capacity, self.rows.shape[1]), dtype=np.float32)
+            packed[:len(live_rows)] = self.rows[live_rows]
+            self.rows = packed
+        else:
+            self.rows = [self.rows[row] for row in live_rows]
+        return self.keys
+
+    def best(self, query: Any) -> Tuple[Optional[int], float]:
+        """Return the key and score of the row most similar to the normalized query."""
+        if np is not None:
+            scores = self.rows[:len(self.keys)] @ query
+            row = int(scores.argmax())
+            return self.keys[row], float(scores[row])
+
+        best_key, best_score = None, -1.0
+        for key, vector in zip(self.keys, self.rows):
+            if key is None:
+                continue
+            score = sum(a * b for a, b in zip(query, vector))
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key, best_score
+
+
+class SemanticCache:
+    """LRU cache with TTL that matches entries by embedding similarity."""
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: int = 3600, max_entries: int = 512):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._next_key = 0
+        self._scopes: Dict[Hashable, _ScopeRows] = {}
+        # (expires_at, key) in insertion order; the TTL is fixed, so expiry order matches it
+        self._expiry: Deque[Tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, embedding: List[float], scope: Hashable = None) -> Optional[Tuple[Any, float]]:
+        """Return (value, similarity) of the closest entry in scope, or None below threshold."""
+        if not embedding:
+            return None
+
+        query = self._prepare(embedding)
+        with self._lock:
+            self._expire(time.monotonic())
+
+            rows = self._scopes.get(scope)
+            best_key, best_score = rows.best(query) if rows is not None else (None, -1.0)
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key].value, best_score
+
+    def put(self, text: str, embedding: List[float], value: Any, scope: Hashable = None) -> None:
+        """Store a value for the given query embedding, evicting the least recently used entry."""
+        if not embedding:
+            return
+
+        vector = self._prepare(embedding)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            rows = self._scopes.get(scope)
+            if rows is None:
+                rows = self._scopes[scope] = _ScopeRows(len(vector))
+
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = CacheEntry(
+                text=text,
+                value=value,
+                scope=scope,
+                expires_at=now + self.ttl_seconds,
+                row=rows.append(key, vector),
+            )
+            self._expiry.append((now + self.ttl_seconds, key))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            self._expiry.clear()
+
+    @staticmethod
+    def _prepare(embedding: List[float]) -> Any:
+        """Normalize an embedding into the row format used for scoring."""
+        if np is None:
+            return _normalize(embedding)
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float) -> None:
+        """Remove entries whose TTL has passed, oldest first."""
+        while self._expiry and self._expiry[0][0] <= now:
+            _, key = self._expiry.popleft()
+            # Entries evicted or cleared earlier leave stale queue items behind
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: int) -> None:
+        entry = self._entries.pop(key)
+        rows = self._scopes[entry.scope]
+        rows.remove(entry.row)
+        if not rows.live:
+            del self._scopes[entry.scope]
+        elif rows.needs_compaction():
+            for row, live_key in enumerate(rows.compact()):
+                self._entries[live_key].row = row
+
+    def get_stats(self) -> dict:
+        """Get cache statistics."""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -4,13 +4,28 @@ Uses in-memory storage with LangChain memory classes for conversation history.
 """
 import uuid
 import time
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import threading
+from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, field
 from langchain.memory import ConversationBufferWindowMemory
+from guidelines_agent.core.config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rough characters-per-token ratio used to keep prompt history within a token budget
+CHARS_PER_TOKEN = 4
+
+HISTORY_SUMMARY_PROMPT = """Update the running summary of a conversation about investment guidelines.
+Keep portfolio names, limits, and open questions; drop pleasantries. Reply with the summary only.
+
+Current summary:
+{summary}
+
+New conversation turns:
+{turns}
+"""
+
 @dataclass
 class SessionInfo:
     session_id: str
@@ -18,6 +33,8 @@ class SessionInfo:
     last_accessed: float
     memory: ConversationBufferWindowMemory
     context: Dict[str, Any]  # Store additional context like active portfolios, preferences
+    history_summary: str = ""  # Rolling summary of turns older than the verbatim window
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)  # Serializes writes and summary folds
 
 class SessionStore:
     """
@@ -83,41 +100,100 @@ class SessionStore:
         return session
     
     def add_message(self, session_id: str, user_message: str, ai_message: str) -> bool:
-        """Add a user/AI message pair to session memory."""
+        """Add a user/AI message pair to session memory.
+        
+        Once enough turns have left the verbatim window they are folded into the
+        rolling summary here, so reading history never calls the summarizer.
+        """
         session = self.get_session(session_id)
         if not session:
             return False
         
-        # Add to memory
-        session.memory.save_context(
-            {"input": user_message}, 
-            {"output": ai_message}
-        )
+        with session.lock:
+            # Add to memory
+            session.memory.save_context(
+                {"input": user_message}, 
+                {"output": ai_message}
+            )
+            
+            lines = self._message_lines(session)
+            # Each turn is a user/assistant message pair
+            older_turns = max(0, len(lines) // 2 - Config.SESSION_HISTORY_WINDOW_TURNS)
+            if older_turns >= Config.SESSION_SUMMARY_EVERY_TURNS:
+                self._update_summary(session, lines[:older_turns * 2])
         
-        logger.debug(f"Added message to session {session_id}")
+        logger.debug("Added message to session %s", session_id)
         return True
     
-    def get_conversation_history(self, session_id: str) -> str:
-        """Get formatted conversation history for prompt inclusion."""
+    def get_conversation_history(self, session_id: str, max_tokens: Optional[int] = None) -> str:
+        """Get formatted conversation history for prompt inclusion.
+        
+        The rolling summary comes first, followed by the most recent turns verbatim.
+        Reading has no side effects; summarization happens in add_message.
+        """
+        session = self.get_session(session_id)
+        if not session:
+            return ""
+        return self._format_history(session, max_tokens)
+    
+    def get_history_and_context(self, session_id: str,
+                                max_tokens: Optional[int] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Get the prompt history and context of a session in one lookup, or None if it doesn't exist."""
         session = self.get_session(session_id)
         if not session:
+            return None
+        return self._format_history(session, max_tokens), session.context
+    
+    @staticmethod
+    def _message_lines(session: SessionInfo) -> List[str]:
+        """Render a session's live messages as "User: ..." / "Assistant: ..." lines."""
+        return [
+            f"{'User' if message.type == 'human' else 'Assistant'}: {message.content}"
+            for message in list(session.memory.chat_memory.messages)
+            if hasattr(message, 'type') and hasattr(message, 'content')
+        ]
+    
+    def _format_history(self, session: SessionInfo, max_tokens: Optional[int]) -> str:
+        """Format a session's conversation history within the prompt token budget."""
+        recent = self._message_lines(session)
+        if not recent and not session.history_summary:
             return ""
         
-        # Get the memory variables
-        memory_vars = session.memory.load_memory_variables({})
-        history = memory_vars.get("chat_history", [])
+        budget = (max_tokens or Config.SESSION_HISTORY_MAX_TOKENS) * CHARS_PER_TOKEN
+        summary = f"Summary of earlier conversation: {session.history_summary}" if session.history_summary else ""
         
-        if not history:
-            return ""
+        # Drop the oldest verbatim lines first, then clip whatever still overflows
+        size = len(summary) + sum(len(line) + 1 for line in recent)
+        while recent and size > budget:
+            size -= len(recent.pop(0)) + 1
         
-        # Format as text for prompt
-        formatted_history = []
-        for message in history:
-            if hasattr(message, 'type') and hasattr(message, 'content'):
-                role = "User" if message.type == "human" else "Assistant"
-                formatted_history.append(f"{role}: {message.content}")
+        history = "\n".join([summary] + recent if summary else recent)
+        return history[-budget:]
+    
+    def _update_summary(self, session: SessionInfo, folded_lines: List[str]) -> None:
+        """Fold turns that left the verbatim window into the rolling summary and drop them from memory."""
+        new_turns = "\n".join(folded_lines)
+        try:
+            from guidelines_agent.core.llm_providers import llm_manager
+            provider = llm_manager.get_default_provider()
+            response = llm_manager.generate_response(
+                prompt=HISTORY_SUMMARY_PROMPT.format(
+                    summary=session.history_summary or "(none)", turns=new_turns
+                ),
+                model=Config.get_summarizer_model(provider),
+                provider=provider,
+                temperature=0.1,
+                metadata={"operation": "conversation_summary", "session_id": session.session_id}
+            )
+            if not response.success:
+                raise RuntimeError(response.error)
+            session.history_summary = response.content.strip()
+        except Exception as e:
+            # Keep a clipped transcript rather than growing the verbatim window without bound
+            logger.warning("History summarization failed for session %s: %s", session.session_id, e)
+            session.history_summary = f"{session.history_summary}\n{new_turns[:500]}".strip()
         
-        return "\n".join(formatted_history)
+        del session.memory.chat_memory.messages[:len(folded_lines)]
     
     def update_context(self, session_id: str, context_update: Dict[str, Any]) -> bool:
         """Update session context (active portfolios, preferences, etc.)."""
@@ -126,7 +202,7 @@ class SessionStore:
             return False
         
         session.context.update(context_update)
-        logger.debug(f"Updated context for session {session_id}: {context_update}")
+        logger.debug("Updated context for session %s: %s", session_id, context_update)
         return True
     
     def get_context(self, session_id: str) -> Dict[str, Any]:
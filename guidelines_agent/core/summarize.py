@@ -1,5 +1,6 @@
 import os
 import sys
+from typing import Callable, Optional
 from rich.console import Console
 from guidelines_agent.core.llm_providers import llm_manager, LLMProvider
 from guidelines_agent.core.config import Config
@@ -53,7 +54,8 @@ A concise, 1-2 sentence summary that directly answers the user's query.
 
 def generate_summary(query: str, context: str,
                     provider: LLMProvider = None,
-                    model: str = None) -> str:
+                    model: str = None,
+                    on_chunk: Optional[Callable[[str], None]] = None) -> str:
     """
     Core logic for generating a summary from a given context based on a query.
     Designed to be called from an API with multiple LLM provider support.
@@ -63,6 +65,7 @@ def generate_summary(query: str, context: str,
         context: Retrieved context to summarize  
         provider: LLM provider to use (defaults to configured default)
         model: Model name to use (defaults to provider default)
+        on_chunk: Optional callback receiving summary text as it streams
         
     Returns:
         Generated summary text
@@ -71,8 +74,7 @@ def generate_summary(query: str, context: str,
     if provider is None:
         provider = Config.get_default_provider()
     if model is None:
-        config = Config.get_llm_config(provider)
-        model = config.model if config else GENERATIVE_MODEL
+        model = Config.get_summarizer_model(provider) or GENERATIVE_MODEL
     
     if not GEMINI_API_KEY and provider == LLMProvider.GEMINI:
         return "Error: GEMINI_API_KEY environment variable not set."
@@ -93,7 +95,8 @@ def generate_summary(query: str, context: str,
             model=model,
             provider=provider,
             temperature=0.1,
-            metadata=metadata
+            metadata=metadata,
+            on_chunk=on_chunk
         )
         
         if not response.success:
@@ -7,11 +7,13 @@ This replaces the old mcp_server/main.py with a cleaner structure:
 - Data access through repository pattern
 - Clean dependency injection
 """
+import asyncio
 import logging
 import logging.config
 import os
 import sys
 import yaml
+import anyio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -20,6 +22,12 @@ from fastapi.responses import JSONResponse
 # Add project root to Python path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Import services for startup
+from guidelines_agent.api.deps import get_agent_service, get_guideline_service
+from guidelines_agent.core.config import Config
+from guidelines_agent.core.executor import run_blocking, shutdown_executor
+from guidelines_agent.core.llm_providers import llm_manager
+
 # Configure logging from YAML file
 def setup_logging():
     """Setup logging configuration from logging.yaml"""
@@ -50,9 +58,6 @@ from guidelines_agent.api.routes.session_routes import router as session_router
 from guidelines_agent.api.routes.config_routes import router as config_router
 from guidelines_agent.api.routes.mcp_routes import router as mcp_router
 
-# Import services for startup
-from guidelines_agent.services import AgentService
-
 logger = logging.getLogger(__name__)
 
 
@@ -62,9 +67,21 @@ async def lifespan(app: FastAPI):
     logger.info("Server startup: Initializing AI agents...")
     
     try:
-        # Initialize agent service (this will create agents on first use)
-        agent_service = AgentService()
-        logger.info("Server startup: AI agents initialized successfully.")
+        anyio.to_thread.current_default_thread_limiter().total_tokens = Config.MAX_BLOCKING_CONCURRENCY
+        
+        # Build the shared agents once so the first request doesn't pay for construction
+        agent_service = get_agent_service()
+        app.state.agent_service = agent_service
+        try:
+            agent_service.warmup()
+            logger.info("Server startup: AI agents initialized successfully.")
+        except Exception as e:
+            logger.warning(f"Server startup: agent warm-up failed, agents will be built on first use: {e}")
+        
+        # Open the first DB connection, embedding channel and LLM provider connections now
+        # rather than on the first request
+        await asyncio.gather(run_blocking(get_guideline_service().warmup),
+                             run_blocking(llm_manager.warmup))
         
         yield
         
@@ -73,6 +90,12 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         logger.info("Server shutdown: Cleaning up...")
+        from guidelines_agent.agent.agent_main import aclose_llm
+        try:
+            await aclose_llm()
+        except Exception as e:
+            logger.warning(f"Server shutdown: failed to close LLM client: {e}")
+        shutdown_executor()
 
 
 # Create FastAPI app
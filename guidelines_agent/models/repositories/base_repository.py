@@ -1,6 +1,7 @@
 """Base repository class with common database operations."""
 from abc import ABC, abstractmethod
 from typing import Any, List, Optional, Dict
+from psycopg2.extras import execute_values
 from guidelines_agent.models.database import db_manager
 import logging
 
@@ -31,6 +32,12 @@ class BaseRepository(ABC):
             cursor.executemany(command, param_list)
             return cursor.rowcount
     
+    def _execute_values(self, command: str, param_list: List[tuple], template: Optional[str] = None) -> int:
+        """Execute a command with a VALUES %s placeholder for all rows in one statement."""
+        with self.db_manager.get_cursor() as cursor:
+            execute_values(cursor, command, param_list, template=template, page_size=len(param_list) or 1)
+            return cursor.rowcount
+    
     def _get_single_result(self, query: str, params: tuple = None) -> Optional[Dict[str, Any]]:
         """Execute query and return single result or None."""
         results = self._execute_query(query, params)
@@ -2,6 +2,8 @@
 from typing import List, Optional, Dict, Any
 from guidelines_agent.models.entities.portfolio import Guideline, GuidelineSearchResult
 from guidelines_agent.models.repositories.base_repository import BaseRepository
+from guidelines_agent.core.config import Config
+from guidelines_agent.core.embedding_service import EMBEDDING_DIMENSIONS
 import logging
 import json
 
@@ -122,26 +124,47 @@ class GuidelineRepository(BaseRepository):
     
     def semantic_search(self, query_embedding: List[float], portfolio_ids: Optional[List[str]] = None,
                        top_k: int = 10, similarity_threshold: float = 0.5) -> List[GuidelineSearchResult]:
-        """Perform semantic search using vector similarity."""
-        query_base = """
+        """Perform semantic search using vector similarity.
+        
+        Embeddings are stored unit-length, so cosine similarity is the inner product;
+        <#> returns its negation, and ordering on it can use a vector_ip_ops index.
+        With SEARCH_BINARY_PREFILTER, candidates come from a Hamming-distance scan over
+        binary-quantized embeddings (1 bit per dimension) and only those are re-ranked
+        with the full vectors.
+        """
+        portfolio_filter = ""
+        filter_params: List[Any] = []
+        if portfolio_ids:
+            placeholders = ",".join(["%s"] * len(portfolio_ids))
+            portfolio_filter = f" AND g.portfolio_id IN ({placeholders})"
+            filter_params = list(portfolio_ids)
+        
+        source = "guideline g"
+        source_params: List[Any] = []
+        if Config.SEARCH_BINARY_PREFILTER:
+            bits = f"bit({EMBEDDING_DIMENSIONS})"
+            source = f"""(
+                SELECT g.* FROM guideline g
+                WHERE g.embedding IS NOT NULL{portfolio_filter}
+                ORDER BY binary_quantize(g.embedding)::{bits} <~> binary_quantize(%s::vector)::{bits}
+                LIMIT %s
+            ) g"""
+            source_params = filter_params + [query_embedding, top_k * Config.SEARCH_RERANK_FACTOR]
+        
+        query_base = f"""
             SELECT g.portfolio_id, g.rule_id, g.doc_id, g.part, g.section, g.subsection,
                    g.text, g.page, g.provenance, g.structured_data, g.embedding,
                    p.portfolio_name,
-                   (1 - (g.embedding <=> %s::vector)) as similarity
-            FROM guideline g
+                   -(g.embedding <#> %s::vector) as similarity
+            FROM {source}
             JOIN portfolio p ON g.portfolio_id = p.portfolio_id
             WHERE g.embedding IS NOT NULL
-              AND (1 - (g.embedding <=> %s::vector)) >= %s
+              AND -(g.embedding <#> %s::vector) >= %s{portfolio_filter}
+            ORDER BY g.embedding <#> %s::vector LIMIT {top_k}
         """
         
-        params = [query_embedding, query_embedding, similarity_threshold]
-        
-        if portfolio_ids:
-            placeholders = ",".join(["%s"] * len(portfolio_ids))
-            query_base += f" AND g.portfolio_id IN ({placeholders})"
-            params.extend(portfolio_ids)
-        
-        query_base += f" ORDER BY similarity DESC LIMIT {top_k}"
+        params = ([query_embedding] + source_params + [query_embedding, similarity_threshold]
+                  + filter_params + [query_embedding])
         
         try:
             results = self._execute_query(query_base, params)
@@ -171,6 +194,25 @@ class GuidelineRepository(BaseRepository):
             logger.error(f"Error updating embedding for {portfolio_id}/{rule_id}: {e}")
             return False
     
+    def update_embeddings_batch(self, updates: List[tuple]) -> int:
+        """Update embeddings for many guidelines in one round trip.
+        
+        Args:
+            updates: (portfolio_id, rule_id, embedding) tuples
+        """
+        if not updates:
+            return 0
+        try:
+            command = """
+                UPDATE guideline SET embedding = v.embedding
+                FROM (VALUES %s) AS v(portfolio_id, rule_id, embedding)
+                WHERE guideline.portfolio_id = v.portfolio_id AND guideline.rule_id = v.rule_id
+            """
+            return self._execute_values(command, updates, template="(%s, %s, %s::vector)")
+        except Exception as e:
+            logger.error(f"Error updating embeddings batch of {len(updates)}: {e}")
+            return 0
+    
     def get_guidelines_without_embeddings(self, limit: Optional[int] = None) -> List[Guideline]:
         """Get guidelines that don't have embeddings yet."""
         query = """
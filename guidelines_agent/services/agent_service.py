@@ -1,13 +1,33 @@
 """Agent service for AI agent orchestration and management."""
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 from guidelines_agent.services.base_service import BaseService
 from guidelines_agent.services.document_service import DocumentService
 from guidelines_agent.services.guideline_service import GuidelineService
 from guidelines_agent.core.session_store import session_store
+from guidelines_agent.core.query_cache import query_cache
+from guidelines_agent.core.config import Config
+from guidelines_agent.core.executor import run_blocking
+import asyncio
+import functools
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Bounds concurrent agent runs across requests to respect provider rate limits
+_agent_semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_AGENT_REQUESTS)
+
+# Agent runs in progress, keyed by (portfolio scope, normalized query), for single-flight
+_inflight_queries: Dict[tuple, asyncio.Task] = {}
+
+
+def _release_inflight(key: tuple, task: asyncio.Task) -> None:
+    """Drop a finished run from the single-flight table."""
+    if _inflight_queries.get(key) is task:
+        del _inflight_queries[key]
+    if not task.cancelled():
+        task.exception()  # Mark retrieved so a run nobody awaited doesn't log it again
+
 
 class AgentService(BaseService):
     """Service for AI agent orchestration and high-level operations."""
@@ -26,6 +46,11 @@ class AgentService(BaseService):
             self._query_agent = create_query_agent()
         return self._query_agent
     
+    def get_query_graph(self):
+        """Get the fixed plan/search/summarize query graph."""
+        from guidelines_agent.agent.agent_main import create_query_graph
+        return create_query_graph()
+    
     def get_ingestion_agent(self):
         """Get or create ingestion agent.""" 
         if self._ingestion_agent is None:
@@ -33,56 +58,258 @@ class AgentService(BaseService):
             self._ingestion_agent = create_ingestion_agent()
         return self._ingestion_agent
     
-    def get_stateful_query_agent(self, session_id: str):
-        """Get or create stateful query agent for session."""
+    def get_stateful_query_agent(self):
+        """Get the shared stateful query agent; session state is passed per invocation."""
         from guidelines_agent.agent.agent_main import create_stateful_query_agent
-        return create_stateful_query_agent(session_id)
+        return create_stateful_query_agent()
+    
+    def warmup(self) -> None:
+        """Build the shared agents ahead of the first request."""
+        self.get_ingestion_agent()
+        self.get_query_graph()
+        if Config.GEMINI_API_KEY:
+            self.get_query_agent()
+            self.get_stateful_query_agent()
+    
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        """Embed a query for semantic cache lookups, or None if embedding is unavailable."""
+        if not Config.SEMANTIC_CACHE_ENABLED:
+            return None
+        try:
+            from guidelines_agent.core.embedding_cache import get_query_embedding
+            return get_query_embedding(query, "RETRIEVAL_QUERY")
+        except Exception as e:
+            self.logger.warning(f"Semantic cache disabled for this query, embedding failed: {e}")
+            return None
+    
+    async def _aembed_query(self, query: str) -> Optional[List[float]]:
+        """Async _embed_query; concurrent requests share one embedding API call."""
+        if not Config.SEMANTIC_CACHE_ENABLED:
+            return None
+        try:
+            from guidelines_agent.core.embedding_cache import aget_query_embedding
+            return await aget_query_embedding(query, "RETRIEVAL_QUERY")
+        except Exception as e:
+            self.logger.warning(f"Semantic cache disabled for this query, embedding failed: {e}")
+            return None
+    
+    def _prepare_query(self, query: str, portfolio_ids: Optional[List[str]],
+                       session_id: Optional[str]) -> Dict[str, Any]:
+        """Load session state and check the semantic cache before running an agent."""
+        prepared = self._load_session(portfolio_ids, session_id)
+        if self._is_self_contained(prepared):
+            self._check_cache(query, session_id, prepared, self._embed_query(query))
+        return prepared
+    
+    @staticmethod
+    def _is_self_contained(prepared: Dict[str, Any]) -> bool:
+        """Whether the answer depends on the query and portfolio scope alone.
+        
+        Follow-up turns depend on the conversation so far, and session context is
+        added to the agent's prompt, so either makes the answer session-specific.
+        """
+        return not prepared["conversation_history"] and not prepared["session_context"]
+    
+    def _load_session(self, portfolio_ids: Optional[List[str]],
+                      session_id: Optional[str]) -> Dict[str, Any]:
+        """Load session history and context for a query."""
+        # One session lookup serves both the history and the context
+        session = session_store.get_history_and_context(session_id) if session_id else None
+        conversation_history, session_context = session or ("", None)
+        
+        return {
+            "session_found": session is not None,
+            "session_context": session_context,
+            "conversation_history": conversation_history,
+            # The portfolio scope must match exactly so similar names never share answers
+            "cache_scope": tuple(sorted(portfolio_ids)) if portfolio_ids else None,
+            "query_embedding": None,
+            "cached_output": None
+        }
+    
+    def _check_cache(self, query: str, session_id: Optional[str], prepared: Dict[str, Any],
+                     query_embedding: Optional[List[float]]) -> None:
+        """Serve paraphrases of earlier self-contained queries from the semantic cache."""
+        prepared["query_embedding"] = query_embedding
+        cached = query_cache.lookup(query_embedding, prepared["cache_scope"]) if query_embedding else None
+        if cached:
+            output, similarity = cached
+            self.logger.info(f"Semantic cache hit (similarity={similarity:.3f}) for query: {query}")
+            if prepared["session_found"]:
+                session_store.add_message(session_id, query, output)
+            prepared["cached_output"] = output
+    
+    async def _aprepare_query(self, query: str, portfolio_ids: Optional[List[str]],
+                              session_id: Optional[str]) -> Dict[str, Any]:
+        """Async _prepare_query: the session and embedding lookups run off the event loop."""
+        prepared = await run_blocking(self._load_session, portfolio_ids, session_id)
+        if self._is_self_contained(prepared):
+            self._check_cache(query, session_id, prepared, await self._aembed_query(query))
+        return prepared
+    
+    def _select_agent(self, query: str, session_id: Optional[str], prepared: Dict[str, Any],
+                      allow_graph: bool = True):
+        """Pick the query graph or the stateful/stateless agent and build its invocation inputs.
+        
+        The query graph's nodes are async, so sync callers pass allow_graph=False.
+        """
+        if allow_graph and Config.QUERY_PIPELINE == "auto" and not prepared["conversation_history"]:
+            from guidelines_agent.agent.agent_main import is_direct_question
+            if is_direct_question(query):
+                return self.get_query_graph(), {"input": query}
+        
+        if session_id:
+            # Use stateful agent for session-based queries
+            from guidelines_agent.agent.agent_main import render_stateful_system_message
+            agent = self.get_stateful_query_agent()
+            if prepared["session_found"]:
+                session_context = f"Active session: {session_id}"
+                if prepared["session_context"]:
+                    session_context += f"\n{json.dumps(prepared['session_context'], default=str)}"
+            else:
+                session_context = "No active context"
+            return agent, {
+                "input": query,
+                "system_message": [
+                    render_stateful_system_message(prepared["conversation_history"], session_context)
+                ]
+            }
+        # Use stateless agent for simple queries
+        return self.get_query_agent(), {"input": query}
+    
+    def _finish_query(self, query: str, session_id: Optional[str], prepared: Dict[str, Any],
+                      response: Any) -> Dict[str, Any]:
+        """Record the agent answer in the session and semantic cache."""
+        output = response.get("output", "") if isinstance(response, dict) else ""
+        
+        # Update session with the new interaction
+        if prepared["session_found"]:
+            session_store.add_message(session_id, query, output)
+        
+        if prepared["query_embedding"] and output:
+            query_cache.put(query, prepared["query_embedding"], output, prepared["cache_scope"])
+        
+        return {
+            "success": True,
+            "response": response.get("output", response) if isinstance(response, dict) else response,
+            "session_id": session_id
+        }
+    
+    def _query_error(self, e: Exception, session_id: Optional[str]) -> Dict[str, Any]:
+        error_msg = f"Error processing query: {str(e)}"
+        self.logger.error(error_msg, exc_info=True)
+        return {
+            "success": False,
+            "error": error_msg,
+            "session_id": session_id
+        }
     
     def process_query(self, query: str, portfolio_ids: Optional[List[str]] = None,
                      session_id: Optional[str] = None) -> Dict[str, Any]:
         """Process a user query using the appropriate agent."""
         try:
-            if session_id:
-                # Use stateful agent for session-based queries
-                agent = self.get_stateful_query_agent(session_id)
-                
-                # Get session context for better prompting
-                session_info = session_store.get_session(session_id)
-                conversation_history = session_store.get_conversation_history(session_id) if session_info else ""
-                session_context = f"Active session: {session_id}" if session_info else "No active context"
-                
-                response = agent.invoke({
-                    "input": query,
-                    "conversation_history": conversation_history,
-                    "session_context": session_context
-                })
-                
-                # Update session with the new interaction
-                if session_info:
-                    session_store.add_message(session_id, query, response.get("output", ""))
-                
-            else:
-                # Use stateless agent for simple queries
-                agent = self.get_query_agent()
-                response = agent.invoke({"input": query})
+            prepared = self._prepare_query(query, portfolio_ids, session_id)
+            if prepared["cached_output"] is not None:
+                return {
+                    "success": True,
+                    "response": prepared["cached_output"],
+                    "session_id": session_id,
+                    "cached": True
+                }
             
-            return {
-                "success": True,
-                "response": response.get("output", response),
-                "session_id": session_id
-            }
+            agent, inputs = self._select_agent(query, session_id, prepared, allow_graph=False)
+            response = agent.invoke(inputs)
+            return self._finish_query(query, session_id, prepared, response)
             
         except Exception as e:
-            error_msg = f"Error processing query: {str(e)}"
-            self.logger.error(error_msg, exc_info=True)
-            return {
-                "success": False,
-                "error": error_msg,
-                "session_id": session_id
-            }
+            return self._query_error(e, session_id)
+    
+    async def aprocess_query(self, query: str, portfolio_ids: Optional[List[str]] = None,
+                             session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Async variant of process_query that keeps the event loop free during LLM calls."""
+        try:
+            prepared = await self._aprepare_query(query, portfolio_ids, session_id)
+            if prepared["cached_output"] is not None:
+                return {
+                    "success": True,
+                    "response": prepared["cached_output"],
+                    "session_id": session_id,
+                    "cached": True
+                }
+            
+            # Identical sessionless queries already running share that run's answer; session
+            # runs use the stateful agent with their own history and context, so never share
+            inflight_key = None
+            if not session_id:
+                inflight_key = (prepared["cache_scope"], " ".join(query.lower().split()))
+                leader = _inflight_queries.get(inflight_key)
+                if leader is not None:
+                    self.logger.info(f"Joining in-flight run for identical query: {query}")
+                    response = await asyncio.shield(leader)
+                    return await run_blocking(self._finish_query, query, session_id,
+                                              dict(prepared, query_embedding=None), response)
+            
+            # Recording the turn may fold older turns into the session summary with an LLM call
+            response = await self._run_agent(query, session_id, prepared, inflight_key)
+            return await run_blocking(self._finish_query, query, session_id, prepared, response)
+            
+        except Exception as e:
+            return self._query_error(e, session_id)
+    
+    async def _run_agent(self, query: str, session_id: Optional[str], prepared: Dict[str, Any],
+                         inflight_key: Optional[tuple]) -> Any:
+        """Invoke the selected agent, publishing the run to identical queries that join meanwhile.
+        
+        A shared run is a task of its own, so cancelling the request that started it
+        does not cancel it for the requests that joined.
+        """
+        if inflight_key is None:
+            return await self._invoke_agent(query, session_id, prepared)
+        
+        task = asyncio.ensure_future(self._invoke_agent(query, session_id, prepared))
+        _inflight_queries[inflight_key] = task
+        task.add_done_callback(functools.partial(_release_inflight, inflight_key))
+        return await asyncio.shield(task)
+    
+    async def _invoke_agent(self, query: str, session_id: Optional[str], prepared: Dict[str, Any]) -> Any:
+        agent, inputs = self._select_agent(query, session_id, prepared)
+        async with _agent_semaphore:
+            return await agent.ainvoke(inputs)
     
-    def process_document_ingestion(self, pdf_path: str, doc_name: Optional[str] = None) -> Dict[str, Any]:
-        """Process document ingestion using the ingestion agent."""
+    async def astream_query(self, query: str, session_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the agent's answer as text chunks while the chat model generates it."""
+        prepared = await self._aprepare_query(query, None, session_id)
+        if prepared["cached_output"] is not None:
+            yield prepared["cached_output"]
+            return
+        
+        agent, inputs = self._select_agent(query, session_id, prepared)
+        response = None
+        streamed = False
+        async with _agent_semaphore:
+            async for event in agent.astream_events(inputs, version="v2"):
+                kind = event["event"]
+                if kind == "on_chat_model_stream":
+                    text = event["data"]["chunk"].content
+                    # Tool-call turns stream empty or structured content; only forward text
+                    if text and isinstance(text, str):
+                        streamed = True
+                        yield text
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    response = event["data"].get("output")
+        
+        # The query graph summarizes outside LangChain chat models, so it has no token events
+        if not streamed and isinstance(response, dict) and response.get("output"):
+            yield response["output"]
+        
+        await run_blocking(self._finish_query, query, session_id, prepared, response or {})
+    
+    def process_document_ingestion(self, pdf_path: str, doc_name: Optional[str] = None,
+                                   generate_embeddings: bool = True) -> Dict[str, Any]:
+        """Process document ingestion using the ingestion agent.
+        
+        Batch callers pass generate_embeddings=False and stamp embeddings once per batch.
+        """
         try:
             if not doc_name:
                 import os
@@ -114,7 +341,8 @@ class AgentService(BaseService):
                 }
             
             # Step 3: Generate embeddings for new guidelines
-            embedding_result = self.guideline_service.generate_missing_embeddings()
+            embedding_result = (self.guideline_service.generate_missing_embeddings()
+                                if generate_embeddings else {})
             
             return {
                 "success": True,
@@ -136,7 +364,8 @@ class AgentService(BaseService):
                 "error": error_msg
             }
     
-    def process_file_upload_ingestion(self, file_content: bytes, filename: str) -> Dict[str, Any]:
+    def process_file_upload_ingestion(self, file_content: bytes, filename: str,
+                                      generate_embeddings: bool = True) -> Dict[str, Any]:
         """Process document ingestion from uploaded file content."""
         import tempfile
         import os
@@ -149,7 +378,7 @@ class AgentService(BaseService):
                 temp_file_path = temp_file.name
             
             # Process the temporary file
-            result = self.process_document_ingestion(temp_file_path, filename)
+            result = self.process_document_ingestion(temp_file_path, filename, generate_embeddings)
             
             return result
             
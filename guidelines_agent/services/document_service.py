@@ -1,11 +1,12 @@
 """Document service for business logic related to document processing."""
 import os
 import json
-from typing import Dict, Any, Optional
+from typing import Any, BinaryIO, Dict, Optional
 from datetime import datetime
 from guidelines_agent.services.base_service import BaseService
 from guidelines_agent.models.entities import Document, ExtractionResult
-from guidelines_agent.core.extract import extract_guidelines_from_pdf
+from guidelines_agent.core.extract import extract_guidelines_from_pdf, extract_guidelines_from_stream
+from guidelines_agent.core.query_cache import invalidate_guideline_caches
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,44 +30,25 @@ class DocumentService(BaseService):
         
         try:
             # Call the existing extraction logic
-            result = extract_guidelines_from_pdf(pdf_path)
-            
-            # Convert to our ExtractionResult format
-            if isinstance(result, dict):
-                # Build portfolio_info from individual fields if not present
-                portfolio_info = result.get('portfolio_info', {})
-                if not portfolio_info:
-                    # Extract portfolio info from individual fields
-                    portfolio_info = {
-                        'portfolio_id': result.get('portfolio_id'),
-                        'portfolio_name': result.get('portfolio_name'),
-                        'doc_id': result.get('doc_id'),
-                        'doc_name': result.get('doc_name'),
-                        'doc_date': result.get('doc_date')
-                    }
-                    # Remove None values
-                    portfolio_info = {k: v for k, v in portfolio_info.items() if v is not None}
-                    
-                return ExtractionResult(
-                    is_valid=result.get('is_valid_document', False),
-                    validation_summary=result.get('validation_summary', 'No validation summary'),
-                    guidelines=result.get('guidelines', []),
-                    portfolio_info=portfolio_info,
-                    error_message=result.get('error_message')
-                )
-            else:
-                # Handle old format (list of guidelines, text)
-                if isinstance(result, tuple) and len(result) == 2:
-                    guidelines_list, guidelines_text = result
-                    return ExtractionResult(
-                        is_valid=True,
-                        validation_summary="Document processed successfully",
-                        guidelines=guidelines_list,
-                        portfolio_info={}
-                    )
-                else:
-                    raise ValueError("Unexpected result format from extraction")
-                    
+            return self._to_extraction_result(extract_guidelines_from_pdf(pdf_path))
+        except Exception as e:
+            error_msg = f"Error extracting guidelines: {str(e)}"
+            self.logger.error(error_msg, exc_info=True)
+            return ExtractionResult(
+                is_valid=False,
+                validation_summary=error_msg,
+                error_message=error_msg
+            )
+    
+    def extract_guidelines_from_stream(self, fileobj: BinaryIO, name: str = "upload.pdf",
+                                       content_digest=None, force_refresh: bool = False) -> ExtractionResult:
+        """Extract guidelines from a seekable PDF file object without writing it to disk."""
+        self.logger.info(f"Starting guideline extraction from stream: {name}")
+        
+        try:
+            return self._to_extraction_result(
+                extract_guidelines_from_stream(fileobj, name, content_digest, force_refresh)
+            )
         except Exception as e:
             error_msg = f"Error extracting guidelines: {str(e)}"
             self.logger.error(error_msg, exc_info=True)
@@ -76,6 +58,43 @@ class DocumentService(BaseService):
                 error_message=error_msg
             )
     
+    def _to_extraction_result(self, result: Any) -> ExtractionResult:
+        """Convert a raw extraction result to our ExtractionResult format."""
+        if isinstance(result, dict):
+            # Build portfolio_info from individual fields if not present
+            portfolio_info = result.get('portfolio_info', {})
+            if not portfolio_info:
+                # Extract portfolio info from individual fields
+                portfolio_info = {
+                    'portfolio_id': result.get('portfolio_id'),
+                    'portfolio_name': result.get('portfolio_name'),
+                    'doc_id': result.get('doc_id'),
+                    'doc_name': result.get('doc_name'),
+                    'doc_date': result.get('doc_date')
+                }
+                # Remove None values
+                portfolio_info = {k: v for k, v in portfolio_info.items() if v is not None}
+                
+            return ExtractionResult(
+                is_valid=result.get('is_valid_document', False),
+                validation_summary=result.get('validation_summary', 'No validation summary'),
+                guidelines=result.get('guidelines', []),
+                portfolio_info=portfolio_info,
+                error_message=result.get('error_message')
+            )
+        else:
+            # Handle old format (list of guidelines, text)
+            if isinstance(result, tuple) and len(result) == 2:
+                guidelines_list, guidelines_text = result
+                return ExtractionResult(
+                    is_valid=True,
+                    validation_summary="Document processed successfully",
+                    guidelines=guidelines_list,
+                    portfolio_info={}
+                )
+            else:
+                raise ValueError("Unexpected result format from extraction")
+    
     def validate_extraction_result(self, result: ExtractionResult) -> bool:
         """Validate that extraction result contains required data."""
         if not result.is_valid:
@@ -150,6 +169,7 @@ class DocumentService(BaseService):
         try:
             # First delete associated guidelines
             deleted_guidelines = self.guideline_repo.delete_by_document(doc_id)
+            invalidate_guideline_caches()
             self.logger.info(f"Deleted {deleted_guidelines} guidelines for document {doc_id}")
             
             # Then delete the document
@@ -1,10 +1,19 @@
 """Guideline service for business logic related to guideline processing."""
+from collections import Counter
 from typing import List, Optional, Dict, Any
 from guidelines_agent.services.base_service import BaseService
 from guidelines_agent.models.entities import (
     Portfolio, Document, Guideline, GuidelineSearchResult, ExtractionResult
 )
-from guidelines_agent.core.embedding_service import generate_embeddings
+from guidelines_agent.core.embedding_service import (
+    GEMINI_API_KEY, EmbeddingError, generate_embeddings, agenerate_embeddings_bulk,
+    initialize_embedding_service, EMBEDDING_BATCH_SIZE
+)
+from guidelines_agent.models.database import db_manager
+from guidelines_agent.core.executor import run_blocking
+from guidelines_agent.core.embedding_cache import get_query_embedding
+from guidelines_agent.core.search_cache import lookup_search_results, store_search_results
+from guidelines_agent.core.query_cache import invalidate_guideline_caches
 import logging
 
 logger = logging.getLogger(__name__)
@@ -99,7 +108,9 @@ class GuidelineService(BaseService):
             return 0
             
         try:
-            return self.guideline_repo.create_batch(guidelines)
+            saved = self.guideline_repo.create_batch(guidelines)
+            invalidate_guideline_caches()
+            return saved
         except Exception as e:
             self.logger.error(f"Error saving guidelines batch: {e}")
             return 0
@@ -215,14 +226,21 @@ class GuidelineService(BaseService):
         """Search guidelines using semantic/vector search."""
         try:
             # Generate embedding for the query
-            query_embedding = generate_embeddings([query_text], task_type="retrieval_query")
-            if not query_embedding or not query_embedding[0]:
+            query_embedding = get_query_embedding(query_text)
+            if not query_embedding:
                 self.logger.error("Failed to generate query embedding")
                 return []
             
-            return self.guideline_repo.semantic_search(
-                query_embedding[0], portfolio_ids, top_k, similarity_threshold
+            scope = (tuple(sorted(portfolio_ids)) if portfolio_ids else None, top_k, similarity_threshold)
+            cached = lookup_search_results(query_embedding, scope)
+            if cached is not None:
+                return cached
+            
+            results = self.guideline_repo.semantic_search(
+                query_embedding, portfolio_ids, top_k, similarity_threshold
             )
+            store_search_results(query_text, query_embedding, results, scope)
+            return results
             
         except Exception as e:
             self.logger.error(f"Error in semantic search: {e}")
@@ -236,6 +254,22 @@ class GuidelineService(BaseService):
         """Get count of guidelines for a portfolio."""
         return self.guideline_repo.count_by_portfolio(portfolio_id)
     
+    def warmup(self) -> None:
+        """Check the database and prime the embedding client so the first search skips that setup."""
+        try:
+            with db_manager.get_cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Exception as e:
+            self.logger.warning(f"Database warm-up failed: {e}")
+        
+        if not GEMINI_API_KEY:
+            return
+        try:
+            initialize_embedding_service()
+            generate_embeddings(["warmup"], task_type="RETRIEVAL_QUERY")
+        except Exception as e:
+            self.logger.warning(f"Embedding warm-up failed: {e}")
+    
     def get_all_portfolios(self) -> List[Portfolio]:
         """Get all portfolios."""
         return self.portfolio_repo.get_all()
@@ -247,37 +281,97 @@ class GuidelineService(BaseService):
             if not guidelines:
                 return {'success': True, 'processed': 0, 'message': 'No guidelines need embeddings'}
             
-            # Extract texts for batch embedding generation
-            texts = [guideline.text for guideline in guidelines]
-            embeddings = generate_embeddings(texts, task_type="retrieval_document")
+            # Embed in request-sized batches, then write all vectors in one round trip.
+            # Rows left without embeddings are picked up again by the next run.
+            updates = []
+            embedded_by_doc = Counter()
+            failed = deferred = 0
+            for i in range(0, len(guidelines), EMBEDDING_BATCH_SIZE):
+                batch = guidelines[i:i + EMBEDDING_BATCH_SIZE]
+                try:
+                    embeddings = generate_embeddings([g.text for g in batch], task_type="retrieval_document")
+                except EmbeddingError as e:
+                    if e.retryable:
+                        # Quota or availability problem: the remaining batches would fail too
+                        deferred = len(guidelines) - i
+                        self.logger.warning(f"Deferring {deferred} guidelines after transient embedding error: {e}")
+                        break
+                    failed += len(batch)
+                    continue
+                if len(embeddings) != len(batch):
+                    self.logger.warning(f"Failed to generate embeddings for batch starting at {i}")
+                    failed += len(batch)
+                    continue
+                for g, embedding in zip(batch, embeddings):
+                    if embedding:
+                        updates.append((g.portfolio_id, g.rule_id, embedding))
+                        embedded_by_doc[g.doc_id] += 1
             
-            if not embeddings or len(embeddings) != len(texts):
-                return {'success': False, 'error': 'Failed to generate embeddings'}
+            result = self._store_embedding_updates(updates, len(guidelines))
+            # The batch update writes every row or none, so per-document counts hold when it succeeded
+            result.update(failed=failed, deferred=deferred,
+                          processed_by_doc=dict(embedded_by_doc) if result.get('processed') else {})
+            return result
             
-            # Update guidelines with embeddings
-            updated_count = 0
-            for guideline, embedding in zip(guidelines, embeddings):
-                if embedding and self.guideline_repo.update_embedding(
-                    guideline.portfolio_id, guideline.rule_id, embedding
-                ):
-                    updated_count += 1
+        except Exception as e:
+            error_msg = f"Error generating missing embeddings: {str(e)}"
+            self.logger.error(error_msg, exc_info=True)
+            return {'success': False, 'error': error_msg}
+    
+    async def agenerate_missing_embeddings(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Async generate_missing_embeddings; embedding batches are requested concurrently."""
+        try:
+            guidelines = await run_blocking(self.guideline_repo.get_guidelines_without_embeddings, limit)
+            if not guidelines:
+                return {'success': True, 'processed': 0, 'message': 'No guidelines need embeddings'}
             
-            return {
-                'success': True,
-                'processed': updated_count,
-                'total_found': len(guidelines),
-                'message': f'Updated embeddings for {updated_count} guidelines'
-            }
+            try:
+                embeddings = await agenerate_embeddings_bulk([g.text for g in guidelines],
+                                                             task_type="retrieval_document")
+            except EmbeddingError as e:
+                if not e.retryable:
+                    raise
+                # Quota or availability problem: leave the rows for the next run
+                self.logger.warning("Deferring %d guidelines after transient embedding error: %s",
+                                    len(guidelines), e)
+                return {'success': True, 'processed': 0, 'total_found': len(guidelines),
+                        'failed': 0, 'deferred': len(guidelines),
+                        'message': 'Embedding deferred after a transient error'}
+            updates = [
+                (g.portfolio_id, g.rule_id, embedding)
+                for g, embedding in zip(guidelines, embeddings) if embedding
+            ]
+            result = await run_blocking(self._store_embedding_updates, updates, len(guidelines))
+            result.update(failed=0, deferred=0)
+            return result
             
         except Exception as e:
             error_msg = f"Error generating missing embeddings: {str(e)}"
             self.logger.error(error_msg, exc_info=True)
             return {'success': False, 'error': error_msg}
     
+    def _store_embedding_updates(self, updates: List[tuple], total_found: int) -> Dict[str, Any]:
+        """Write generated embeddings in one round trip and build the stamping result."""
+        if not updates:
+            return {'success': False, 'error': 'Failed to generate embeddings'}
+        
+        updated_count = self.guideline_repo.update_embeddings_batch(updates)
+        if updated_count:
+            invalidate_guideline_caches()
+        
+        return {
+            'success': True,
+            'processed': updated_count,
+            'total_found': total_found,
+            'message': f'Updated embeddings for {updated_count} guidelines'
+        }
+    
     def remove_guidelines_by_portfolio(self, portfolio_id: str) -> int:
         """Remove all guidelines for a specific portfolio."""
         try:
-            return self.guideline_repo.delete_by_portfolio(portfolio_id)
+            removed = self.guideline_repo.delete_by_portfolio(portfolio_id)
+            invalidate_guideline_caches()
+            return removed
         except Exception as e:
             self.logger.error(f"Error removing guidelines for portfolio {portfolio_id}: {e}")
             return 0
@@ -0,0 +1,106 @@
+"""Micro-batching dispatcher for uploaded document ingestion."""
+from typing import Dict, Any, List, Optional, Tuple
+from guidelines_agent.core.executor import run_blocking
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+_PendingUpload = Tuple[str, str, asyncio.Future]
+
+
+def _remove_upload(pdf_path: str) -> None:
+    try:
+        os.unlink(pdf_path)
+    except OSError:
+        pass
+
+
+class IngestBatcher:
+    """Pools uploads that arrive close together and ingests them as one batch.
+    
+    Each document in a batch is extracted and persisted concurrently, then the
+    embeddings for all new guidelines are generated in a single pass instead of
+    once per upload. An upload that arrives while nothing else is queued is
+    ingested right away; the window only holds a batch open once it has company.
+    """
+    
+    def __init__(self, agent_service, window_ms: int = 500, max_size: int = 8):
+        self.agent_service = agent_service
+        self.window_ms = window_ms
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    async def submit(self, pdf_path: str, filename: str) -> asyncio.Future:
+        """Queue an uploaded file on disk and return a future resolving to its ingestion result.
+        
+        The batcher takes ownership of pdf_path and removes it once the file has
+        been ingested, even if the caller stops waiting for the result.
+        """
+        if self.window_ms <= 0 or self.max_size <= 1:
+            return asyncio.ensure_future(run_blocking(self._ingest, pdf_path, filename, True))
+        
+        future = asyncio.get_running_loop().create_future()
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        await self._queue.put((pdf_path, filename, future))
+        return future
+    
+    def _ingest(self, pdf_path: str, filename: str, generate_embeddings: bool) -> Dict[str, Any]:
+        """Ingest one upload on a worker thread, then delete its file."""
+        try:
+            return self.agent_service.process_document_ingestion(pdf_path, filename, generate_embeddings)
+        finally:
+            _remove_upload(pdf_path)
+    
+    async def _run(self) -> None:
+        """Collect uploads until the window closes or the batch is full, then flush."""
+        while True:
+            batch = [await self._queue.get()]
+            if self._queue.empty():
+                # A lone upload doesn't wait for company that may never come
+                await self._flush(batch)
+                continue
+            
+            deadline = asyncio.get_running_loop().time() + self.window_ms / 1000
+            while len(batch) < self.max_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+    
+    async def _flush(self, batch: List[_PendingUpload]) -> None:
+        """Ingest a batch of uploads and resolve their futures."""
+        logger.info("Ingesting batch of %d uploaded document(s)", len(batch))
+        try:
+            results = await asyncio.gather(*[
+                run_blocking(self._ingest, pdf_path, filename, False)
+                for pdf_path, filename, _ in batch
+            ])
+            
+            embedded = any(r['success'] for r in results)
+            embedding_result: Dict[str, Any] = {}
+            if embedded:
+                embedding_result = await run_blocking(
+                    self.agent_service.guideline_service.generate_missing_embeddings
+                )
+            
+            # Embeddings are stamped for the whole batch; credit each document with its own
+            embedded_by_doc = embedding_result.get('processed_by_doc', {})
+            for (_, _, future), result in zip(batch, results):
+                if result['success']:
+                    result['embeddings_generated'] = embedded_by_doc.get(result['doc_id'], 0)
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            logger.error("Error ingesting upload batch: %s", e, exc_info=True)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result({"success": False, "error": f"Error processing file upload: {str(e)}"})
@@ -1,6 +1,7 @@
 import json
 import os
 import logging
+from operator import attrgetter
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from typing import List
@@ -52,6 +53,8 @@ class UploadSummaryInput(BaseModel):
 
 # --- LangChain Tools ---
 
+_source_fields = attrgetter("guideline", "provenance")
+
 @tool("query_planner", args_schema=PlanQueryInput)
 def query_planner(user_query: str) -> dict:
     """Plans a query by breaking it down into a search query and summary instruction."""
@@ -65,8 +68,10 @@ def guideline_search(search_query: str, top_k: int) -> list:
 @tool("summarizer", args_schema=SummarizeInput)
 def summarizer(summary_instruction: str, search_results: list) -> str:
     """Summarizes search results to answer the user's query."""
-    sources = [f"Guideline: {res.guideline} (Provenance: {res.provenance})" for res in search_results]
-    context_block = "\n---\n".join(sources)
+    context_block = "\n---\n".join(
+        [f"Guideline: {guideline} (Provenance: {provenance})"
+         for guideline, provenance in map(_source_fields, search_results)]
+    )
     return generate_summary(summary_instruction, context_block)
 
 @tool("extract_and_validate_document", args_schema=ExtractAndValidateInput)
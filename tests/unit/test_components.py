@@ -78,6 +78,18 @@ class TestEntities:
         assert "Section A" in provenance
         assert "Subsection 1" in provenance
         assert "Page 25" in provenance
+    
+    def test_response_models_reject_unknown_fields(self):
+        """Test frozen response models refuse fields they don't declare."""
+        from pydantic import ValidationError
+        from guidelines_agent.api.schemas.agent_schemas import AgentQueryResponse
+        from guidelines_agent.api.schemas.common_schemas import SuccessResponse
+        
+        assert SuccessResponse(message="ok").success is True
+        with pytest.raises(ValidationError):
+            SuccessResponse(message="ok", sucess=False)
+        with pytest.raises(ValidationError):
+            AgentQueryResponse(response="r", session="s1")
 
 
 class TestRepositories:
@@ -129,6 +141,20 @@ class TestRepositories:
         assert portfolio.portfolio_id == 'test-001'
         assert portfolio.portfolio_name == 'Test Portfolio'
 
+    @pytest.mark.parametrize("prefilter", [False, True])
+    def test_guideline_repository_semantic_search_params(self, prefilter):
+        """Test semantic search binds one parameter per placeholder, with and without the binary prefilter."""
+        from guidelines_agent.models.repositories import GuidelineRepository
+
+        repo = GuidelineRepository()
+        with patch.object(repo, '_execute_query', return_value=[]) as mock_query, \
+             patch('guidelines_agent.models.repositories.guideline_repository.Config.SEARCH_BINARY_PREFILTER', prefilter):
+            repo.semantic_search([0.1, 0.2], portfolio_ids=["fund-a", "fund-b"], top_k=5)
+
+        sql, params = mock_query.call_args[0]
+        assert sql.count("%s") == len(params)
+        assert ("binary_quantize" in sql) is prefilter
+
 
 class TestServices:
     """Test service layer classes."""
@@ -192,6 +218,756 @@ class TestServices:
         assert service.validate_extraction_result(invalid_result) is False
 
 
+class TestExtraction:
+    """Test extraction helpers."""
+
+    def test_extract_json_ignores_citations_after_object(self):
+        """Test extract_json_from_text returns only the first balanced object."""
+        from guidelines_agent.core.extract import extract_json_from_text
+
+        text = 'Result:\n```json\n{"a": "brace } in string", "b": {"c": [1]}}\n```\nSee {Part V.C.3.a, page 8}'
+        assert extract_json_from_text(text) == '{"a": "brace } in string", "b": {"c": [1]}}'
+        assert extract_json_from_text("no json here") is None
+        assert extract_json_from_text(text.encode()) == b'{"a": "brace } in string", "b": {"c": [1]}}'
+
+    def test_extract_many_bounds_concurrency_and_keeps_order(self):
+        """Test extract_many runs at most `concurrency` extractions at once and preserves input order."""
+        import asyncio
+        import threading
+        import time
+        from guidelines_agent.core import extract
+
+        lock = threading.Lock()
+        active = {"now": 0, "peak": 0}
+
+        def fake_extract(pdf_path):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.02)
+            with lock:
+                active["now"] -= 1
+            if pdf_path == "bad.pdf":
+                raise RuntimeError("boom")
+            return {"doc_name": pdf_path}
+
+        paths = ["a.pdf", "bad.pdf", "c.pdf", "d.pdf", "e.pdf"]
+        with patch.object(extract, 'extract_guidelines_from_pdf', side_effect=fake_extract):
+            results = asyncio.run(extract.extract_many(paths, concurrency=2))
+
+        assert [r.get("doc_name") for r in results] == ["a.pdf", None, "c.pdf", "d.pdf", "e.pdf"]
+        assert results[1]["error"] == "boom"
+        assert active["peak"] == 2
+
+    def test_extract_guidelines_stream_yields_streamed_items(self, tmp_path):
+        """Test guidelines parsed from streamed chunks are yielded in order and the full result is returned."""
+        import json
+        from guidelines_agent.core import extract
+
+        pdf = tmp_path / "doc.pdf"
+        pdf.write_bytes(b"%PDF-1.4")
+        payload = json.dumps({"is_valid_document": True,
+                              "guidelines": [{"rule_id": "r1", "text": "a } b"}, {"rule_id": "r2", "text": "c"}]})
+
+        def fake_generate(**kwargs):
+            for i in range(0, len(payload), 7):
+                kwargs["on_chunk"](payload[i:i + 7])
+            return Mock(success=True, content=payload, latency_ms=1, usage=None)
+
+        received = []
+        with patch.object(extract.Config, 'EXTRACTION_CACHE_ENABLED', False), \
+             patch('guidelines_agent.core.llm_providers.llm_manager.generate_response', side_effect=fake_generate):
+            stream = extract.extract_guidelines_stream(str(pdf))
+            try:
+                while True:
+                    received.append(next(stream)["rule_id"])
+            except StopIteration as stop:
+                result = stop.value
+
+        assert received == ["r1", "r2"]
+        assert result["is_valid_document"] is True
+
+    def test_streamed_extraction_prefers_fenced_json_over_earlier_braces(self, tmp_path):
+        """Test a brace in prose before the ```json fence doesn't hide the fenced object."""
+        import json
+        from guidelines_agent.core import extract
+
+        pdf = tmp_path / "doc.pdf"
+        pdf.write_bytes(b"%PDF-1.4")
+        payload = json.dumps({"is_valid_document": True, "validation_summary": "ok",
+                              "guidelines": [{"rule_id": "r1", "text": "a"}]})
+        text = f"The policy excerpt {{see page 2}} is below.\n```json\n{payload}\n```"
+
+        def fake_generate(**kwargs):
+            kwargs["on_chunk"](text)
+            return Mock(success=True, content=text, latency_ms=1, usage=None)
+
+        with patch.object(extract.Config, 'EXTRACTION_CACHE_ENABLED', False), \
+             patch('guidelines_agent.core.llm_providers.llm_manager.generate_response', side_effect=fake_generate):
+            result = extract.extract_guidelines_from_pdf(str(pdf))
+
+        assert result["is_valid_document"] is True
+        assert result["guidelines"][0]["rule_id"] == "r1"
+
+
+class TestCaches:
+    """Test in-process caches."""
+
+    def test_semantic_cache_hit_and_miss(self):
+        """Test SemanticCache matches similar embeddings only above threshold."""
+        from guidelines_agent.core.semantic_cache import SemanticCache
+
+        cache = SemanticCache(threshold=0.95)
+        cache.put("max equity exposure", [1.0, 0.0, 0.0], "answer")
+
+        hit = cache.lookup([0.99, 0.05, 0.0])
+        assert hit is not None
+        assert hit[0] == "answer"
+
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+        assert cache.lookup([1.0, 0.0, 0.0], scope="other") is None
+
+    def test_semantic_cache_eviction(self):
+        """Test SemanticCache evicts least recently used entries."""
+        from guidelines_agent.core.semantic_cache import SemanticCache
+
+        cache = SemanticCache(threshold=0.99, max_entries=1)
+        cache.put("first", [1.0, 0.0], "a")
+        cache.put("second", [0.0, 1.0], "b")
+
+        assert cache.lookup([1.0, 0.0]) is None
+        assert cache.lookup([0.0, 1.0])[0] == "b"
+
+    def test_semantic_cache_rows_survive_churn_and_expiry(self):
+        """Test lookups stay correct as rows are removed, compacted and expired."""
+        from guidelines_agent.core.semantic_cache import SemanticCache
+
+        cache = SemanticCache(threshold=0.99, max_entries=8)
+        for i in range(100):
+            cache.put(f"query {i}", [1.0, float(i)], i)
+
+        assert cache.get_stats()["entries"] == 8
+        assert cache.lookup([1.0, 5.0]) is None
+        assert cache.lookup([1.0, 99.0])[0] == 99
+        assert cache.lookup([1.0, 92.0])[0] == 92
+
+        expiring = SemanticCache(threshold=0.99, ttl_seconds=0)
+        expiring.put("stale", [1.0, 0.0], "old")
+        assert expiring.lookup([1.0, 0.0]) is None
+        assert expiring.get_stats()["entries"] == 0
+
+    def test_search_cache_invalidation(self):
+        """Test cached search results are scoped and dropped after writes."""
+        from guidelines_agent.core import search_cache
+
+        with patch.object(search_cache.Config, 'SEARCH_CACHE_ENABLED', True):
+            scope = (("fund-a",), 10, 0.0)
+            search_cache.store_search_results("equity limits", [1.0, 0.0], [{"rule_id": "r1"}], scope)
+
+            assert search_cache.lookup_search_results([1.0, 0.0], scope) == [{"rule_id": "r1"}]
+            assert search_cache.lookup_search_results([1.0, 0.0], (("fund-b",), 10, 0.0)) is None
+
+            search_cache.invalidate_search_cache()
+            assert search_cache.lookup_search_results([1.0, 0.0], scope) is None
+
+    def test_llm_response_cache_reuses_identical_requests(self):
+        """Test identical low-temperature requests hit the response cache and file requests bypass it."""
+        from guidelines_agent.core import llm_response_cache
+        from guidelines_agent.core.llm_providers import LLMManager, LLMProvider, LLMResponse
+
+        manager = LLMManager()
+        provider = Mock()
+        provider.generate_response.return_value = LLMResponse(
+            content="plan", provider=LLMProvider.MOCK, model="mock-model", latency_ms=900)
+        manager.providers[LLMProvider.MOCK] = provider
+
+        with patch.object(llm_response_cache.Config, 'LLM_RESPONSE_CACHE_ENABLED', True):
+            llm_response_cache.clear_response_cache()
+            first = manager.generate_response("plan this", provider=LLMProvider.MOCK)
+            second = manager.generate_response("plan this", provider=LLMProvider.MOCK)
+            manager.generate_response("plan this", provider=LLMProvider.MOCK, files=["a.pdf"])
+            manager.generate_response("plan this", provider=LLMProvider.MOCK, temperature=0.7)
+            llm_response_cache.clear_response_cache()
+
+        assert first.latency_ms == 900
+        assert second.content == "plan" and second.latency_ms == 0
+        assert provider.generate_response.call_count == 3
+
+    def test_llm_abatch_keeps_order_and_isolates_failures(self):
+        """Test LLMManager.abatch returns responses in input order with failures as error responses."""
+        import asyncio
+        from guidelines_agent.core.llm_providers import LLMManager, LLMProvider, LLMRequest, LLMResponse
+
+        def respond(request):
+            if request.prompt == "bad":
+                raise RuntimeError("boom")
+            return LLMResponse(content=request.prompt.upper(), provider=request.provider, model=request.model)
+
+        manager = LLMManager()
+        provider = Mock()
+        provider.generate_response.side_effect = respond
+        manager.providers[LLMProvider.MOCK] = provider
+        requests = [LLMRequest(prompt=p, model="mock-model", provider=LLMProvider.MOCK)
+                    for p in ["a", "bad", "c"]]
+
+        responses = asyncio.run(manager.abatch(requests, concurrency=2))
+
+        assert [r.content for r in responses] == ["A", "", "C"]
+        assert not responses[1].success and "boom" in responses[1].error
+
+    def test_llm_failover_on_transient_errors_only(self):
+        """Test a transient provider failure fails over to the next provider and a permanent one does not."""
+        from guidelines_agent.core.llm_providers import LLMManager, LLMProvider, LLMResponse
+
+        manager = LLMManager()
+        gemini, openai = Mock(), Mock()
+        manager.providers[LLMProvider.GEMINI] = gemini
+        manager.providers[LLMProvider.OPENAI] = openai
+        manager.providers[LLMProvider.ANTHROPIC].is_available = Mock(return_value=False)
+        openai.generate_response.side_effect = lambda r: LLMResponse(
+            content="from openai", provider=r.provider, model=r.model)
+
+        gemini.generate_response.return_value = LLMResponse(
+            content="", provider=LLMProvider.GEMINI, model="g", success=False, error="429", retryable=True)
+        response = manager.generate_response("plan this", provider=LLMProvider.GEMINI)
+        assert response.success and response.provider == LLMProvider.OPENAI
+        assert response.model == "gpt-3.5-turbo"
+
+        gemini.generate_response.return_value = LLMResponse(
+            content="", provider=LLMProvider.GEMINI, model="g", success=False, error="400")
+        response = manager.generate_response("plan this", provider=LLMProvider.GEMINI)
+        assert not response.success and response.error == "400"
+        assert openai.generate_response.call_count == 1
+
+    def test_concurrent_embeds_share_one_request(self):
+        """Test aembed coalesces concurrent single-text embeds into one batch call."""
+        import asyncio
+        from guidelines_agent.core import embedding_service
+
+        def fake_embed(texts, task_type, title=None):
+            return [[float(len(t))] for t in texts]
+
+        async def embed_all():
+            return await asyncio.gather(*(embedding_service.aembed(t, "RETRIEVAL_QUERY")
+                                          for t in ["a", "bb", "ccc"]))
+
+        with patch.object(embedding_service, 'generate_embeddings', side_effect=fake_embed) as mock_embed:
+            results = asyncio.run(embed_all())
+
+        assert results == [[1.0], [2.0], [3.0]]
+        mock_embed.assert_called_once()
+
+    def test_coalesced_embed_count_mismatch_raises(self):
+        """Test callers sharing a batch get an EmbeddingError when the API returns too few vectors."""
+        import asyncio
+        from guidelines_agent.core import embedding_service
+
+        async def embed_all():
+            return await asyncio.gather(*(embedding_service.aembed(t, "RETRIEVAL_QUERY") for t in ["a", "b"]),
+                                        return_exceptions=True)
+
+        with patch.object(embedding_service, 'generate_embeddings', return_value=[[1.0]]):
+            results = asyncio.run(embed_all())
+
+        assert all(isinstance(r, embedding_service.EmbeddingError) for r in results)
+
+    def test_embedding_errors_are_retried_then_raised(self):
+        """Test transient embedding failures are retried and surface as a retryable EmbeddingError."""
+        from google.api_core.exceptions import ResourceExhausted
+        from guidelines_agent.core import embedding_service
+
+        with patch.object(embedding_service, '_initialized', True), \
+             patch('time.sleep'), \
+             patch.object(embedding_service, '_genai') as mock_genai:
+            mock_embed = mock_genai.return_value.embed_content
+            mock_embed.side_effect = ResourceExhausted("quota")
+            with pytest.raises(embedding_service.EmbeddingError) as excinfo:
+                embedding_service.generate_embeddings(["a"], "RETRIEVAL_DOCUMENT")
+
+        assert excinfo.value.retryable
+        assert mock_embed.call_count == 3
+
+    def test_bulk_embedding_defers_after_transient_errors(self):
+        """Test async bulk embedding retries transient errors and the caller defers the rows."""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from google.api_core.exceptions import ResourceExhausted
+        from guidelines_agent.core import embedding_service
+
+        service = GuidelineService()
+        guidelines = [Guideline(portfolio_id="fund-a", rule_id=f"r{i}", doc_id="d1", text=f"rule {i}")
+                      for i in range(3)]
+        with patch.object(embedding_service, '_initialized', True), \
+             patch.object(embedding_service, '_genai') as mock_genai, \
+             patch('asyncio.sleep', new=AsyncMock()), \
+             patch.object(service, 'guideline_repo') as mock_repo:
+            mock_embed = mock_genai.return_value.embed_content_async = AsyncMock(
+                side_effect=ResourceExhausted("quota"))
+            mock_repo.get_guidelines_without_embeddings.return_value = guidelines
+            result = asyncio.run(service.agenerate_missing_embeddings())
+
+        assert result["success"] and result["deferred"] == 3 and result["processed"] == 0
+        assert mock_embed.call_count == 3
+        mock_repo.update_embeddings_batch.assert_not_called()
+
+
+    def test_extraction_cache_round_trips_through_disk(self, tmp_path):
+        """Test a stored extraction survives a cleared memory layer and keys agree across inputs."""
+        import hashlib
+        import io
+        from guidelines_agent.core import extraction_cache
+
+        pdf = b"%PDF-1.4 cached"
+        key = extraction_cache.cache_key(pdf, "prompt", "model")
+        assert extraction_cache.stream_cache_key(io.BytesIO(pdf), "prompt", "model") == key
+        assert extraction_cache.digest_cache_key(hashlib.sha256(pdf), "prompt", "model") == key
+        assert extraction_cache.cache_key(pdf, "prompt", "other-model") != key
+
+        with patch.object(extraction_cache.Config, 'EXTRACTION_CACHE_ENABLED', True), \
+             patch.object(extraction_cache.Config, 'EXTRACTION_CACHE_DIR', str(tmp_path)):
+            assert extraction_cache.load_cached_extraction(key) is None
+            extraction_cache.store_extraction(key, {"guidelines": [{"rule_id": "r1"}]})
+            extraction_cache.clear_memory_cache()
+
+            first = extraction_cache.load_cached_extraction(key)
+            first["guidelines"].clear()  # Callers may mutate a hit without corrupting the cache
+            assert extraction_cache.load_cached_extraction(key) == {"guidelines": [{"rule_id": "r1"}]}
+        extraction_cache.clear_memory_cache()
+
+        assert (tmp_path / f"{key}.json").exists()
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_ist_formatter_reuses_second_prefix(self):
+        """Test ISTFormatter shifts to +05:30 and only rebuilds the prefix when the second changes."""
+        import logging
+        from guidelines_agent.core.custom_logging import ISTFormatter
+
+        formatter = ISTFormatter("%(asctime)s %(message)s")
+        record = logging.LogRecord("test", logging.INFO, __file__, 1, "hello", None, None)
+        record.created, record.msecs = 0.25, 250.0  # 1970-01-01 00:00:00.250 UTC
+
+        assert formatter.formatTime(record) == "1970-01-01 05:30:00,250 IST"
+        record.created, record.msecs = 0.75, 750.0
+        assert formatter.formatTime(record) == "1970-01-01 05:30:00,750 IST"
+        assert formatter._second_prefix == (0, "1970-01-01 05:30:00")
+        record.created, record.msecs = 61.0, 0.0
+        assert formatter.formatTime(record) == "1970-01-01 05:31:01,000 IST"
+        assert formatter.formatTime(record, "%H:%M") == "05:31"
+        assert formatter.format(record) == "1970-01-01 05:31:01,000 IST hello"
+
+class TestQueryRouting:
+    """Test routing between the query graph and the tool-calling agent."""
+
+    def test_direct_questions_use_query_graph(self):
+        """Test is_direct_question accepts Q&A-shaped queries and rejects comparisons."""
+        from guidelines_agent.agent.agent_main import is_direct_question
+
+        assert is_direct_question("What are the rules for emerging markets?")
+        assert is_direct_question("list derivative restrictions")
+        assert not is_direct_question("Compare equity limits between fund A and fund B")
+        assert not is_direct_question("Find anything odd in these guidelines")
+
+    def test_plan_node_tolerates_malformed_top_k(self):
+        """Test the query graph falls back to the default top_k and clamps out-of-range values."""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from guidelines_agent.agent import agent_main
+
+        async def plan_with(top_k):
+            with patch.object(agent_main, 'query_planner') as planner:
+                planner.ainvoke = AsyncMock(return_value={"search_query": "equity", "top_k": top_k})
+                return (await agent_main.plan_node({"input": "What is the equity limit?"}))["plan"]["top_k"]
+
+        assert asyncio.run(plan_with("ten")) == agent_main.DEFAULT_QUERY_TOP_K
+        assert asyncio.run(plan_with("5-10")) == agent_main.DEFAULT_QUERY_TOP_K
+        assert asyncio.run(plan_with(5000)) == 100
+        assert asyncio.run(plan_with(-3)) == 1
+        assert asyncio.run(plan_with("7")) == 7
+
+    def test_process_query_answers_direct_questions_synchronously(self):
+        """Test the sync process_query uses the agent, not the async-only query graph, for direct questions."""
+        from guidelines_agent.services.agent_service import AgentService, Config
+
+        service = AgentService()
+        agent = Mock()
+        agent.invoke.return_value = {"output": "Equities are capped at 60%."}
+        with patch.object(Config, 'QUERY_PIPELINE', 'auto'), \
+             patch.object(Config, 'SEMANTIC_CACHE_ENABLED', False), \
+             patch.object(service, 'get_query_agent', return_value=agent), \
+             patch.object(service, 'get_query_graph') as mock_graph:
+            result = service.process_query("What is the equity limit?")
+
+        assert result["success"] and result["response"] == "Equities are capped at 60%."
+        mock_graph.assert_not_called()
+
+    def test_ingestion_invalidates_cached_answers(self):
+        """Test answers cached before new guidelines are saved are not served afterwards."""
+        from guidelines_agent.services.agent_service import AgentService, Config, query_cache
+
+        service = AgentService()
+        agent = Mock()
+        agent.invoke.return_value = {"output": "No limit found."}
+        query_cache.clear()
+        with patch.object(Config, 'QUERY_PIPELINE', 'agent'), \
+             patch.object(service, '_embed_query', return_value=[1.0, 0.0]), \
+             patch.object(service, 'get_query_agent', return_value=agent), \
+             patch.object(service.guideline_service, 'guideline_repo') as mock_repo:
+            service.process_query("What is the equity limit?")
+            assert service.process_query("What is the equity limit?")["cached"]
+
+            mock_repo.create_batch.return_value = 1
+            service.guideline_service.save_guidelines_batch([
+                Guideline(portfolio_id="fund-a", rule_id="r1", doc_id="d1", text="Equities are capped at 60%.")
+            ])
+            agent.invoke.return_value = {"output": "Equities are capped at 60%."}
+            result = service.process_query("What is the equity limit?")
+
+        assert "cached" not in result and result["response"] == "Equities are capped at 60%."
+        assert agent.invoke.call_count == 2
+
+    def test_session_context_bypasses_cached_answers(self):
+        """Test a first turn in a session with context is answered by the agent, not the cache."""
+        from guidelines_agent.services.agent_service import AgentService, Config, query_cache, session_store
+
+        service = AgentService()
+        agent, stateful_agent = Mock(), Mock()
+        agent.invoke.return_value = {"output": "Equities are capped at 60%."}
+        stateful_agent.invoke.return_value = {"output": "Fund A caps equities at 40%."}
+        session_id = session_store.create_session({"active_portfolios": ["fund-a"]})
+        query_cache.clear()
+        with patch.object(Config, 'QUERY_PIPELINE', 'agent'), \
+             patch.object(service, '_embed_query', return_value=[1.0, 0.0]), \
+             patch.object(service, 'get_query_agent', return_value=agent), \
+             patch.object(service, 'get_stateful_query_agent', return_value=stateful_agent):
+            service.process_query("What is the equity limit?")
+            result = service.process_query("What is the equity limit?", session_id=session_id)
+
+        assert "cached" not in result and result["response"] == "Fund A caps equities at 40%."
+        session_store.delete_session(session_id)
+
+    def test_joined_query_survives_leader_cancellation(self):
+        """Test a request sharing an in-flight run still gets its answer when the starter is cancelled."""
+        import asyncio
+        from guidelines_agent.services.agent_service import AgentService, Config
+
+        service = AgentService()
+        prepared = {"session_found": False, "session_context": None, "conversation_history": "",
+                    "cache_scope": None, "query_embedding": None, "cached_output": None}
+
+        async def run():
+            started, release = asyncio.Event(), asyncio.Event()
+
+            async def slow_answer(inputs):
+                started.set()
+                await release.wait()
+                return {"output": "Equities are capped at 60%."}
+
+            agent = Mock()
+            agent.ainvoke = slow_answer
+            with patch.object(Config, 'QUERY_PIPELINE', 'agent'), \
+                 patch.object(service, '_aprepare_query', return_value=prepared), \
+                 patch.object(service, 'get_query_agent', return_value=agent):
+                leader = asyncio.create_task(service.aprocess_query("What is the equity limit?"))
+                await asyncio.wait_for(started.wait(), 5)
+                follower = asyncio.create_task(service.aprocess_query("what is the  equity limit?"))
+                for _ in range(5):
+                    await asyncio.sleep(0)
+                leader.cancel()
+                release.set()
+                return await asyncio.wait_for(follower, 5), leader
+
+        result, leader = asyncio.run(run())
+        assert leader.cancelled()
+        assert result["success"] and result["response"] == "Equities are capped at 60%."
+
+    def test_session_queries_do_not_join_sessionless_runs(self):
+        """Test a session request runs its own agent instead of sharing an identical stateless run."""
+        import asyncio
+        from guidelines_agent.services.agent_service import AgentService, Config
+
+        service = AgentService()
+        prepared = {"session_found": True, "session_context": {"active_portfolios": ["fund-a"]},
+                    "conversation_history": "", "cache_scope": None, "query_embedding": None,
+                    "cached_output": None}
+
+        async def run():
+            release = asyncio.Event()
+
+            async def stateless_answer(inputs):
+                await release.wait()
+                return {"output": "Equities are capped at 60%."}
+
+            async def stateful_answer(inputs):
+                return {"output": "Fund A caps equities at 40%."}
+
+            agent, stateful_agent = Mock(), Mock()
+            agent.ainvoke, stateful_agent.ainvoke = stateless_answer, stateful_answer
+            with patch.object(Config, 'QUERY_PIPELINE', 'agent'), \
+                 patch.object(service, '_aprepare_query',
+                              side_effect=[dict(prepared, session_found=False, session_context=None),
+                                           prepared]), \
+                 patch.object(service, 'get_query_agent', return_value=agent), \
+                 patch.object(service, 'get_stateful_query_agent', return_value=stateful_agent), \
+                 patch('guidelines_agent.services.agent_service.session_store'):
+                leader = asyncio.create_task(service.aprocess_query("What is the equity limit?"))
+                for _ in range(5):
+                    await asyncio.sleep(0)
+                result = await asyncio.wait_for(
+                    service.aprocess_query("What is the equity limit?", session_id="s1"), 5)
+                release.set()
+                await asyncio.wait_for(leader, 5)
+                return result
+
+        result = asyncio.run(run())
+        assert result["response"] == "Fund A caps equities at 40%."
+
+
+class TestAnswerRoute:
+    """Test the fused plan/search/summarize /mcp/answer stream."""
+
+    @staticmethod
+    def _answer(streamed_plan, plan):
+        """Run /answer with a planner that streams streamed_plan and returns plan; returns (events, search mock)."""
+        import asyncio
+        import json
+        from guidelines_agent.api.routes import mcp_routes
+        from guidelines_agent.api.schemas.agent_schemas import AnswerInput
+
+        def fake_plan(user_query, on_chunk=None):
+            on_chunk(streamed_plan)
+            return plan
+
+        def fake_summary(question, context, on_chunk=None):
+            return "Equities are capped at 60%."
+
+        rows = [Mock(to_dict=Mock(return_value={"guideline": f"rule {i}", "provenance": "p1"}))
+                for i in range(20)]
+        guideline_service = Mock()
+        guideline_service.search_guidelines.return_value = rows
+
+        async def collect():
+            response = await mcp_routes.answer(AnswerInput(user_query="What is the equity limit?"),
+                                               guideline_service=guideline_service)
+            return [frame async for frame in response.body_iterator]
+
+        with patch.object(mcp_routes, 'generate_query_plan', side_effect=fake_plan), \
+             patch.object(mcp_routes, 'generate_summary', side_effect=fake_summary):
+            frames = asyncio.run(collect())
+
+        events = {}
+        for frame in frames:
+            lines = frame.strip().split("\n")
+            name = lines[0][len("event: "):] if lines[0].startswith("event: ") else "token"
+            events[name] = json.loads(lines[-1][len("data: "):])
+        return events, guideline_service.search_guidelines
+
+    def test_answer_reuses_prefetched_search(self):
+        """Test the search started from the streamed plan is trimmed to top_k instead of re-run."""
+        events, search = self._answer('{"search_query": "equity limits", "top_k": 5}',
+                                      {"search_query": "equity limits", "top_k": 5})
+
+        search.assert_called_once()
+        assert search.call_args.kwargs["top_k"] == 100
+        assert events["results"]["total_found"] == 5
+        assert events["done"]["sources_count"] == 5
+
+    def test_answer_re_searches_when_the_final_plan_changes(self):
+        """Test a changed search query is searched again and a malformed top_k falls back to 10."""
+        events, search = self._answer('{"search_query": "equity"',
+                                      {"search_query": "equity limits", "top_k": "ten"})
+
+        assert search.call_count == 2
+        assert search.call_args.kwargs["query_text"] == "equity limits"
+        assert search.call_args.kwargs["top_k"] == 10
+        assert events["plan"]["top_k"] == 10
+        assert "error" not in events
+
+
+
+class TestExtractRoute:
+    """Test the base64 /mcp/extract_guidelines route."""
+
+    def test_decode_base64_keeps_alignment_across_line_breaks(self):
+        """Test MIME line breaks that split 4-character groups across slices still decode exactly."""
+        import base64
+        import hashlib
+        import io
+        from guidelines_agent.api.routes import mcp_routes
+
+        data = bytes(range(256)) * 3
+        encoded = base64.encodebytes(data).decode()  # A newline every 76 characters
+        dest = io.BytesIO()
+        with patch.object(mcp_routes, 'BASE64_CHUNK_CHARS', 10):
+            digest = mcp_routes._decode_base64_to_file(encoded, dest)
+
+        assert dest.getvalue() == data
+        assert digest.hexdigest() == hashlib.sha256(data).hexdigest()
+
+    def test_bad_padding_returns_400(self):
+        """Test a truncated base64 payload is rejected as a client error."""
+        import asyncio
+        from fastapi import HTTPException
+        from guidelines_agent.api.routes import mcp_routes
+        from guidelines_agent.api.schemas.agent_schemas import ExtractGuidelinesInput
+
+        document_service = Mock()
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(mcp_routes.extract_guidelines(
+                ExtractGuidelinesInput(pdf_bytes_base64="JVBERi0xLjQ", doc_name="doc.pdf"),
+                document_service=document_service))
+
+        assert exc_info.value.status_code == 400
+        document_service.extract_guidelines_from_stream.assert_not_called()
+
+    def test_identical_payload_hits_extraction_cache(self, tmp_path):
+        """Test the same PDF posted twice is extracted by the LLM only once."""
+        import asyncio
+        import base64
+        import json
+        from guidelines_agent.api.routes import mcp_routes
+        from guidelines_agent.api.schemas.agent_schemas import ExtractGuidelinesInput
+        from guidelines_agent.core import extract, extraction_cache
+
+        payload = json.dumps({"is_valid_document": True, "validation_summary": "ok",
+                              "guidelines": [{"rule_id": "r1", "text": "a"}]})
+        request = ExtractGuidelinesInput(pdf_bytes_base64=base64.b64encode(b"%PDF-1.4 cached").decode(),
+                                         doc_name="doc.pdf")
+        document_service = DocumentService()
+
+        async def post_twice():
+            return [await mcp_routes.extract_guidelines(request, document_service=document_service)
+                    for _ in range(2)]
+
+        extraction_cache.clear_memory_cache()
+        with patch.object(extract.Config, 'EXTRACTION_CACHE_ENABLED', True), \
+             patch.object(extract.Config, 'EXTRACTION_CACHE_DIR', str(tmp_path)), \
+             patch('guidelines_agent.core.llm_providers.llm_manager.generate_response',
+                   return_value=Mock(success=True, content=payload, latency_ms=1, usage=None)) as generate:
+            first, second = asyncio.run(post_twice())
+        extraction_cache.clear_memory_cache()
+
+        generate.assert_called_once()
+        assert first.is_valid and second.is_valid
+        assert second.guidelines == first.guidelines
+
+
+class TestEmbeddingPersistence:
+    """Test stamp_missing_embeddings against a mocked database connection."""
+
+    @staticmethod
+    def _row(rule_id):
+        return ("p1", rule_id, "Fund", "I", "A", None, f"text {rule_id}")
+
+    def test_retryable_failure_defers_remaining_batches(self):
+        """Test batches stream from a server-side cursor, stay bounded in flight and stop after a retryable error."""
+        import threading
+        from guidelines_agent.core import persistence
+        from guidelines_agent.core.embedding_service import EmbeddingError
+
+        batches = [[self._row(f"r{b}{i}") for i in range(2)] for b in range(4)]
+        server_cursor = MagicMock()
+        server_cursor.__enter__.return_value = server_cursor
+        server_cursor.fetchmany.side_effect = batches + [[]]
+        write_cursor = MagicMock()
+        write_cursor.__enter__.return_value = write_cursor
+        conn = MagicMock()
+        conn.cursor.side_effect = lambda name=None: server_cursor if name else write_cursor
+
+        lock = threading.Lock()
+        embedded = []
+
+        def fake_embed(batch):
+            with lock:
+                embedded.append(batch[0][1])
+            if batch is batches[1]:
+                raise EmbeddingError("quota exhausted", retryable=True)
+            return [[0.1, 0.2]] * len(batch)
+
+        written = []
+        with patch.object(persistence, '_get_db_connection', return_value=conn), \
+             patch.object(persistence, 'EMBEDDING_CONCURRENCY', 2), \
+             patch.object(persistence, '_embed_batch', side_effect=fake_embed), \
+             patch.object(persistence, '_update_embeddings_in_db',
+                          side_effect=lambda cursor, updates: written.extend(u[1] for u in updates)), \
+             patch.object(persistence, 'invalidate_guideline_caches') as invalidate:
+            result = persistence.stamp_missing_embeddings()
+
+        conn.cursor.assert_any_call(name="guidelines_without_embeddings")
+        assert server_cursor.itersize == persistence.BATCH_SIZE
+        # Batch 3 was already in flight when batch 2 failed; batch 4 waits for the next run
+        assert sorted(embedded) == ["r00", "r10", "r20"]
+        assert written == ["r00", "r01", "r20", "r21"]
+        assert result == {"status": "success", "total_found": 8, "processed_count": 4}
+        conn.commit.assert_called_once()
+        conn.close.assert_called_once()
+        invalidate.assert_called_once()
+
+    def test_no_missing_embeddings_is_no_action(self):
+        """Test an empty result set commits nothing and reports no_action."""
+        from guidelines_agent.core import persistence
+
+        server_cursor = MagicMock()
+        server_cursor.__enter__.return_value = server_cursor
+        server_cursor.fetchmany.return_value = []
+        conn = MagicMock()
+        conn.cursor.side_effect = lambda name=None: server_cursor if name else MagicMock()
+
+        with patch.object(persistence, '_get_db_connection', return_value=conn):
+            result = persistence.stamp_missing_embeddings()
+
+        assert result["status"] == "no_action"
+        conn.commit.assert_not_called()
+        conn.close.assert_called_once()
+
+class TestIngestBatcher:
+    """Test upload micro-batching."""
+
+    def test_lone_upload_is_ingested_without_waiting_for_the_window(self, tmp_path):
+        """Test a single upload skips the batch window, is credited its own embeddings and its file removed."""
+        import asyncio
+        from guidelines_agent.services.ingest_batcher import IngestBatcher
+
+        upload = tmp_path / "fund.pdf"
+        upload.write_bytes(b"%PDF-1.4")
+        agent_service = Mock()
+        agent_service.process_document_ingestion.return_value = {
+            "success": True, "doc_id": "d1", "guidelines_count": 3}
+        agent_service.guideline_service.generate_missing_embeddings.return_value = {
+            "success": True, "processed": 5, "processed_by_doc": {"d1": 2, "d2": 3}}
+
+        async def ingest():
+            batcher = IngestBatcher(agent_service, window_ms=60_000)
+            return await asyncio.wait_for(await batcher.submit(str(upload), "fund.pdf"), 5)
+
+        result = asyncio.run(ingest())
+        assert result["embeddings_generated"] == 2
+        assert not upload.exists()
+
+
+class TestSessionStore:
+    """Test conversation history management."""
+
+    def test_conversation_history_summarizes_older_turns(self):
+        """Test older turns are folded into a summary on write and reads have no side effects."""
+        from guidelines_agent.core.session_store import SessionStore
+
+        store = SessionStore()
+        session_id = store.create_session()
+        with patch('guidelines_agent.core.llm_providers.llm_manager') as mock_llm:
+            mock_llm.generate_response.return_value = Mock(success=True, content="earlier summary")
+            for i in range(16):
+                store.add_message(session_id, f"question {i}", f"answer {i}")
+            summarizer_calls = mock_llm.generate_response.call_count
+            history = store.get_conversation_history(session_id)
+            assert store.get_conversation_history(session_id) == history
+            assert mock_llm.generate_response.call_count == summarizer_calls > 0
+
+        assert history.startswith("Summary of earlier conversation: earlier summary")
+        assert "User: question 15" in history
+        assert "User: question 0\n" not in history
+        assert len(store.get_conversation_history(session_id, max_tokens=10)) <= 40
+
+
 @pytest.fixture(scope="session")
 def test_server():
     """Start test server for integration tests."""